@@ -0,0 +1,349 @@
+"""
+Sensor Analytics - Parallel Batch Reports
+=========================================
+Laporan dari log sensor besar (export CSV dashboard, log realtime, atau
+archive ``.iotarc``) tanpa memuat seluruh file ke memori:
+
+- ringkasan harian per device (jumlah reading, anomaly, mean/min/max/std
+  temperature & humidity),
+- distribusi kelas prediction,
+- jumlah anomaly per reason ``detect_anomaly``,
+- tingkat ketidaksesuaian model vs kategori threshold config (per device
+  jika ada tabel kalibrasi, lihat calibration.py).
+
+File dipecah menjadi task kecil (range byte CSV atau kelompok chunk
+archive) yang diproses di process pool. Setiap task menghasilkan
+``Summary`` parsial berisi jumlah / min / max, lalu digabung dengan
+``Summary.merge`` yang asosiatif dan komutatif, jadi urutan selesainya
+worker tidak berpengaruh dan memori hanya sebesar satu blok per worker
+plus jumlah (device, hari).
+
+Jalankan:
+    python analytics.py iot_realtime_predictions.csv
+    python analytics.py history.iotarc exports/*.csv --workers 8 --daily-csv daily.csv
+"""
+
+import argparse
+import csv
+import itertools
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from archive import MAGIC, CSV_BLOCK_ROWS, ArchiveReader, csv_block_columns
+from calibration import get_calibration
+from classifier import CATEGORIES, ANOMALY_REASONS, anomaly_codes, threshold_codes, encode_labels, get_predictor
+from config import DEFAULT_DEVICE_ID, ANALYTICS_WORKERS, ANALYTICS_CSV_BLOCK_BYTES, ANALYTICS_ARCHIVE_TASK_ROWS
+from sensor_buffer import local_offset_ns
+
+DAY_NS = 86_400 * 1_000_000_000
+UNKNOWN = len(CATEGORIES)   # Kode kelas untuk reading tanpa prediction
+
+# Statistik harian per (device, hari); suffix menentukan cara merge
+DAILY_FIELDS = (
+    'readings', 'anomalies', 'compared', 'disagree',
+    'temp_n', 'temp_sum', 'temp_sq', 'temp_min', 'temp_max',
+    'hum_n', 'hum_sum', 'hum_sq', 'hum_min', 'hum_max',
+)
+_MIN = [i for i, name in enumerate(DAILY_FIELDS) if name.endswith('_min')]
+_MAX = [i for i, name in enumerate(DAILY_FIELDS) if name.endswith('_max')]
+_SUM = [i for i in range(len(DAILY_FIELDS)) if i not in _MIN and i not in _MAX]
+
+def reduce_groups(devices, days, stats):
+    """Gabungkan baris statistik dengan (device, hari) sama -> (devices, days, stats) unik & urut"""
+    if len(days) == 0:
+        return devices, days, stats
+    names, codes = np.unique(np.asarray(devices, dtype=object).astype(str), return_inverse=True)
+    codes = codes.reshape(-1)
+    order = np.lexsort((days, codes))
+    codes, days, stats = codes[order], days[order], stats[order]
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])])
+    out = np.empty((len(starts), len(DAILY_FIELDS)), dtype=np.float64)
+    out[:, _SUM] = np.add.reduceat(stats[:, _SUM], starts, axis=0)
+    out[:, _MIN] = np.minimum.reduceat(stats[:, _MIN], starts, axis=0)
+    out[:, _MAX] = np.maximum.reduceat(stats[:, _MAX], starts, axis=0)
+    return names.astype(object)[codes[starts]], days[starts], out
+
+# =====================================================
+# SUMMARY (hasil parsial yang bisa di-merge)
+# =====================================================
+class Summary:
+    """Agregat reading: statistik harian per device + counter global"""
+
+    def __init__(self):
+        self.devices = np.empty(0, dtype=object)
+        self.days = np.empty(0, dtype=np.int64)           # Hari lokal sejak epoch
+        self.stats = np.empty((0, len(DAILY_FIELDS)), dtype=np.float64)
+        self.classes = np.zeros(len(CATEGORIES) + 1, dtype=np.int64)
+        self.reasons = np.zeros(len(ANOMALY_REASONS), dtype=np.int64)
+        # [kelas model (+ UNKNOWN), kategori threshold]
+        self.confusion = np.zeros((len(CATEGORIES) + 1, len(CATEGORIES)), dtype=np.int64)
+
+    @classmethod
+    def from_columns(cls, columns, tz_offset_ns=0, repredict=False):
+        """Summary dari dict kolom (schema SensorBuffer).
+
+        Reading tanpa prediction (misal CSV hanya berisi sensor) diprediksi
+        dengan model jika tersedia; ``repredict`` memakai model untuk semua
+        reading (evaluasi model saat ini terhadap log lama).
+        """
+        summary = cls()
+        n = len(columns['timestamp'])
+        if n == 0:
+            return summary
+        temp = np.asarray(columns['temperature'], dtype=np.float64)
+        humidity = np.asarray(columns['humidity'], dtype=np.float64)
+        temp_ok, humidity_ok = np.isfinite(temp), np.isfinite(humidity)
+
+        model = encode_labels(columns['prediction'], CATEGORIES).astype(np.int64)
+        missing = (np.ones(n, dtype=bool) if repredict else model < 0) & temp_ok & humidity_ok
+        if missing.any():
+            predictor = get_predictor()
+            if predictor is not None:
+                model[missing] = predictor.predict(temp[missing], humidity[missing])[0]
+        model = np.where(model < 0, UNKNOWN, model)
+
+        # Nilai di log sudah terkalibrasi: hanya threshold per device yang dipakai, bukan offset
+        table = get_calibration()
+        rows = table.rows(columns['device_id'])
+        threshold = threshold_codes(temp, *table.category_limits(rows))
+        compared = (model != UNKNOWN) & temp_ok
+        disagree = compared & (model != threshold)
+        reason = anomaly_codes(temp, humidity, table.limits(rows))
+
+        summary.classes += np.bincount(model, minlength=len(summary.classes))
+        summary.reasons += np.bincount(reason, minlength=len(summary.reasons))
+        summary.confusion += np.bincount(
+            model[temp_ok] * len(CATEGORIES) + threshold[temp_ok], minlength=summary.confusion.size
+        ).reshape(summary.confusion.shape)
+
+        t = np.where(temp_ok, temp, 0.0)
+        h = np.where(humidity_ok, humidity, 0.0)
+        stats = np.column_stack([
+            np.ones(n), reason > 0, compared, disagree,
+            temp_ok, t, t * t, np.where(temp_ok, temp, np.inf), np.where(temp_ok, temp, -np.inf),
+            humidity_ok, h, h * h, np.where(humidity_ok, humidity, np.inf), np.where(humidity_ok, humidity, -np.inf),
+        ]).astype(np.float64)
+        days = (np.asarray(columns['timestamp'], dtype=np.int64) + tz_offset_ns) // DAY_NS
+        summary.devices, summary.days, summary.stats = reduce_groups(columns['device_id'], days, stats)
+        return summary
+
+    def merge(self, other):
+        """Gabungkan ``other`` ke summary ini (asosiatif & komutatif); return self"""
+        self.devices, self.days, self.stats = reduce_groups(
+            np.concatenate([self.devices, other.devices]),
+            np.concatenate([self.days, other.days]),
+            np.concatenate([self.stats, other.stats]),
+        )
+        self.classes += other.classes
+        self.reasons += other.reasons
+        self.confusion += other.confusion
+        return self
+
+    @property
+    def readings(self):
+        return int(self.classes.sum())
+
+    def disagreement_rate(self):
+        """Porsi reading dengan kelas model != kategori threshold (None jika tidak ada yang bisa dibandingkan)"""
+        compared = self.confusion[:UNKNOWN].sum()
+        if compared == 0:
+            return None
+        return 1 - np.trace(self.confusion[:UNKNOWN]) / compared
+
+    def daily_rows(self):
+        """Ringkasan harian per device sebagai list dict, urut device lalu tanggal"""
+        rows = []
+        for device, day, stat in zip(self.devices.tolist(), self.days.tolist(), self.stats):
+            s = dict(zip(DAILY_FIELDS, stat.tolist()))
+            row = {
+                'device_id': device,
+                'date': str(np.datetime64(day, 'D')),
+                'readings': int(s['readings']),
+                'anomalies': int(s['anomalies']),
+                'disagree_rate': round(s['disagree'] / s['compared'], 4) if s['compared'] else None,
+            }
+            for field, prefix in (('temperature', 'temp'), ('humidity', 'hum')):
+                count = s[f'{prefix}_n']
+                if count:
+                    mean = s[f'{prefix}_sum'] / count
+                    var = max(s[f'{prefix}_sq'] / count - mean * mean, 0.0)
+                    row.update({f'{field}_mean': round(mean, 2), f'{field}_min': s[f'{prefix}_min'],
+                                f'{field}_max': s[f'{prefix}_max'], f'{field}_std': round(var ** 0.5, 2)})
+                else:
+                    row.update(dict.fromkeys((f'{field}_mean', f'{field}_min', f'{field}_max', f'{field}_std')))
+            rows.append(row)
+        return rows
+
+# =====================================================
+# TASKS (dijalankan di worker process)
+# =====================================================
+def detect_format(path):
+    """'archive' jika file diawali MAGIC archive, selain itu 'csv'"""
+    with open(path, 'rb') as f:
+        return 'archive' if f.read(len(MAGIC)) == MAGIC else 'csv'
+
+def csv_tasks(path, block_bytes, options):
+    """Pecah CSV menjadi range byte; range yang memotong baris diselesaikan worker"""
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+    header = [name.strip() for name in next(csv.reader([header_line.decode('utf-8-sig')]))]
+    if 'timestamp' not in header:
+        raise ValueError(f"{path}: CSV needs a 'timestamp' column")
+    size = os.path.getsize(path)
+    for start in range(len(header_line), size, block_bytes):
+        yield ('csv', path, (header, start, min(start + block_bytes, size)), options)
+
+def archive_tasks(path, task_rows, options):
+    """Kelompokkan chunk archive (dari index footer) menjadi task ~``task_rows`` reading"""
+    with ArchiveReader(path) as reader:
+        chunks = reader.chunks
+    group, rows = [], 0
+    for meta in chunks:
+        group.append(meta)
+        rows += meta['rows']
+        if rows >= task_rows:
+            yield ('archive', path, group, options)
+            group, rows = [], 0
+    if group:
+        yield ('archive', path, group, options)
+
+def iter_csv_range(path, start, end):
+    """Baris teks yang byte pertamanya ada di [start, end), dibaca streaming"""
+    with open(path, 'rb') as f:
+        if start > 0:
+            # Sisa baris yang dimulai sebelum start milik range sebelumnya
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        for line in f:
+            if position >= end:
+                return
+            position += len(line)
+            yield line.decode('utf-8')
+
+def iter_task_columns(kind, path, spec, device_id=DEFAULT_DEVICE_ID):
+    """Generator blok dict kolom untuk satu task"""
+    if kind == 'csv':
+        header, start, end = spec
+        rows = (row for row in csv.reader(iter_csv_range(path, start, end)) if row)
+        while True:
+            block = list(itertools.islice(rows, CSV_BLOCK_ROWS))
+            if not block:
+                return
+            yield csv_block_columns(header, block, device_id)
+    else:
+        with ArchiveReader(path) as reader:
+            for meta in spec:
+                yield reader.read_chunk(meta)
+
+def summarize_task(task):
+    """Satu task -> Summary parsial (entry point worker)"""
+    kind, path, spec, options = task
+    summary = Summary()
+    for columns in iter_task_columns(kind, path, spec, options['device_id']):
+        summary.merge(Summary.from_columns(columns, options['tz_offset_ns'], options['repredict']))
+    return summary
+
+def analyze(paths, workers=ANALYTICS_WORKERS, repredict=False, device_id=DEFAULT_DEVICE_ID,
+            block_bytes=ANALYTICS_CSV_BLOCK_BYTES, task_rows=ANALYTICS_ARCHIVE_TASK_ROWS):
+    """Summary gabungan semua file; workers=1 menjalankan task di proses ini"""
+    options = {'tz_offset_ns': local_offset_ns(), 'repredict': repredict, 'device_id': device_id}
+    tasks = []
+    for path in paths:
+        if detect_format(path) == 'archive':
+            tasks.extend(archive_tasks(path, task_rows, options))
+        else:
+            tasks.extend(csv_tasks(path, block_bytes, options))
+
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    total = Summary()
+    if workers == 1:
+        for task in tasks:
+            total.merge(summarize_task(task))
+        return total, len(tasks), workers
+
+    with mp.get_context("spawn").Pool(workers) as pool:
+        # Merge asosiatif: hasil digabung sesuai urutan selesai
+        for partial in pool.imap_unordered(summarize_task, tasks):
+            total.merge(partial)
+    return total, len(tasks), workers
+
+# =====================================================
+# REPORT
+# =====================================================
+def print_report(summary, limit):
+    n = summary.readings
+    print(f"📊 {n} readings · {len(set(summary.devices.tolist()))} devices · {len(set(summary.days.tolist()))} days")
+    if n == 0:
+        return
+
+    print("\n🏷️ Prediction classes")
+    for label, count in zip(CATEGORIES + ("(none)",), summary.classes.tolist()):
+        if count:
+            print(f"   {label:<10} {count:>12}  {count / n:6.1%}")
+
+    print("\n⚠️ Anomalies by reason")
+    for reason, count in zip(ANOMALY_REASONS, summary.reasons.tolist()):
+        print(f"   {reason or 'No anomaly':<45} {count:>12}  {count / n:6.1%}")
+
+    rate = summary.disagreement_rate()
+    print("\n🤖 Model vs threshold")
+    if rate is None:
+        print("   No readings with a model prediction")
+    else:
+        print(f"   Disagreement rate: {rate:.2%}")
+        print(f"   {'model / threshold':<18}" + "".join(f"{label:>10}" for label in CATEGORIES))
+        for label, row in zip(CATEGORIES, summary.confusion[:UNKNOWN].tolist()):
+            print(f"   {label:<18}" + "".join(f"{count:>10}" for count in row))
+
+    rows = summary.daily_rows()
+    print(f"\n📅 Daily summary per device ({len(rows)} rows{f', first {limit}' if len(rows) > limit else ''})")
+    print(f"   {'device':<16} {'date':<10} {'readings':>9} {'anomaly':>8} {'disagree':>9} "
+          f"{'temp mean/min/max':>20} {'hum mean/min/max':>20}")
+    for row in rows[:limit]:
+        def triple(field):
+            if row[f'{field}_mean'] is None:
+                return "-"
+            return f"{row[f'{field}_mean']:.1f}/{row[f'{field}_min']:.1f}/{row[f'{field}_max']:.1f}"
+        disagree = f"{row['disagree_rate']:.1%}" if row['disagree_rate'] is not None else "-"
+        print(f"   {row['device_id']:<16} {row['date']:<10} {row['readings']:>9} {row['anomalies']:>8} "
+              f"{disagree:>9} {triple('temperature'):>20} {triple('humidity'):>20}")
+
+def write_daily_csv(summary, path):
+    rows = summary.daily_rows()
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ['device_id', 'date'])
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel batch analytics over sensor logs")
+    parser.add_argument("paths", nargs="+", help="CSV log / export atau archive .iotarc")
+    parser.add_argument("--workers", type=int, default=ANALYTICS_WORKERS, help="Process worker (default: semua core)")
+    parser.add_argument("--repredict", action="store_true",
+                        help="Prediksi ulang semua reading dengan model saat ini")
+    parser.add_argument("--device-id", default=DEFAULT_DEVICE_ID,
+                        help="Device id untuk CSV tanpa kolom device_id")
+    parser.add_argument("--block-mb", type=float, default=ANALYTICS_CSV_BLOCK_BYTES / 2**20,
+                        help="Ukuran range CSV per task")
+    parser.add_argument("--daily-csv", metavar="PATH", help="Simpan ringkasan harian lengkap sebagai CSV")
+    parser.add_argument("--limit", type=int, default=20, help="Baris ringkasan harian yang ditampilkan")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary, tasks, workers = analyze(args.paths, args.workers, args.repredict, args.device_id,
+                                      block_bytes=max(int(args.block_mb * 2**20), 1))
+    elapsed = time.perf_counter() - start
+    print(f"✅ {tasks} tasks on {workers} workers in {elapsed:.2f}s "
+          f"({summary.readings / max(elapsed, 1e-9):,.0f} readings/s)\n")
+    print_report(summary, args.limit)
+    if args.daily_csv:
+        rows = write_daily_csv(summary, args.daily_csv)
+        print(f"\n💾 {rows} daily rows saved to {args.daily_csv}")
+
+if __name__ == "__main__":
+    main()
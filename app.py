@@ -1,36 +1,59 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
+import plotly.graph_objects as go  # Sudah di-import oleh streamlit, tanpa biaya tambahan
 from datetime import datetime, timedelta
 import time
-from collections import deque
-import random
 import io
-import json
-import paho.mqtt.client as mqtt
+import sys
+import importlib
 import threading
+from config import (
+    MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_TEMP, MQTT_TOPIC_HUMIDITY, MQTT_TOPIC_COMBINED, MQTT_TOPIC_ROUTES,
+    TEMP_COLD_MAX, TEMP_NORMAL_MAX, INGEST_MODE, STREAM_ENABLED, STREAM_HOST, STREAM_PORT,
+    WAL_ENABLED, RETENTION_RAW_WINDOW, RETENTION_ROLLUP_INTERVAL, FORECAST_HORIZON, FORECAST_BAND_Z,
+    OVERLOAD_ENABLED, VIEW_CACHE_ENABLED
+)
+from classifier import CATEGORIES, build_columns, get_temperature_category, get_predictor, warm_up_predictor
+from forecast import HoltForecaster
+from liveness import LivenessTracker, ONLINE
+from fleet import STATES, SORT_KEYS, NO_SITE, fleet_snapshot, select_fleet, grid_shape, to_grid
+from archive import to_archive_bytes
+from calibration import get_calibration
+from ingest import MQTTClient
+from overload import LoadShedder
+from sensor_buffer import (
+    SensorBuffer, RetentionPolicy, total_memory_usage, to_local_datetime, format_timestamps
+)
+from view_cache import ViewCache, data_version
+from wal import SessionRecorder, WriteAheadLog, load_recent
 
-# =====================================================
-# KONFIGURASI MQTT
-# =====================================================
-MQTT_BROKER = "broker.hivemq.com"  # Public broker, ganti dengan broker Anda
-MQTT_PORT = 1883
-MQTT_TOPIC_TEMP = "iot/temperature"  # Topic untuk temperature
-MQTT_TOPIC_HUMIDITY = "iot/humidity"  # Topic untuk humidity
-MQTT_TOPIC_COMBINED = "iot/sensor/data"  # Topic untuk data gabungan (JSON)
-MQTT_CLIENT_ID = f"streamlit_dashboard_{random.randint(1000, 9999)}"
+# Modul berat (pandas, plotly.subplots, ingest service / sharded ingest)
+# di-import lazy di fungsi yang membutuhkannya, lihat bench_startup.py.
+# pandas mulai di-load di background supaya overlap dengan render header,
+# sidebar dan warm restart (import lock menjamin modul tidak dipakai setengah jadi).
+if 'pandas' not in sys.modules:
+    threading.Thread(target=importlib.import_module, args=("pandas",),
+                     name="pandas-warmup", daemon=True).start()
 
 # =====================================================
 # KONFIGURASI DASHBOARD
 # =====================================================
-MAX_DATA_POINTS = 100
+MAX_DATA_POINTS = 100          # Jumlah reading pada tampilan live
+HISTORY_MAX_POINTS = 43200     # Reading dimuat dari WAL saat warm restart (~24 jam @ 2 detik)
+# Retensi buffer (byte budget, raw window, agregat) diatur di config.py: RETENTION_*
 UPDATE_INTERVAL = 2  # seconds
 
-# Threshold untuk prediction categories
-TEMP_COLD_MAX = 20      # Dibawah ini = Dingin
-TEMP_NORMAL_MAX = 30    # 20-30 = Normal
-# Diatas 30 = Panas
+# Preset time range (None = live, 'custom' = pilih manual)
+TIME_RANGE_PRESETS = {
+    "📡 Live": None,
+    "Last 1 min": timedelta(minutes=1),
+    "Last 5 min": timedelta(minutes=5),
+    "Last 15 min": timedelta(minutes=15),
+    "Last 1 hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(hours=24),
+    "🗓️ Custom": 'custom',
+}
+TABLE_PAGE_SIZES = [25, 50, 100, 250]
 
 # =====================================================
 # STREAMLIT PAGE CONFIG
@@ -102,6 +125,14 @@ st.markdown("""
         font-weight: bold;
         text-align: center;
     }
+    .stale-badge {
+        display: inline-block;
+        background: rgba(0, 0, 0, 0.35);
+        padding: 2px 8px;
+        border-radius: 5px;
+        margin-top: 6px;
+        font-size: 0.8em;
+    }
     @keyframes pulse {
         0%, 100% { opacity: 1; }
         50% { opacity: 0.7; }
@@ -110,181 +141,342 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =====================================================
-# MQTT CLIENT CLASS
+# INITIALIZE SESSION STATE
 # =====================================================
-class MQTTClient:
-    def __init__(self):
-        self.client = mqtt.Client(client_id=MQTT_CLIENT_ID)
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
-        self.client.on_disconnect = self.on_disconnect
-        self.connected = False
-        self.latest_temp = None
-        self.latest_humidity = None
-        
-    def on_connect(self, client, userdata, flags, rc):
-        """Callback saat koneksi berhasil"""
-        if rc == 0:
-            self.connected = True
-            print(f"✅ Connected to MQTT Broker: {MQTT_BROKER}")
-            # Subscribe ke topics
-            self.client.subscribe(MQTT_TOPIC_TEMP)
-            self.client.subscribe(MQTT_TOPIC_HUMIDITY)
-            self.client.subscribe(MQTT_TOPIC_COMBINED)
-            print(f"📡 Subscribed to topics: {MQTT_TOPIC_TEMP}, {MQTT_TOPIC_HUMIDITY}, {MQTT_TOPIC_COMBINED}")
+@st.cache_resource
+def get_wal():
+    """Write-ahead log bersama semua session dan ingest di proses ini (None jika nonaktif)"""
+    if not WAL_ENABLED:
+        return None
+    wal = WriteAheadLog()
+    wal.start()
+    return wal
+
+@st.cache_resource
+def get_session_recorder():
+    """Mode "session": batch semua session ditulis ke WAL bersama (tanpa duplikat)"""
+    return SessionRecorder(get_wal())
+
+@st.cache_resource
+def get_ingest_service():
+    """Satu ingest service per proses, dipakai bersama semua session"""
+    from ingest_service import IngestService
+    service = IngestService(stream_enabled=STREAM_ENABLED, wal=get_wal())
+    service.start()
+    return service
+
+@st.cache_resource
+def get_sharded_ingest():
+    """Worker ingest multi-process + shared-memory ring, satu set per proses"""
+    from shm_ingest import ShardedIngest
+    sharded = ShardedIngest(wal=get_wal())
+    sharded.start()
+    return sharded
+
+@st.cache_resource
+def get_view_cache():
+    """Cache hasil view (DataFrame, statistik, figure) dibagi semua session di proses ini"""
+    return ViewCache()
+
+def init_session():
+    """Setup state session baru (ingest + warm restart dari WAL).
+
+    Dipanggil dari main() setelah header ter-render, jadi session baru
+    langsung melihat halaman sementara ingest disiapkan.
+    """
+    if 'mqtt_client' not in st.session_state:
+        if INGEST_MODE == "service":
+            service = get_ingest_service()
+            st.session_state.mqtt_client = service.mqtt_client
+            st.session_state.stream = service.subscribe()
+        elif INGEST_MODE == "sharded":
+            sharded = get_sharded_ingest()
+            st.session_state.mqtt_client = sharded
+            st.session_state.shard_cursors = sharded.new_cursors()
         else:
-            self.connected = False
-            print(f"❌ Failed to connect, return code {rc}")
-    
-    def on_disconnect(self, client, userdata, rc):
-        """Callback saat terputus"""
-        self.connected = False
-        print(f"⚠️ Disconnected from MQTT Broker")
-        
-    def on_message(self, client, userdata, msg):
-        """Callback saat menerima message"""
-        try:
-            payload = msg.payload.decode()
-            
-            # Cek topic yang diterima
-            if msg.topic == MQTT_TOPIC_TEMP:
-                self.latest_temp = float(payload)
-                print(f"🌡️ Temperature received: {self.latest_temp}°C")
-                
-            elif msg.topic == MQTT_TOPIC_HUMIDITY:
-                self.latest_humidity = float(payload)
-                print(f"💧 Humidity received: {self.latest_humidity}%")
-                
-            elif msg.topic == MQTT_TOPIC_COMBINED:
-                # Parse JSON data
-                data = json.loads(payload)
-                self.latest_temp = float(data.get('temperature', 0))
-                self.latest_humidity = float(data.get('humidity', 0))
-                print(f"📦 Combined data received: Temp={self.latest_temp}°C, Humidity={self.latest_humidity}%")
-                
-        except Exception as e:
-            print(f"❌ Error parsing message: {e}")
-    
-    def connect(self):
-        """Koneksi ke MQTT Broker"""
-        try:
-            self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
-            self.client.loop_start()  # Start background thread
-            return True
-        except Exception as e:
-            print(f"❌ Connection error: {e}")
-            return False
-    
-    def disconnect(self):
-        """Disconnect dari broker"""
-        self.client.loop_stop()
-        self.client.disconnect()
-        self.connected = False
-    
-    def get_latest_data(self):
-        """Ambil data terbaru"""
-        return self.latest_temp, self.latest_humidity
+            st.session_state.mqtt_client = MQTTClient()
+            st.session_state.mqtt_client.connect()
 
-# =====================================================
-# INITIALIZE SESSION STATE
-# =====================================================
-if 'data_buffer' not in st.session_state:
-    st.session_state.data_buffer = deque(maxlen=MAX_DATA_POINTS)
+    if 'data_buffer' not in st.session_state:
+        # Dibatasi memory budget + raw window, data lama menjadi agregat
+        st.session_state.data_buffer = SensorBuffer(policy=RetentionPolicy())
+        st.session_state.warm_until = None
+        if WAL_ENABLED:
+            # Warm restart: isi window terakhir dari ekor write-ahead log (mmap)
+            recovered, totals = load_recent(HISTORY_MAX_POINTS)
+            if recovered is not None:
+                st.session_state.data_buffer.extend(recovered)
+                st.session_state.total_messages = totals['messages']
+                st.session_state.alert_count = totals['alerts']
+                st.session_state.warm_until = int(recovered['timestamp'][-1])
+
+    if 'forecaster' not in st.session_state:
+        # Seed state forecast dari data raw yang sudah ada (warm restart)
+        st.session_state.forecaster = HoltForecaster()
+        if len(st.session_state.data_buffer) > 0:
+            st.session_state.forecaster.update(st.session_state.data_buffer.columns())
+
+    if 'liveness' not in st.session_state:
+        # Last-seen per device, di-seed dari data yang sudah ada (warm restart)
+        st.session_state.liveness = LivenessTracker()
+        if len(st.session_state.data_buffer) > 0:
+            seeded = st.session_state.data_buffer.columns()
+            st.session_state.liveness.observe(seeded['device_id'], seeded['timestamp'])
 
-if 'mqtt_client' not in st.session_state:
-    st.session_state.mqtt_client = MQTTClient()
-    st.session_state.mqtt_client.connect()
+    if 'shedder' not in st.session_state:
+        # Mode service: reading sudah di-shed oleh ingest service
+        st.session_state.shedder = LoadShedder() if OVERLOAD_ENABLED and INGEST_MODE != "service" else None
 
-if 'total_messages' not in st.session_state:
-    st.session_state.total_messages = 0
+    if 'total_messages' not in st.session_state:
+        st.session_state.total_messages = 0
 
-if 'alert_count' not in st.session_state:
-    st.session_state.alert_count = 0
+    if 'alert_count' not in st.session_state:
+        st.session_state.alert_count = 0
 
-if 'last_update' not in st.session_state:
-    st.session_state.last_update = None
+    if 'last_update' not in st.session_state:
+        st.session_state.last_update = None
 
-if 'paused' not in st.session_state:
-    st.session_state.paused = False
+    if 'paused' not in st.session_state:
+        st.session_state.paused = False
 
-if 'manual_alert_enabled' not in st.session_state:
-    st.session_state.manual_alert_enabled = True
+    if 'manual_alert_enabled' not in st.session_state:
+        st.session_state.manual_alert_enabled = True
 
-if 'anomaly_detected' not in st.session_state:
-    st.session_state.anomaly_detected = False
+    if 'anomaly_detected' not in st.session_state:
+        st.session_state.anomaly_detected = False
 
 # =====================================================
 # HELPER FUNCTIONS
 # =====================================================
-def get_temperature_category(temp):
-    """Determine temperature category"""
-    if temp < TEMP_COLD_MAX:
-        return "Dingin", "#4facfe"
-    elif temp <= TEMP_NORMAL_MAX:
-        return "Normal", "#43e97b"
-    else:
-        return "Panas", "#fa709a"
-
-def calculate_confidence(temp, humidity):
-    """Calculate confidence score based on sensor stability"""
-    # Simulate confidence based on reasonable ranges
-    temp_confidence = 100 if 15 <= temp <= 35 else 80
-    humidity_confidence = 100 if 30 <= humidity <= 80 else 85
-    
-    # Add small random variation
-    variation = random.uniform(-5, 5)
-    confidence = min(100, max(60, (temp_confidence + humidity_confidence) / 2 + variation))
-    return round(confidence, 1)
-
-def detect_anomaly(temp, humidity):
-    """Detect anomaly in sensor readings"""
-    # Anomaly conditions
-    if temp > 35 or temp < 10:
-        return True, "Temperature out of normal range"
-    if humidity > 85 or humidity < 20:
-        return True, "Humidity out of normal range"
-    if temp > 30 and humidity > 70:
-        return True, "High temperature and humidity combination"
-    return False, ""
-
 def get_mqtt_data():
-    """Get data from MQTT broker"""
-    temp, humidity = st.session_state.mqtt_client.get_latest_data()
+    """Get new readings from MQTT broker sebagai batch kolom (None jika tidak ada data baru)"""
+    alerts_enabled = st.session_state.manual_alert_enabled
+    
+    if INGEST_MODE == "sharded":
+        # Baca langsung dari shared-memory ring milik worker process
+        batch = st.session_state.mqtt_client.read_new(st.session_state.shard_cursors)
+        if batch is not None:
+            batch['alert_triggered'] &= alerts_enabled
+        return batch
     
-    # Jika belum ada data, return None
-    if temp is None or humidity is None:
+    if INGEST_MODE == "service":
+        # Record sudah diklasifikasi oleh ingest service, cukup ambil dari broadcast
+        frames = st.session_state.stream.drain()
+        if not frames:
+            return None
+        # Concatenate = copy, kolom frame dipakai bersama session lain
+        batch = {name: np.concatenate([frame.columns[name] for frame in frames]) for name in frames[0].columns}
+        batch['alert_triggered'] = batch['anomaly_flag'] & alerts_enabled
+        return batch
+    
+    # Satu langkah vectorized untuk semua reading (termasuk payload batch).
+    # Model tidak dimuat di thread render: sampai thread model-warmup selesai
+    # kategori berasal dari threshold
+    readings = st.session_state.mqtt_client.drain_columns()
+    return build_columns(readings, alerts_enabled, load_model=False) if readings is not None else None
+
+def skip_recovered(batch):
+    """Buang reading yang sudah dimuat dari write-ahead log saat warm restart"""
+    warm_until = st.session_state.warm_until
+    if batch is None or warm_until is None:
+        return batch
+    keep = batch['timestamp'] > warm_until
+    if keep.all():
+        st.session_state.warm_until = None
+        return batch
+    if not keep.any():
         return None
+    return {name: values[keep] for name, values in batch.items()}
+
+def mark_section(name):
+    """Checkpoint untuk profile_dashboard.py: tutup section sebelumnya, mulai ``name``.
+
+    No-op kecuali profiler memasang ``section_timer`` di session state.
+    ``None`` menutup section terakhir.
+    """
+    timer = st.session_state.get('section_timer')
+    if timer is not None:
+        timer.lap(name)
+
+def render_forecast_warnings(crossings, limit=3):
+    """Peringatan threshold yang diprediksi terlewati, paling cepat di atas"""
+    total = len(crossings['eta_s'])
+    for device, label, eta in zip(crossings['device_id'][:limit], crossings['label'][:limit],
+                                  crossings['eta_s'][:limit]):
+        st.warning(f"🔮 {device}: expected to become {label} in {eta:.0f} s")
+    if total > limit:
+        st.caption(f"🔮 +{total - limit} more forecast warnings")
+
+def render_liveness_alerts(liveness, events, limit=3):
+    """Toast untuk transisi online/offline di rerun ini + banner device yang masih offline"""
+    for ts, device, state, silent_s in events[:limit]:
+        if state == ONLINE:
+            st.toast(f"✅ {device} back online after {silent_s:.0f}s silence")
+        else:
+            st.toast(f"📴 {device} offline (no data for {silent_s:.0f}s)")
     
-    # Calculate additional metrics
-    category, color = get_temperature_category(temp)
-    confidence = calculate_confidence(temp, humidity)
-    is_anomaly, anomaly_reason = detect_anomaly(temp, humidity)
-    
-    data = {
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'temperature': temp,
-        'humidity': humidity,
-        'prediction': category,
-        'confidence': confidence,
-        'anomaly_flag': is_anomaly,
-        'anomaly_reason': anomaly_reason if is_anomaly else "",
-        'alert_triggered': is_anomaly and st.session_state.manual_alert_enabled
-    }
+    stale = liveness.stale_devices(limit)
+    if stale:
+        now_ns = time.time_ns()
+        listed = ", ".join(f"{device} ({(now_ns - seen) / 1e9:.0f}s)" for device, seen in stale)
+        more = len(liveness.stale) - len(stale)
+        st.error(f"📴 {len(liveness.stale)} device(s) offline: {listed}" + (f" +{more} more" if more > 0 else ""))
+
+def render_device_liveness(liveness):
+    """Jumlah device online/stale, timeout per kelas, dan event terakhir"""
+    stats = liveness.stats()
+    with st.expander(f"📟 Device Liveness ({stats['stale']} stale)"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Online", stats['online'])
+        with col2:
+            st.metric("Stale", stats['stale'])
+        st.caption("Timeouts: " + " · ".join(f"{name} {timeout}s" for name, timeout in liveness.timeouts.items()))
+        
+        for ts, device, state, silent_s in reversed(list(liveness.events)[-5:]):
+            t = datetime.fromtimestamp(ts / 1e9).strftime('%H:%M:%S')
+            st.caption(f"`{t}` {device} {state} ({silent_s:.0f}s)")
+
+def stale_badge(liveness, device):
+    """Badge HTML untuk card jika device sudah tidak mengirim data ('' jika masih live)"""
+    if not liveness.is_stale(device):
+        return ""
+    return f"<div class='stale-badge'>⏸️ STALE · last seen {liveness.silent_for(device):.0f}s ago</div>"
+
+def render_overload_status(shedder):
+    """Counter load shedding; warning jika update terakhir dipangkas"""
+    stats = shedder.stats()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("🛡️ Shed", stats['shed'])
+    with col2:
+        st.metric("⭐ Priority", stats['anomalies'] + stats['class_changes'],
+                  help="Reading anomaly / perubahan kelas prediksi, selalu diteruskan")
+    if stats['last_shed']:
+        sampling = f", sampling {stats['keep_ratio']:.0%}" if stats['keep_ratio'] < 1 else ""
+        st.warning(f"🛡️ Overload: {stats['last_shed']} of {stats['last_received']} readings "
+                   f"shed in the last update{sampling}")
+    if stats['shed']:
+        top = ", ".join(f"{device} ({count})" for device, count in shedder.top_shed_devices(3))
+        st.caption(f"{stats['rate_limited']} rate-limited · {stats['sampled_out']} sampled out · top: {top}")
+
+def render_connection_health(supervisor):
+    """State koneksi, countdown retry, dan metrik outage dari supervisor"""
+    stats = supervisor.stats()
+    if stats['down_for_s'] is not None:
+        detail = f"🔌 {stats['state']} · down {stats['down_for_s']:.0f}s"
+        if stats['next_retry_s'] is not None:
+            detail += f" · retry #{stats['attempts'] + 1} in {stats['next_retry_s']:.1f}s"
+        st.caption(detail)
     
-    return data
+    with st.expander("🔌 Connection Health"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Outages", stats['outages'])
+        with col2:
+            st.metric("Downtime", f"{stats['total_downtime_s']:.0f}s")
+        if stats['last_outage_s'] is not None:
+            st.caption(f"Last outage: {stats['last_outage_s']:.1f}s · longest: {stats['longest_outage_s']:.1f}s")
+        if stats['last_handshake_s'] is not None:
+            st.caption(f"Last connect handshake: {stats['last_handshake_s'] * 1000:.0f} ms")
+        st.caption(f"Recovery after broker returns: ≤ {stats['recovery_bound_s']:.0f}s "
+                   f"({stats['total_attempts']} connect attempts so far)")
+        
+        for ts, state, detail in reversed(list(supervisor.events)[-5:]):
+            t = datetime.fromtimestamp(ts / 1e9).strftime('%H:%M:%S')
+            st.caption(f"`{t}` {state} {detail}")
 
-def get_dataframe():
-    """Convert buffer to DataFrame"""
+def get_dataframe(lo=0, hi=None):
+    """Convert slice [lo, hi) of the buffer to DataFrame"""
     if len(st.session_state.data_buffer) > 0:
-        return pd.DataFrame(list(st.session_state.data_buffer))
+        return st.session_state.data_buffer.to_dataframe(lo, hi)
+    import pandas as pd
     return pd.DataFrame()
 
-def export_to_csv(df):
-    """Export dataframe to CSV for download"""
+def cached_view(view, version, compute):
+    """Hasil ``compute()`` dari view cache proses (dipakai bersama session dengan data yang sama)"""
+    if not VIEW_CACHE_ENABLED:
+        return compute()
+    return get_view_cache().get(view, version, compute)
+
+def get_view_bounds(range_mode, custom_range=None):
+    """Resolve selected time range ke posisi (lo, hi) di buffer"""
+    buffer = st.session_state.data_buffer
+    preset = TIME_RANGE_PRESETS[range_mode]
+    
+    if len(buffer) == 0:
+        return 0, 0
+    if preset is None:
+        return buffer.tail_bounds(MAX_DATA_POINTS)
+    if preset == 'custom':
+        if custom_range is None:
+            return buffer.tail_bounds(MAX_DATA_POINTS)
+        return buffer.locate(*custom_range)
+    
+    # Window relatif terhadap reading terakhir
+    _, last = buffer.time_bounds()
+    return buffer.locate(last - int(preset.total_seconds() * 1e9), None)
+
+def get_rollup_view(range_mode, custom_range=None):
+    """Agregat untuk bagian window yang lebih tua dari data raw (None jika tidak ada)"""
+    buffer = st.session_state.data_buffer
+    preset = TIME_RANGE_PRESETS[range_mode]
+    
+    if preset is None or len(buffer) == 0:
+        return None
+    if preset == 'custom':
+        if custom_range is None:
+            return None
+        return buffer.rollup_columns(*custom_range)
+    
+    _, last = buffer.time_bounds()
+    return buffer.rollup_columns(last - int(preset.total_seconds() * 1e9), None)
+
+def export_to_csv(columns):
+    """Export kolom view ke CSV (dipanggil saat tombol download diklik)"""
+    import pandas as pd
     csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
+    pd.DataFrame(columns).to_csv(csv_buffer, index=False)
     return csv_buffer.getvalue()
 
+def prepare_table(frame):
+    """Format satu halaman tabel untuk ditampilkan (vectorized, tanpa Styler)"""
+    if 'anomaly_flag' in frame.columns:
+        frame.insert(0, 'status', np.where(frame['anomaly_flag'].to_numpy(), '🔴 Anomaly', '🟢 Normal'))
+    for col in ('timestamp', 'device_ts'):
+        if col in frame.columns:
+            frame[col] = format_timestamps(frame[col])
+    for col in ('temperature', 'humidity', 'confidence'):
+        if col in frame.columns:
+            frame[col] = frame[col].round(1)
+    return frame
+
+def render_paged_table(key, lo, hi, anomalies_only=False, columns=None):
+    """Tabel server-side paginated: hanya halaman yang terlihat diambil dari buffer"""
+    buffer = st.session_state.data_buffer
+    total = buffer.anomaly_count(lo, hi) if anomalies_only else hi - lo
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        page_size = st.selectbox("Rows per page", TABLE_PAGE_SIZES, key=f"{key}_page_size")
+    n_pages = max(1, -(-total // page_size))
+    # Data bisa menyusut (clear / ganti window), jaga halaman tetap valid
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = n_pages
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+    with col3:
+        order = st.selectbox("Order", ["Newest first", "Oldest first"], key=f"{key}_order")
+    
+    page_df, total = buffer.page(lo, hi, page - 1, page_size, order == "Newest first",
+                                 anomalies_only, columns)
+    st.dataframe(prepare_table(page_df), use_container_width=True, hide_index=True, height=500)
+    
+    first = (page - 1) * page_size
+    st.caption(f"📊 Showing {first + 1 if total else 0}-{first + len(page_df)} of {total} records "
+               f"(page {page}/{n_pages})")
+    return total
+
 def create_gauge(value, title, range_max, color, threshold_value=None):
     """Create enhanced gauge chart"""
     fig = go.Figure(go.Indicator(
@@ -353,8 +545,15 @@ def create_confidence_gauge(confidence):
     )
     return fig
 
-def create_timeseries_chart(df):
-    """Create time series chart for temperature and humidity"""
+@st.cache_resource
+def get_timeseries_layout():
+    """Layout chart historis (subplot, threshold, axis) dibangun sekali per proses.
+
+    make_subplots + add_hline adalah bagian termahal dari chart ini, sementara
+    hasilnya sama untuk setiap render. Disimpan sebagai dict plotly JSON.
+    """
+    from plotly.subplots import make_subplots
+    
     fig = make_subplots(
         rows=2, cols=1,
         subplot_titles=('🌡️ Temperature Over Time', '💧 Humidity Over Time'),
@@ -362,41 +561,11 @@ def create_timeseries_chart(df):
         specs=[[{"secondary_y": False}], [{"secondary_y": False}]]
     )
     
-    # Temperature trace
-    fig.add_trace(
-        go.Scatter(
-            x=df['timestamp'],
-            y=df['temperature'],
-            mode='lines+markers',
-            name='Temperature',
-            line=dict(color='#FF6B6B', width=2),
-            marker=dict(size=6),
-            fill='tozeroy',
-            fillcolor='rgba(255, 107, 107, 0.2)'
-        ),
-        row=1, col=1
-    )
-    
-    # Humidity trace
-    fig.add_trace(
-        go.Scatter(
-            x=df['timestamp'],
-            y=df['humidity'],
-            mode='lines+markers',
-            name='Humidity',
-            line=dict(color='#4ECDC4', width=2),
-            marker=dict(size=6),
-            fill='tozeroy',
-            fillcolor='rgba(78, 205, 196, 0.2)'
-        ),
-        row=2, col=1
-    )
-    
-    # Add threshold lines
+    # Add threshold lines (subplot belum punya trace, jangan di-skip)
     fig.add_hline(y=TEMP_COLD_MAX, line_dash="dash", line_color="cyan", 
-                  annotation_text="Cold Threshold", row=1, col=1)
+                  annotation_text="Cold Threshold", row=1, col=1, exclude_empty_subplots=False)
     fig.add_hline(y=TEMP_NORMAL_MAX, line_dash="dash", line_color="orange", 
-                  annotation_text="Hot Threshold", row=1, col=1)
+                  annotation_text="Hot Threshold", row=1, col=1, exclude_empty_subplots=False)
     
     fig.update_xaxes(title_text="Time", row=2, col=1, color='white')
     fig.update_yaxes(title_text="Temperature (°C)", row=1, col=1, color='white')
@@ -410,9 +579,179 @@ def create_timeseries_chart(df):
         font={'color': 'white'},
         hovermode='x unified'
     )
+    return fig.layout.to_plotly_json()
+
+def create_timeseries_chart(df, rollups=None, forecast=None, stale=None):
+    """Create time series chart for temperature and humidity (+ agregat data lama, forecast band).
+
+    ``stale`` = (device, last_seen ns, until ns): periode tanpa data sampai ``until`` diarsir.
+    """
+    times = to_local_datetime(df['timestamp'].to_numpy())
+    traces = []
+    
+    # Data di luar raw window: rata-rata per bucket, garis putus-putus
+    if rollups is not None:
+        rollup_times = to_local_datetime(rollups['timestamp'])
+        label = f"{RETENTION_ROLLUP_INTERVAL}s avg"
+        traces.append(go.Scatter(
+            x=rollup_times, y=rollups['temperature'], mode='lines',
+            name=f'Temperature ({label})', line=dict(color='#FF6B6B', width=1, dash='dot'),
+            xaxis='x', yaxis='y'
+        ))
+        traces.append(go.Scatter(
+            x=rollup_times, y=rollups['humidity'], mode='lines',
+            name=f'Humidity ({label})', line=dict(color='#4ECDC4', width=1, dash='dot'),
+            xaxis='x2', yaxis='y2'
+        ))
+    
+    # Temperature trace (subplot atas)
+    temperature = go.Scatter(
+        x=times,
+        y=df['temperature'],
+        mode='lines+markers',
+        name='Temperature',
+        line=dict(color='#FF6B6B', width=2),
+        marker=dict(size=6),
+        fill='tozeroy',
+        fillcolor='rgba(255, 107, 107, 0.2)',
+        xaxis='x', yaxis='y'
+    )
     
+    # Humidity trace (subplot bawah)
+    humidity = go.Scatter(
+        x=times,
+        y=df['humidity'],
+        mode='lines+markers',
+        name='Humidity',
+        line=dict(color='#4ECDC4', width=2),
+        marker=dict(size=6),
+        fill='tozeroy',
+        fillcolor='rgba(78, 205, 196, 0.2)',
+        xaxis='x2', yaxis='y2'
+    )
+    
+    traces += [temperature, humidity]
+    
+    # Forecast band: upper (tanpa garis) lalu lower dengan fill ke upper, lalu mean
+    if forecast is not None:
+        forecast_times = to_local_datetime(forecast['timestamp'])
+        for field, color, fill, axes in (('temperature', '#FF6B6B', 'rgba(255, 107, 107, 0.15)', ('x', 'y')),
+                                         ('humidity', '#4ECDC4', 'rgba(78, 205, 196, 0.15)', ('x2', 'y2'))):
+            traces.append(go.Scatter(
+                x=forecast_times, y=forecast[f'{field}_upper'], mode='lines', line=dict(width=0),
+                showlegend=False, hoverinfo='skip', xaxis=axes[0], yaxis=axes[1]
+            ))
+            traces.append(go.Scatter(
+                x=forecast_times, y=forecast[f'{field}_lower'], mode='lines', line=dict(width=0),
+                fill='tonexty', fillcolor=fill, showlegend=False, hoverinfo='skip',
+                xaxis=axes[0], yaxis=axes[1]
+            ))
+            traces.append(go.Scatter(
+                x=forecast_times, y=forecast[field], mode='lines',
+                name=f"{field.capitalize()} forecast", line=dict(color=color, width=2, dash='dash'),
+                xaxis=axes[0], yaxis=axes[1]
+            ))
+    
+    # go.Figure meng-copy layout, dict cache tidak ikut berubah
+    fig = go.Figure(data=traces, layout=get_timeseries_layout())
+    
+    if stale is not None:
+        device, last_seen, until = stale
+        x0, x1 = to_local_datetime(np.array([last_seen, until]))
+        for xref, yref in (('x', 'y domain'), ('x2', 'y2 domain')):
+            fig.add_shape(type='rect', xref=xref, yref=yref, x0=x0, x1=x1, y0=0, y1=1,
+                          fillcolor='rgba(136, 136, 136, 0.25)', line_width=0, layer='below')
+        fig.add_annotation(x=x1, y=1, xref='x', yref='y domain', xanchor='right', yanchor='bottom',
+                           text=f"⏸️ {device} stale", showarrow=False, font={'color': '#bbbbbb'})
     return fig
 
+def create_fleet_heatmap(fleet):
+    """Satu figure berisi 4 heatmap grid (temperature, humidity, prediction, state), satu sel per device.
+
+    Hover text dan customdata dibangun sekali untuk semua panel dengan
+    operasi array, bukan satu figure / trace per device.
+    """
+    n = len(fleet['device_id'])
+    shape = grid_shape(n)
+    silent_s = (time.time_ns() - fleet['timestamp']) / 1e9
+    labels = np.array(CATEGORIES + ("-",), dtype=str)[fleet['prediction_code']]
+    text = to_grid(np.char.add(np.char.add(np.char.add(fleet['device_id'], "<br>"), np.char.add(labels, " · ")),
+                               np.array(STATES, dtype=str)[fleet['state']]), shape, "")
+    customdata = np.stack([to_grid(fleet['temperature'], shape, np.nan),
+                           to_grid(fleet['humidity'], shape, np.nan),
+                           to_grid(silent_s, shape, np.nan)], axis=-1)
+    hover = ("<b>%{text}</b><br>🌡️ %{customdata[0]:.1f}°C · 💧 %{customdata[1]:.1f}%"
+             "<br>last seen %{customdata[2]:.0f}s ago<extra></extra>")
+    
+    def discrete(colors):
+        # Colorscale bertingkat untuk kode integer 0..len(colors)-1
+        k = len(colors)
+        return [[edge / k, color] for i, color in enumerate(colors) for edge in (i, i + 1)]
+    
+    panels = (
+        (fleet['temperature'], dict(colorscale=[[0, '#4facfe'], [0.5, '#43e97b'], [1, '#fa709a']],
+                                    zmin=TEMP_COLD_MAX - 10, zmax=TEMP_NORMAL_MAX + 10,
+                                    colorbar=dict(x=0.46, len=0.45, y=0.78, title="°C"))),
+        (fleet['humidity'], dict(colorscale='Teal', zmin=0, zmax=100,
+                                 colorbar=dict(x=1.0, len=0.45, y=0.78, title="%"))),
+        (fleet['prediction_code'].astype(np.float64),
+         dict(colorscale=discrete(['#4facfe', '#43e97b', '#fa709a']), zmin=-0.5, zmax=2.5, showscale=False)),
+        (fleet['state'].astype(np.float64),
+         dict(colorscale=discrete(['#43e97b', '#FF6B6B', '#888888']), zmin=-0.5, zmax=2.5, showscale=False)),
+    )
+    titles = ("🌡️ Temperature", "💧 Humidity",
+              "🏷️ Prediction (" + " · ".join(CATEGORIES) + ")", "🚦 State (" + " · ".join(STATES) + ")")
+    domains = (([0, 0.45], [0.55, 1]), ([0.55, 1], [0.55, 1]), ([0, 0.45], [0, 0.45]), ([0.55, 1], [0, 0.45]))
+    
+    traces, layout = [], {}
+    for i, ((values, style), title, (x_domain, y_domain)) in enumerate(zip(panels, titles, domains), start=1):
+        suffix = "" if i == 1 else str(i)
+        traces.append(go.Heatmap(
+            z=to_grid(values, shape, np.nan), text=text, customdata=customdata, hovertemplate=hover,
+            xgap=1, ygap=1, xaxis=f"x{suffix}", yaxis=f"y{suffix}", **style
+        ))
+        axis = dict(showticklabels=False, showgrid=False, zeroline=False)
+        layout[f"xaxis{suffix}"] = dict(axis, domain=x_domain, anchor=f"y{suffix}")
+        layout[f"yaxis{suffix}"] = dict(axis, domain=y_domain, anchor=f"x{suffix}", autorange='reversed')
+        layout.setdefault('annotations', []).append(dict(
+            text=title, x=sum(x_domain) / 2, y=y_domain[1], xref='paper', yref='paper',
+            xanchor='center', yanchor='bottom', showarrow=False, font={'color': 'white'}
+        ))
+    
+    layout.update(
+        height=int(min(1200, max(420, 2 * shape[0] * 14 + 120))),
+        margin=dict(l=10, r=10, t=40, b=10),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font={'color': 'white'},
+    )
+    return go.Figure(data=traces, layout=layout)
+
+def render_fleet_overview(buffer, liveness):
+    """Grid nilai terakhir semua device dengan filter site/state dan pilihan sort"""
+    snapshot = fleet_snapshot(buffer, liveness.stale)
+    st.markdown("### 🛰️ Fleet Overview")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort = st.selectbox("Sort", list(SORT_KEYS), key="fleet_sort")
+    with col2:
+        sites = sorted(set(snapshot['site'].tolist()))
+        selected_sites = st.multiselect("Site", sites, key="fleet_sites") if sites != [NO_SITE] else None
+    with col3:
+        selected_states = st.multiselect("State", list(STATES), key="fleet_states")
+    
+    fleet = select_fleet(snapshot, selected_sites, selected_states, sort)
+    counts = np.bincount(fleet['state'], minlength=len(STATES))
+    classes = np.bincount(fleet['prediction_code'][fleet['prediction_code'] >= 0], minlength=len(CATEGORIES))
+    st.caption(f"🛰️ {len(fleet['device_id'])} of {len(snapshot['device_id'])} devices · "
+               + " · ".join(f"{state} {count}" for state, count in zip(STATES, counts.tolist())) + " · "
+               + " / ".join(f"{label} {count}" for label, count in zip(CATEGORIES, classes.tolist())))
+    if len(fleet['device_id']) == 0:
+        st.info("🔎 No devices match the selected filters")
+        return
+    st.plotly_chart(create_fleet_heatmap(fleet), use_container_width=True)
+
 def create_prediction_distribution(df):
     """Create pie chart for prediction distribution"""
     if 'prediction' not in df.columns or df['prediction'].empty:
@@ -455,17 +794,15 @@ def create_prediction_distribution(df):
     
     return fig
 
-def create_anomaly_timeline(df):
+def create_anomaly_timeline(anomalies):
     """Create timeline of anomalies"""
-    anomalies = df[df['anomaly_flag'] == True].copy()
-    
     if anomalies.empty:
         return None
     
     fig = go.Figure()
     
     fig.add_trace(go.Scatter(
-        x=anomalies['timestamp'],
+        x=to_local_datetime(anomalies['timestamp'].to_numpy()),
         y=[1] * len(anomalies),
         mode='markers+text',
         marker=dict(
@@ -503,6 +840,7 @@ def create_anomaly_timeline(df):
 # =====================================================
 def main():
     # Header
+    mark_section("header")
     st.markdown("""
     <h1 style='text-align: center; color: white;'>
         🌡️ IoT Real-time MQTT Dashboard
@@ -514,7 +852,11 @@ def main():
     
     st.markdown("---")
     
+    mark_section("session")
+    init_session()
+    
     # Sidebar
+    mark_section("sidebar")
     with st.sidebar:
         st.markdown("## ⚙️ Dashboard Control")
         
@@ -535,10 +877,18 @@ def main():
                 </div>
             """, unsafe_allow_html=True)
             st.error("Attempting to reconnect...")
+            # Non-blocking: hanya membangunkan thread supervisor
             if st.button("🔄 Reconnect MQTT"):
                 st.session_state.mqtt_client.connect()
                 st.rerun()
         
+        supervisor = getattr(st.session_state.mqtt_client, 'supervisor', None)
+        if supervisor is not None:
+            render_connection_health(supervisor)
+        
+        # Diisi setelah ingest + poll di bawah, supaya sama dengan banner offline
+        liveness_slot = st.empty()
+        
         st.markdown("---")
         
         # Statistics
@@ -549,9 +899,59 @@ def main():
         with col2:
             st.metric("⚠️ Alerts", st.session_state.alert_count)
         
+        seq_stats = st.session_state.mqtt_client.tracker.totals()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("♻️ Duplicates", seq_stats['duplicates'])
+        with col2:
+            st.metric("📉 Lost", seq_stats['lost'])
+        
+        shedder = st.session_state.shedder
+        if shedder is None and INGEST_MODE == "service":
+            shedder = get_ingest_service().shedder
+        if shedder is not None:
+            render_overload_status(shedder)
+        
+        usage = st.session_state.data_buffer.memory_usage()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("🧠 Memory", f"{usage['bytes'] / 2**20:.1f} MB")
+        with col2:
+            st.metric("📟 Devices", usage['devices'])
+        if usage['budget_bytes'] is not None:
+            st.caption(f"Budget {usage['budget_bytes'] / 2**20:.0f} MB/session · "
+                       f"all sessions {total_memory_usage() / 2**20:.1f} MB · "
+                       f"{usage['rows']} raw + {usage['rollup_rows']} aggregated rows · "
+                       f"{usage['evicted_devices']} idle devices evicted")
+        
+        predictor = get_predictor(load=False)
+        cache = predictor.stats() if predictor is not None else None
+        if cache is not None and cache['hit_rate'] is not None:
+            st.caption(f"🤖 Prediction cache: {cache['hit_rate']:.0%} hit rate · "
+                       f"{cache['size']} entries · {cache['model_calls']} model calls")
+        
+        if VIEW_CACHE_ENABLED:
+            views = get_view_cache().stats()
+            if views['hit_rate'] is not None:
+                st.caption(f"🗂️ View cache: {views['hit_rate']:.0%} shared · {views['entries']} views · "
+                           f"{views['bytes'] / 2**20:.1f} MB · {views['misses']} computed")
+        
+        calibration = get_calibration().stats()
+        if calibration['source'] is not None:
+            st.caption(f"📐 Calibration: {calibration['devices']} devices · {calibration['sites']} sites · "
+                       f"{calibration['profiles']} profiles")
+        
         if st.session_state.last_update:
             st.caption(f"⏰ Last Update: {st.session_state.last_update.strftime('%H:%M:%S')}")
         
+        # Ingest lag = waktu terima dashboard - timestamp device
+        lag_ns = st.session_state.data_buffer.ingest_lag_ns(
+            *st.session_state.data_buffer.tail_bounds(MAX_DATA_POINTS)
+        )
+        if len(lag_ns) > 0:
+            st.caption(f"⏱️ Ingest Lag: p50 {np.median(lag_ns) / 1e6:.0f} ms · "
+                       f"p95 {np.percentile(lag_ns, 95) / 1e6:.0f} ms")
+        
         st.markdown("---")
         
         # MQTT Configuration
@@ -560,9 +960,11 @@ def main():
         st.text_input("Port", value=str(MQTT_PORT), disabled=True)
         
         with st.expander("📋 Topics"):
-            st.code(f"Temperature: {MQTT_TOPIC_TEMP}")
-            st.code(f"Humidity: {MQTT_TOPIC_HUMIDITY}")
-            st.code(f"Combined: {MQTT_TOPIC_COMBINED}")
+            for pattern, schema in MQTT_TOPIC_ROUTES:
+                st.code(f"{schema.capitalize()}: {pattern}")
+        
+        if INGEST_MODE == "service" and get_ingest_service().stream_server is not None:
+            st.caption(f"📺 Live stream: http://{STREAM_HOST}:{STREAM_PORT}/")
         
         st.markdown("---")
         
@@ -580,29 +982,68 @@ def main():
         
         if st.button("🗑️ Clear Data", use_container_width=True):
             st.session_state.data_buffer.clear()
+            st.session_state.liveness.clear()
             st.session_state.total_messages = 0
             st.session_state.alert_count = 0
             st.rerun()
         
+        show_fleet = st.checkbox("🛰️ Fleet Overview", value=True,
+                                 help="Grid semua device (tampil jika ada lebih dari satu device)")
         auto_refresh = st.checkbox("🔁 Auto Refresh", value=True)
         refresh_speed = st.slider("⏱️ Refresh Rate (sec)", 1, 10, UPDATE_INTERVAL)
         
         st.markdown("---")
         
+        # Time Range / Zoom
+        st.header("🔎 Time Range")
+        range_mode = st.selectbox("Window", list(TIME_RANGE_PRESETS.keys()))
+        custom_range = None
+        bounds = st.session_state.data_buffer.time_bounds()
+        if bounds is not None:
+            # Zoom juga bisa ke periode yang tinggal agregat
+            bounds = (st.session_state.data_buffer.history_start(), bounds[1])
+        if TIME_RANGE_PRESETS[range_mode] == 'custom':
+            if bounds is not None and bounds[1] - bounds[0] >= 1_000_000_000:
+                first, last = (datetime.fromtimestamp(int(t) // 1_000_000_000) for t in bounds)
+                selected = st.slider(
+                    "Zoom", min_value=first, max_value=last,
+                    value=(max(first, last - timedelta(minutes=5)), last),
+                    format="HH:mm:ss"
+                )
+                # Slider bekerja per detik, end dibuat inklusif sampai akhir detik
+                custom_range = (int(selected[0].timestamp()) * 1_000_000_000,
+                                int(selected[1].timestamp()) * 1_000_000_000 + 999_999_999)
+            else:
+                st.info("Not enough history to select a range yet")
+        
+        view_lo, view_hi = get_view_bounds(range_mode, custom_range)
+        st.caption(f"🔍 {view_hi - view_lo} of {len(st.session_state.data_buffer)} readings in view")
+        
+        st.markdown("---")
+        
         # Export Data
+        mark_section("export")
         st.header("💾 Data Export")
-        df_export = get_dataframe()
-        if not df_export.empty:
-            csv_data = export_to_csv(df_export)
+        n_export = view_hi - view_lo
+        if n_export > 0:
+            # CSV baru dibuat saat diklik, bukan di setiap rerun
+            export_columns = st.session_state.data_buffer.columns(view_lo, view_hi)
             st.download_button(
                 label="📥 Download Log (CSV)",
-                data=csv_data,
+                data=lambda: export_to_csv(export_columns),
                 file_name=f"iot_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv",
                 use_container_width=True,
                 type="primary"
             )
-            st.caption(f"📊 {len(df_export)} records ready for export")
+            st.download_button(
+                label="📦 Download Archive (compressed)",
+                data=lambda: to_archive_bytes(export_columns),
+                file_name=f"iot_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.iotarc",
+                mime="application/octet-stream",
+                use_container_width=True
+            )
+            st.caption(f"📊 {n_export} records ready for export")
         else:
             st.info("No data to export yet")
         
@@ -610,35 +1051,65 @@ def main():
         st.caption("💡 Dashboard will auto-refresh based on selected rate")
     
     # Main Content Area
-    # Add new data if not paused and MQTT connected
-    if not st.session_state.paused and st.session_state.mqtt_client.connected:
-        data = get_mqtt_data()
-        if data is not None:
-            st.session_state.data_buffer.append(data)
-            st.session_state.total_messages += 1
+    # Add new data if not paused (pesan yang masuk saat pause tetap antri)
+    mark_section("ingest")
+    liveness = st.session_state.liveness
+    liveness_events = []
+    if not st.session_state.paused:
+        batch = skip_recovered(get_mqtt_data())
+        if batch is not None:
+            # Semua reading (termasuk yang nanti di-shed) menandakan device masih hidup
+            liveness_events += liveness.observe(batch['device_id'], batch['timestamp'])
+            st.session_state.total_messages += len(batch['timestamp'])
+            st.session_state.alert_count += int(batch['alert_triggered'].sum())
             st.session_state.last_update = datetime.now()
-            
-            # Update anomaly status
-            if data['anomaly_flag'] and st.session_state.manual_alert_enabled:
-                st.session_state.alert_count += 1
-                st.session_state.anomaly_detected = True
-            else:
-                st.session_state.anomaly_detected = False
+            # Update anomaly status dari reading terakhir
+            st.session_state.anomaly_detected = bool(batch['alert_triggered'][-1])
+            if WAL_ENABLED and INGEST_MODE == "session":
+                # Log berisi semua reading yang diterima (sebelum shedding per session),
+                # reading yang sudah ditulis session lain dibuang recorder
+                get_session_recorder().append(batch)
+            if st.session_state.shedder is not None:
+                # Depth = reading yang antri sejak rerun sebelumnya
+                batch = st.session_state.shedder.shed(batch, depth=len(batch['timestamp']))
+        if batch is not None:
+            st.session_state.data_buffer.extend(batch)
+            st.session_state.forecaster.update(batch)
+        # Saat pause data tidak di-drain, jadi device tidak dicek (bukan berarti diam)
+        went_offline = liveness.poll()
+        liveness_events += went_offline
+        if st.session_state.manual_alert_enabled:
+            st.session_state.alert_count += len(went_offline)
+    with liveness_slot.container():
+        render_device_liveness(liveness)
+    
+    mark_section("dataframe")
+    # Tunggu warmup pandas selesai sebelum membangun figure (DataFrame bisa
+    # datang dari cache): validator plotly memakai pandas dari sys.modules
+    import pandas  # noqa: F401
+    buffer = st.session_state.data_buffer
+    view_lo, view_hi = get_view_bounds(range_mode, custom_range)
+    rollups = get_rollup_view(range_mode, custom_range)
+    # Key view cache dari isi window (bukan posisi buffer session ini): session
+    # dengan stream yang sama berbagi DataFrame, statistik dan figure
+    window = (range_mode, custom_range)
+    version = data_version(buffer.timestamps()[view_lo:view_hi])
     
-    df = get_dataframe()
+    def view_frame():
+        return cached_view(('frame', window), version, lambda: get_dataframe(view_lo, view_hi))
     
-    if df.empty:
+    if len(buffer) == 0:
         st.warning("⏳ Waiting for MQTT data stream...")
         st.info("🔄 Please ensure your IoT devices are publishing to the MQTT broker.")
         st.markdown(f"""
         **Expected Topics:**
         - `{MQTT_TOPIC_TEMP}` - Temperature data (float)
         - `{MQTT_TOPIC_HUMIDITY}` - Humidity data (float)
-        - `{MQTT_TOPIC_COMBINED}` - Combined JSON: `{{"temperature": 25.5, "humidity": 60.0}}`
+        - `{MQTT_TOPIC_COMBINED}` - Combined JSON: `{{"temperature": 25.5, "humidity": 60.0, "sensor_id": "esp32_01", "seq": 42}}`
         """)
     else:
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        latest = df.iloc[-1]
+        latest = buffer.latest()
+        latest_stale = liveness.is_stale(latest['device_id'])
         
         # Alert Banner (if anomaly detected)
         if st.session_state.anomaly_detected and st.session_state.manual_alert_enabled:
@@ -650,17 +1121,31 @@ def main():
             )
             st.markdown("<br>", unsafe_allow_html=True)
         
+        # Device yang berhenti mengirim data + forecast threshold crossing (device live saja)
+        if st.session_state.manual_alert_enabled:
+            render_liveness_alerts(liveness, liveness_events)
+            render_forecast_warnings(st.session_state.forecaster.crossings(time.time_ns(), exclude=liveness.stale))
+        
+        # Fleet: nilai terakhir semua device dalam satu figure
+        if show_fleet and buffer.device_count() > 1:
+            mark_section("fleet")
+            render_fleet_overview(buffer, liveness)
+            st.markdown("---")
+            st.markdown(f"### 📟 Latest Reading · {latest['device_id']}")
+        
         # Row 1: Current Status Cards
+        mark_section("cards")
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            category, color = get_temperature_category(latest['temperature'])
+            category = latest['prediction']
             css_class = "status-cold" if category == "Dingin" else "status-normal" if category == "Normal" else "status-hot"
             st.markdown(f"""
                 <div class='{css_class}'>
                     <h3 style='margin: 0;'>🌡️ Status</h3>
                     <h1 style='margin: 10px 0;'>{category}</h1>
                     <p style='margin: 0;'>{latest['temperature']:.1f}°C</p>
+                    {stale_badge(liveness, latest['device_id'])}
                 </div>
             """, unsafe_allow_html=True)
         
@@ -670,6 +1155,7 @@ def main():
                     <h3 style='margin: 0;'>💧 Humidity</h3>
                     <h1 style='margin: 10px 0;'>{latest['humidity']:.1f}%</h1>
                     <p style='margin: 0;'>Current Level</p>
+                    {stale_badge(liveness, latest['device_id'])}
                 </div>
             """, unsafe_allow_html=True)
         
@@ -679,7 +1165,7 @@ def main():
                 <div class='metric-card' style='background: linear-gradient(135deg, {confidence_color} 0%, {confidence_color} 100%);'>
                     <h3 style='margin: 0;'>📊 Confidence</h3>
                     <h1 style='margin: 10px 0;'>{latest['confidence']}%</h1>
-                    <p style='margin: 0;'>Sensor Reliability</p>
+                    <p style='margin: 0;'>Model Probability</p>
                 </div>
             """, unsafe_allow_html=True)
         
@@ -698,94 +1184,123 @@ def main():
         st.markdown("<br>", unsafe_allow_html=True)
         
         # Row 2: Gauges
+        mark_section("gauges")
         col1, col2, col3 = st.columns(3)
         
-        with col1:
+        def create_gauges():
             _, temp_color = get_temperature_category(latest['temperature'])
-            st.plotly_chart(
-                create_gauge(latest['temperature'], "🌡️ Temperature", 50, temp_color, TEMP_NORMAL_MAX),
-                use_container_width=True
-            )
-        
-        with col2:
-            st.plotly_chart(
-                create_gauge(latest['humidity'], "💧 Humidity", 100, "#4ECDC4", 70),
-                use_container_width=True
-            )
-        
-        with col3:
-            st.plotly_chart(
+            return (
+                create_gauge(latest['temperature'], "🌡️ Temperature" + (" ⏸️ stale" if latest_stale else ""),
+                             50, temp_color, TEMP_NORMAL_MAX),
+                create_gauge(latest['humidity'], "💧 Humidity" + (" ⏸️ stale" if latest_stale else ""),
+                             100, "#4ECDC4", 70),
                 create_confidence_gauge(latest['confidence']),
-                use_container_width=True
             )
         
-        st.markdown("---")
-        
-        # Row 3: Time Series Charts
-        st.markdown("### 📈 Historical Trends")
-        st.plotly_chart(create_timeseries_chart(df), use_container_width=True)
+        gauges = cached_view(('gauges', latest['device_id'], latest_stale), (int(latest['timestamp']),),
+                             create_gauges)
+        for col, gauge in zip((col1, col2, col3), gauges):
+            with col:
+                st.plotly_chart(gauge, use_container_width=True)
         
         st.markdown("---")
         
-        # Row 4: Distribution & Anomalies
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            pie_fig = create_prediction_distribution(df)
-            if pie_fig:
-                st.plotly_chart(pie_fig, use_container_width=True)
-        
-        with col2:
-            st.markdown("### 📊 Statistical Summary")
-            stats_df = df[['temperature', 'humidity', 'confidence']].describe().round(2)
-            st.dataframe(stats_df, use_container_width=True, height=350)
-        
-        # Anomaly Timeline
-        anomaly_fig = create_anomaly_timeline(df)
-        if anomaly_fig:
+        if view_hi == view_lo:
+            st.info("🔎 No readings in the selected time range")
+            if rollups is not None:
+                st.caption(f"📉 Older than {RETENTION_RAW_WINDOW // 60} min: {RETENTION_ROLLUP_INTERVAL}s averages only")
+                st.plotly_chart(create_timeseries_chart(get_dataframe(view_lo, view_hi), rollups),
+                                use_container_width=True)
+        else:
+            # Row 3: Time Series Charts
+            mark_section("timeseries")
+            st.markdown("### 📈 Historical Trends")
+            # Device offline: tidak ada forecast, periode tanpa data diarsir
+            # Arsir sampai detik ini (bukan ns) supaya session dalam detik yang sama berbagi figure
+            stale = (latest['device_id'], liveness.devices[latest['device_id']].last_seen,
+                     time.time_ns() // 1_000_000_000 * 1_000_000_000) if latest_stale else None
+            forecast = st.session_state.forecaster.forecast(latest['device_id']) if not latest_stale else None
+            # Agregat, forecast (state forecaster session) dan arsiran stale ikut menentukan versi figure
+            rollup_version = (data_version(rollups['timestamp'], rollups['temperature'], rollups['humidity'])
+                              if rollups is not None else data_version(()))
+            forecast_version = data_version(*forecast.values()) if forecast is not None else data_version(())
+            timeseries = cached_view(
+                ('timeseries', window, latest['device_id']),
+                (version, rollup_version, forecast_version, stale or ()),
+                lambda: create_timeseries_chart(view_frame(), rollups, forecast, stale)
+            )
+            st.plotly_chart(timeseries, use_container_width=True)
+            if forecast is not None:
+                st.caption(f"🔮 Forecast {latest['device_id']}: next {FORECAST_HORIZON // 60} min "
+                           f"(Holt trend, band ±{FORECAST_BAND_Z}σ)")
+            if rollups is not None:
+                st.caption(f"📉 Data older than {RETENTION_RAW_WINDOW // 60} min is shown as "
+                           f"{RETENTION_ROLLUP_INTERVAL}s averages (dotted)")
+            
             st.markdown("---")
-            st.plotly_chart(anomaly_fig, use_container_width=True)
-        
-        st.markdown("---")
-        
-        # Row 5: Data Tables
-        tab1, tab2, tab3 = st.tabs(["📋 Recent Readings", "⚠️ Anomalies", "📊 All Data"])
-        
-        with tab1:
-            st.markdown("### Latest 15 Readings")
-            recent_df = df.tail(15).sort_values('timestamp', ascending=False).copy()
-            recent_df['timestamp'] = recent_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-            recent_df['temperature'] = recent_df['temperature'].round(1)
-            recent_df['humidity'] = recent_df['humidity'].round(1)
-            recent_df['confidence'] = recent_df['confidence'].round(1)
             
-            # Color code the display
-            def highlight_anomalies(row):
-                if row['anomaly_flag']:
-                    return ['background-color: rgba(255, 68, 68, 0.3)'] * len(row)
-                return [''] * len(row)
+            # Row 4: Distribution & Anomalies
+            mark_section("distribution")
+            col1, col2 = st.columns(2)
             
-            styled_df = recent_df.style.apply(highlight_anomalies, axis=1)
-            st.dataframe(styled_df, use_container_width=True, hide_index=True, height=500)
-        
-        with tab2:
-            st.markdown("### Detected Anomalies")
-            anomalies = df[df['anomaly_flag'] == True].copy()
-            if not anomalies.empty:
-                anomalies['timestamp'] = anomalies['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-                anomalies_display = anomalies[['timestamp', 'temperature', 'humidity', 
-                                              'confidence', 'anomaly_reason']].sort_values('timestamp', ascending=False)
-                st.dataframe(anomalies_display, use_container_width=True, hide_index=True, height=500)
-                st.warning(f"⚠️ Total anomalies detected: {len(anomalies)}")
-            else:
-                st.success("✅ No anomalies detected in current data")
-        
-        with tab3:
-            st.markdown("### Complete Dataset")
-            all_data = df.copy()
-            all_data['timestamp'] = all_data['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-            st.dataframe(all_data, use_container_width=True, hide_index=True, height=500)
-            st.caption(f"📊 Total records: {len(all_data)}")
+            with col1:
+                pie_fig = cached_view(('distribution', window), version,
+                                      lambda: create_prediction_distribution(view_frame()))
+                if pie_fig:
+                    st.plotly_chart(pie_fig, use_container_width=True)
+            
+            with col2:
+                mark_section("describe")
+                st.markdown("### 📊 Statistical Summary")
+                stats_df = cached_view(
+                    ('describe', window), version,
+                    lambda: view_frame()[['temperature', 'humidity', 'confidence']].describe().round(2)
+                )
+                st.dataframe(stats_df, use_container_width=True, height=350)
+            
+            # Anomaly Timeline (served from the anomaly position index)
+            mark_section("anomaly_timeline")
+            anomaly_fig = cached_view(('anomalies', window), version,
+                                      lambda: create_anomaly_timeline(buffer.anomaly_dataframe(view_lo, view_hi)))
+            if anomaly_fig:
+                st.markdown("---")
+                st.plotly_chart(anomaly_fig, use_container_width=True)
+            
+            st.markdown("---")
+            
+            # Row 5: Data Tables
+            mark_section("tables")
+            tab1, tab2, tab3 = st.tabs(["📋 Recent Readings", "⚠️ Anomalies", "📊 All Data"])
+            
+            with tab1:
+                st.markdown("### Latest 15 Readings")
+                recent_df, _ = buffer.page(view_lo, view_hi, page=0, page_size=15)
+                st.dataframe(prepare_table(recent_df), use_container_width=True, hide_index=True, height=500)
+            
+            with tab2:
+                st.markdown("### Detected Anomalies")
+                if buffer.anomaly_count(view_lo, view_hi) > 0:
+                    total_anomalies = render_paged_table(
+                        'anomaly_table', view_lo, view_hi, anomalies_only=True,
+                        columns=['timestamp', 'device_id', 'temperature', 'humidity',
+                                 'confidence', 'anomaly_reason']
+                    )
+                    st.warning(f"⚠️ Total anomalies detected: {total_anomalies}")
+                else:
+                    st.success("✅ No anomalies detected in current data")
+            
+            with tab3:
+                st.markdown("### Complete Dataset")
+                render_paged_table('all_data_table', view_lo, view_hi)
+    
+    mark_section(None)
+    
+    # Model prediksi (import sklearn ~1-2 s) dimuat di background setelah render
+    # pertama selesai, jadi tidak berebut GIL dengan render (ingest di thread
+    # render memakai threshold sampai model siap); mode sharded mengklasifikasi
+    # di worker process
+    if INGEST_MODE != "sharded":
+        warm_up_predictor()
     
     # Auto refresh
     if auto_refresh and not st.session_state.paused:
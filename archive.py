@@ -0,0 +1,635 @@
+"""
+Sensor Archive - Compressed Columnar History
+============================================
+Format arsip jangka panjang untuk reading (pengganti log CSV seperti
+``iot_realtime_predictions.csv`` yang ~40 byte teks per reading).
+
+Layout file:
+- header  : ``MAGIC`` + JSON (versi, dictionary label prediction / anomaly reason)
+- chunk   : ``CHUNK_MAGIC`` + meta JSON (zlib) + blok kolom terkompresi zlib.
+            Satu chunk = maksimal ``ARCHIVE_CHUNK_ROWS`` reading dari satu device.
+- footer  : index (JSON zlib) statistik + offset setiap chunk, panjang footer, ``MAGIC``
+
+Encoding kolom di dalam chunk:
+- timestamp       : delta-of-delta (interval teratur -> hampir semua nol)
+- device_ts       : selisih terhadap timestamp, lalu delta
+- seq             : delta
+- temperature,
+  humidity        : fixed-point ``ARCHIVE_DECIMALS`` desimal, lalu delta
+                    (kembali ke float64 mentah jika tidak exact)
+- confidence      : fixed-point 1 desimal
+- prediction,
+  anomaly_reason  : kode dictionary int8
+- flag boolean    : bit-packed
+Integer hasil delta disimpan dengan lebar terkecil yang cukup (int8..int64).
+
+Meta chunk menyimpan device, jumlah baris, min/max waktu, min/max
+temperature & humidity dan jumlah anomaly, jadi range scan melewati chunk
+yang tidak relevan tanpa dekompresi. Writer dan reader berjalan chunk per
+chunk; file tanpa footer (writer crash) tetap bisa dibaca dengan scan
+header chunk.
+
+Jalankan:
+    python archive.py convert iot_realtime_predictions.csv history.iotarc
+    python archive.py info history.iotarc
+    python archive.py scan history.iotarc --start "2025-12-03 18:00" --min-temp 30
+    python archive.py export history.iotarc out.csv --device esp32_01
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from classifier import CATEGORIES, ANOMALY_REASONS, anomaly_codes, encode_labels, decode_labels
+from config import (
+    DEFAULT_DEVICE_ID, ARCHIVE_CHUNK_ROWS, ARCHIVE_MAX_BUFFERED_ROWS,
+    ARCHIVE_COMPRESSION_LEVEL, ARCHIVE_DECIMALS
+)
+from sensor_buffer import COLUMNS, NAT_NS, local_offset_ns
+
+MAGIC = b"IOTARC01"
+CHUNK_MAGIC = b"CHNK"
+FORMAT_VERSION = 1
+CONFIDENCE_DECIMALS = 1
+CSV_BLOCK_ROWS = 65536   # Baris CSV yang di-parse per langkah converter
+
+# =====================================================
+# INTEGER & COLUMN CODECS
+# =====================================================
+def narrow(values):
+    """Array int64 -> dtype integer terkecil yang memuat semua nilai"""
+    if len(values) == 0:
+        return values.astype('<i1')
+    lo, hi = values.min(), values.max()
+    for dtype in ('<i1', '<i2', '<i4'):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype)
+    return values.astype('<i8')
+
+def to_fixed(values, decimals):
+    """float -> int64 fixed-point, None jika pembulatan tidak exact (atau ada NaN)"""
+    scale = 10 ** decimals
+    with np.errstate(invalid='ignore'):
+        fixed = np.round(values * scale)
+    if not np.isfinite(fixed).all() or not np.array_equal(fixed / scale, values):
+        return None
+    return fixed.astype(np.int64)
+
+def encode_delta(values):
+    """int64 -> (base, delta sempit); aritmetika modular, jadi selalu reversible"""
+    base = int(values[0]) if len(values) else 0
+    return {'base': base}, narrow(np.diff(values))
+
+def decode_delta(meta, data, n):
+    values = np.empty(n, dtype=np.int64)
+    if n:
+        values[0] = meta['base']
+        np.cumsum(data.astype(np.int64), out=values[1:])
+        values[1:] += meta['base']
+    return values
+
+def encode_dod(values):
+    """int64 -> (base, delta pertama, delta-of-delta sempit)"""
+    deltas = np.diff(values)
+    meta = {'base': int(values[0]) if len(values) else 0,
+            'base_delta': int(deltas[0]) if len(deltas) else 0}
+    return meta, narrow(np.diff(deltas))
+
+def decode_dod(meta, data, n):
+    deltas = np.empty(max(n - 1, 0), dtype=np.int64)
+    if n > 1:
+        deltas[0] = meta['base_delta']
+        np.cumsum(data.astype(np.int64), out=deltas[1:])
+        deltas[1:] += meta['base_delta']
+    return decode_delta({'base': meta['base']}, deltas, n)
+
+def encode_column(name, values, timestamps):
+    """Satu kolom chunk -> (meta, array siap kompres)"""
+    if name == 'timestamp':
+        meta, data = encode_dod(values)
+        meta['enc'] = 'dod'
+    elif name == 'device_ts':
+        # Selisih ke timestamp hampir konstan (lag jaringan); NAT ikut wrap modular
+        meta, data = encode_delta(timestamps - values)
+        meta['enc'] = 'lag_delta'
+    elif name == 'seq':
+        meta, data = encode_delta(values)
+        meta['enc'] = 'delta'
+    elif name in ('temperature', 'humidity', 'confidence'):
+        decimals = CONFIDENCE_DECIMALS if name == 'confidence' else ARCHIVE_DECIMALS
+        fixed = to_fixed(values, decimals)
+        if fixed is None:
+            meta, data = {'enc': 'raw'}, values.astype('<f8')
+        elif name == 'confidence':
+            meta, data = {'enc': 'fixed', 'decimals': decimals}, narrow(fixed)
+        else:
+            meta, data = encode_delta(fixed)
+            meta.update(enc='fixed_delta', decimals=decimals)
+    elif name in ('prediction', 'anomaly_reason'):
+        labels = CATEGORIES if name == 'prediction' else ANOMALY_REASONS
+        meta, data = {'enc': 'dict'}, encode_labels(values, labels)
+    elif name in ('anomaly_flag', 'alert_triggered'):
+        meta, data = {'enc': 'bits'}, np.packbits(values.astype(bool))
+    else:
+        raise ValueError(f"No archive encoding for column '{name}'")
+    meta['dtype'] = data.dtype.str
+    return meta, data
+
+def decode_column(name, meta, data, n, timestamps, labels):
+    enc = meta['enc']
+    if enc == 'dod':
+        return decode_dod(meta, data, n)
+    if enc == 'lag_delta':
+        return timestamps - decode_delta(meta, data, n)
+    if enc == 'delta':
+        return decode_delta(meta, data, n)
+    if enc == 'fixed_delta':
+        return decode_delta(meta, data, n) / 10 ** meta['decimals']
+    if enc == 'fixed':
+        return data.astype(np.float64) / 10 ** meta['decimals']
+    if enc == 'raw':
+        return data.astype(np.float64)
+    if enc == 'dict':
+        return decode_labels(data, labels[name])
+    if enc == 'bits':
+        return np.unpackbits(data, count=n).astype(bool)
+    raise ValueError(f"Unknown encoding '{enc}' for column '{name}'")
+
+def chunk_stats(columns):
+    """Ringkasan chunk untuk index (dipakai skip saat range scan)"""
+    ts = columns['timestamp']
+    stats = {'t_min': int(ts.min()), 't_max': int(ts.max()),
+             'anomalies': int(columns['anomaly_flag'].sum())}
+    for name in ('temperature', 'humidity'):
+        values = columns[name]
+        finite = values[np.isfinite(values)]
+        stats[name] = [float(finite.min()), float(finite.max())] if len(finite) else None
+    return stats
+
+# =====================================================
+# WRITER
+# =====================================================
+class ArchiveWriter:
+    """Tulis reading (schema SensorBuffer) sebagai chunk per device, streaming.
+
+    ``path`` boleh berupa path file atau file object biner (misal BytesIO).
+    """
+
+    def __init__(self, path, chunk_rows=ARCHIVE_CHUNK_ROWS, max_buffered_rows=ARCHIVE_MAX_BUFFERED_ROWS,
+                 level=ARCHIVE_COMPRESSION_LEVEL):
+        self._own = isinstance(path, (str, os.PathLike))
+        self._f = open(path, 'wb') if self._own else path
+        self.chunk_rows = chunk_rows
+        self.max_buffered_rows = max_buffered_rows
+        self.level = level
+        self.index = []
+        self.rows = 0
+        self._pending = {}      # device -> list dict kolom
+        self._pending_rows = {}
+        self._buffered = 0
+        self._closed = False
+
+        header = json.dumps({'version': FORMAT_VERSION,
+                             'labels': {'prediction': list(CATEGORIES),
+                                        'anomaly_reason': list(ANOMALY_REASONS)}}).encode()
+        self._f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self._offset = len(MAGIC) + 4 + len(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, columns):
+        """Tambahkan batch kolom; chunk ditulis begitu satu device mencapai chunk_rows"""
+        n = len(columns['timestamp'])
+        if n == 0:
+            return
+        devices = np.asarray(columns['device_id'], dtype=object).astype(str)
+        uniq, inverse = np.unique(devices, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(uniq) + 1))
+
+        for i, device in enumerate(uniq.tolist()):
+            rows = order[bounds[i]:bounds[i + 1]]
+            part = {name: np.asarray(columns[name])[rows] for name in COLUMNS if name != 'device_id'}
+            self._pending.setdefault(device, []).append(part)
+            self._pending_rows[device] = self._pending_rows.get(device, 0) + len(rows)
+            self._buffered += len(rows)
+            if self._pending_rows[device] >= self.chunk_rows:
+                self._flush_device(device)
+
+        # Batas memori: flush device dengan buffer terbesar dulu
+        while self._buffered > self.max_buffered_rows:
+            self._flush_device(max(self._pending_rows, key=self._pending_rows.get))
+
+    def flush(self):
+        """Tulis semua buffer device sebagai chunk (chunk terakhir boleh < chunk_rows)"""
+        for device in list(self._pending):
+            self._flush_device(device)
+
+    def _flush_device(self, device):
+        parts = self._pending.pop(device)
+        self._buffered -= self._pending_rows.pop(device)
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        total = len(merged['timestamp'])
+        for start in range(0, total, self.chunk_rows):
+            chunk = {name: values[start:start + self.chunk_rows] for name, values in merged.items()}
+            self._write_chunk(device, chunk)
+
+    def _write_chunk(self, device, columns):
+        n = len(columns['timestamp'])
+        timestamps = columns['timestamp'].astype(np.int64)
+        stats = {'device': device, 'rows': n, **chunk_stats(columns)}
+        meta = dict(stats, columns=[])
+        blobs = []
+        for name in COLUMNS:
+            if name == 'device_id':
+                continue
+            values = np.asarray(columns[name])
+            if COLUMNS[name] == 'int64':
+                values = values.astype(np.int64)
+            elif COLUMNS[name] == 'float64':
+                values = values.astype(np.float64)
+            col_meta, data = encode_column(name, values, timestamps)
+            blob = zlib.compress(data.tobytes(), self.level)
+            col_meta.update(name=name, nbytes=len(blob))
+            meta['columns'].append(col_meta)
+            blobs.append(blob)
+
+        encoded = zlib.compress(json.dumps(meta, separators=(',', ':')).encode(), self.level)
+        header = CHUNK_MAGIC + struct.pack('<I', len(encoded)) + encoded
+        self._f.write(header)
+        for blob in blobs:
+            self._f.write(blob)
+
+        # Index hanya statistik + posisi; meta kolom dibaca dari header chunk
+        self.index.append(dict(stats, header=self._offset))
+        self._offset += len(header) + sum(len(blob) for blob in blobs)
+        self.rows += n
+
+    def close(self):
+        """Flush sisa buffer lalu tulis footer index"""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        footer = zlib.compress(json.dumps({'chunks': self.index}, separators=(',', ':')).encode(), self.level)
+        self._f.write(footer + struct.pack('<Q', len(footer)) + MAGIC)
+        if self._own:
+            self._f.close()
+        else:
+            self._f.flush()
+
+# =====================================================
+# READER
+# =====================================================
+class ArchiveReader:
+    """Baca arsip chunk per chunk; index dipakai untuk melewati chunk yang tidak relevan"""
+
+    def __init__(self, path):
+        self._own = isinstance(path, (str, os.PathLike))
+        self._f = open(path, 'rb') if self._own else path
+        if self._f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a sensor archive (bad magic)")
+        (size,) = struct.unpack('<I', self._f.read(4))
+        header = json.loads(self._f.read(size))
+        if header['version'] > FORMAT_VERSION:
+            raise ValueError(f"Archive version {header['version']} is newer than this reader")
+        self.labels = header['labels']
+        self._data_start = len(MAGIC) + 4 + size
+        self.recovered = False
+        self.chunks = self._read_footer()
+        if self.chunks is None:
+            # Footer tidak ada (writer berhenti di tengah): scan header chunk
+            self.recovered = True
+            self.chunks = self._scan_chunks()
+        self.chunks_read = 0
+        self.chunks_skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._own:
+            self._f.close()
+
+    def _read_footer(self):
+        self._f.seek(0, os.SEEK_END)
+        end = self._f.tell()
+        tail = len(MAGIC) + 8
+        if end < self._data_start + tail:
+            return None
+        self._f.seek(end - tail)
+        raw = self._f.read(tail)
+        if raw[8:] != MAGIC:
+            return None
+        (size,) = struct.unpack('<Q', raw[:8])
+        self._f.seek(end - tail - size)
+        return json.loads(zlib.decompress(self._f.read(size)))['chunks']
+
+    def _read_chunk_header(self, offset):
+        """Meta chunk di ``offset`` (file diposisikan di awal blok kolom), None jika rusak"""
+        self._f.seek(offset)
+        head = self._f.read(len(CHUNK_MAGIC) + 4)
+        if len(head) < len(CHUNK_MAGIC) + 4 or head[:len(CHUNK_MAGIC)] != CHUNK_MAGIC:
+            return None
+        (size,) = struct.unpack('<I', head[len(CHUNK_MAGIC):])
+        try:
+            return json.loads(zlib.decompress(self._f.read(size)))
+        except (zlib.error, ValueError):
+            return None
+
+    def _scan_chunks(self):
+        self._f.seek(0, os.SEEK_END)
+        end = self._f.tell()
+        chunks, offset = [], self._data_start
+        while True:
+            meta = self._read_chunk_header(offset)
+            if meta is None:
+                break
+            next_offset = self._f.tell() + sum(col['nbytes'] for col in meta['columns'])
+            if next_offset > end:
+                break  # Chunk terakhir terpotong
+            chunks.append({k: v for k, v in meta.items() if k != 'columns'} | {'header': offset})
+            offset = next_offset
+        return chunks
+
+    # -------------------------------------------------
+    # QUERIES
+    # -------------------------------------------------
+    def select(self, start_ns=None, end_ns=None, devices=None, temperature=None, humidity=None,
+               anomalies_only=False):
+        """Meta chunk yang mungkin berisi baris cocok (hanya dari index, tanpa dekompresi)"""
+        devices = set(devices) if devices is not None else None
+        selected = []
+        for meta in self.chunks:
+            if ((start_ns is not None and meta['t_max'] < start_ns)
+                    or (end_ns is not None and meta['t_min'] > end_ns)
+                    or (devices is not None and meta['device'] not in devices)
+                    or (anomalies_only and meta['anomalies'] == 0)
+                    or not _range_overlaps(meta['temperature'], temperature)
+                    or not _range_overlaps(meta['humidity'], humidity)):
+                continue
+            selected.append(meta)
+        return selected
+
+    def read_chunk(self, meta):
+        """Dekompresi satu chunk -> dict kolom (schema SensorBuffer)"""
+        header = self._read_chunk_header(meta['header'])
+        if header is None:
+            raise ValueError(f"Corrupt chunk header at offset {meta['header']}")
+        n = meta['rows']
+        raw = {col['name']: (col, np.frombuffer(zlib.decompress(self._f.read(col['nbytes'])), dtype=col['dtype']))
+               for col in header['columns']}
+        col, data = raw.pop('timestamp')
+        timestamps = decode_column('timestamp', col, data, n, None, self.labels)
+        columns = {'timestamp': timestamps, 'device_id': np.full(n, meta['device'], dtype=object)}
+        for name, (col, data) in raw.items():
+            columns[name] = decode_column(name, col, data, n, timestamps, self.labels)
+        self.chunks_read += 1
+        return {name: columns[name] for name in COLUMNS}
+
+    def iter_chunks(self, start_ns=None, end_ns=None, devices=None, temperature=None, humidity=None,
+                    anomalies_only=False):
+        """Generator dict kolom per chunk, sudah difilter per baris"""
+        selected = self.select(start_ns, end_ns, devices, temperature, humidity, anomalies_only)
+        self.chunks_skipped += len(self.chunks) - len(selected)
+        for meta in selected:
+            columns = self.read_chunk(meta)
+            keep = np.ones(meta['rows'], dtype=bool)
+            ts = columns['timestamp']
+            if start_ns is not None:
+                keep &= ts >= start_ns
+            if end_ns is not None:
+                keep &= ts <= end_ns
+            for name, bounds in (('temperature', temperature), ('humidity', humidity)):
+                if bounds is not None:
+                    keep &= (columns[name] >= bounds[0]) & (columns[name] <= bounds[1])
+            if anomalies_only:
+                keep &= columns['anomaly_flag']
+            if keep.all():
+                yield columns
+            elif keep.any():
+                yield {name: values[keep] for name, values in columns.items()}
+
+    def read(self, **filters):
+        """Semua baris yang cocok sebagai satu dict kolom (None jika kosong), urut waktu"""
+        parts = list(self.iter_chunks(**filters))
+        if not parts:
+            return None
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+        order = np.argsort(columns['timestamp'], kind='stable')
+        return {name: values[order] for name, values in columns.items()}
+
+    def info(self):
+        rows = sum(meta['rows'] for meta in self.chunks)
+        return {
+            'chunks': len(self.chunks),
+            'rows': rows,
+            'devices': len({meta['device'] for meta in self.chunks}),
+            't_min': min((meta['t_min'] for meta in self.chunks), default=None),
+            't_max': max((meta['t_max'] for meta in self.chunks), default=None),
+            'anomalies': sum(meta['anomalies'] for meta in self.chunks),
+            'recovered': self.recovered,
+        }
+
+def _range_overlaps(chunk_range, bounds):
+    if bounds is None:
+        return True
+    if chunk_range is None:
+        return False
+    return chunk_range[1] >= bounds[0] and chunk_range[0] <= bounds[1]
+
+# =====================================================
+# CSV CONVERSION
+# =====================================================
+def parse_csv_timestamps(values):
+    """Kolom timestamp CSV -> int64 epoch ns.
+
+    Menerima epoch ns (export dashboard) atau datetime lokal
+    ``YYYY-mm-dd HH:MM:SS[.fff]`` (log realtime).
+    """
+    values = np.asarray(values, dtype=str)
+    if len(values) and values[0].lstrip('-').isdigit():
+        return values.astype(np.int64)
+    local = np.array(np.char.replace(values, ' ', 'T'), dtype='datetime64[ns]').view(np.int64)
+    return np.where(local == NAT_NS, NAT_NS, local - local_offset_ns())
+
+def csv_block_columns(header, rows, device_id=DEFAULT_DEVICE_ID):
+    """Blok baris CSV -> dict kolom schema SensorBuffer (kolom yang tidak ada diisi default)"""
+    n = len(rows)
+    raw = dict(zip(header, zip(*rows))) if n else {name: () for name in header}
+
+    def floats(name, default=np.nan):
+        if name not in raw:
+            return np.full(n, default)
+        return np.array([float(v) if v != '' else np.nan for v in raw[name]], dtype=np.float64)
+
+    def flags(name, fallback):
+        if name not in raw:
+            return fallback
+        return np.isin(np.char.lower(np.asarray(raw[name], dtype=str)), ('true', '1'))
+
+    temperature, humidity = floats('temperature'), floats('humidity')
+    reason = (encode_labels(raw['anomaly_reason'], ANOMALY_REASONS) if 'anomaly_reason' in raw
+              else anomaly_codes(temperature, humidity))
+    reason = np.where(reason < 0, 0, reason)
+    anomaly_flag = flags('anomaly_flag', reason > 0)
+    columns = {
+        'timestamp': parse_csv_timestamps(raw['timestamp']),
+        'device_ts': (parse_csv_timestamps(np.where(np.asarray(raw['device_ts']) == '',
+                                                    str(NAT_NS), raw['device_ts']))
+                      if 'device_ts' in raw else np.full(n, NAT_NS, dtype=np.int64)),
+        'device_id': (np.asarray(raw['device_id'], dtype=object) if 'device_id' in raw
+                      else np.full(n, device_id, dtype=object)),
+        'seq': (np.array([int(v) if v != '' else -1 for v in raw['seq']], dtype=np.int64)
+                if 'seq' in raw else np.full(n, -1, dtype=np.int64)),
+        'temperature': temperature,
+        'humidity': humidity,
+        'prediction': (np.asarray(raw['prediction'], dtype=object) if 'prediction' in raw
+                       else np.full(n, "", dtype=object)),
+        'confidence': floats('confidence'),
+        'anomaly_flag': anomaly_flag,
+        'anomaly_reason': decode_labels(reason, ANOMALY_REASONS),
+        'alert_triggered': flags('alert_triggered', anomaly_flag),
+    }
+    return columns
+
+def convert_csv(csv_path, archive_path, device_id=DEFAULT_DEVICE_ID, block_rows=CSV_BLOCK_ROWS, **writer_args):
+    """Konversi log CSV ke arsip secara streaming (blok per blok); return jumlah reading"""
+    with open(csv_path, newline='', encoding='utf-8') as f, ArchiveWriter(archive_path, **writer_args) as writer:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        if 'timestamp' not in header:
+            raise ValueError(f"{csv_path}: CSV needs a 'timestamp' column")
+        block = []
+        for row in reader:
+            if row:
+                block.append(row)
+            if len(block) >= block_rows:
+                writer.write(csv_block_columns(header, block, device_id))
+                block = []
+        if block:
+            writer.write(csv_block_columns(header, block, device_id))
+    return writer.rows
+
+def export_csv(columns, out):
+    """Dict kolom -> CSV (timestamp epoch ns, sama dengan export dashboard)"""
+    writer = csv.writer(out)
+    names = list(COLUMNS)
+    writer.writerow(names)
+    writer.writerows(zip(*(columns[name].tolist() for name in names)))
+
+def to_archive_bytes(columns):
+    """Dict kolom -> isi file arsip (untuk tombol download dashboard)"""
+    buffer = io.BytesIO()
+    with ArchiveWriter(buffer) as writer:
+        writer.write(columns)
+    return buffer.getvalue()
+
+# =====================================================
+# CLI
+# =====================================================
+def _parse_time(text):
+    return None if text is None else int(parse_csv_timestamps([text])[0])
+
+def _format_ns(ns):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ns / 1e9)) if ns is not None else "-"
+
+def _filters(args):
+    return {
+        'start_ns': _parse_time(args.start),
+        'end_ns': _parse_time(args.end),
+        'devices': args.device,
+        'temperature': (args.min_temp if args.min_temp is not None else -np.inf,
+                        args.max_temp if args.max_temp is not None else np.inf)
+                       if args.min_temp is not None or args.max_temp is not None else None,
+        'anomalies_only': args.anomalies,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed sensor archive tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="CSV log -> archive")
+    convert.add_argument("csv")
+    convert.add_argument("archive")
+    convert.add_argument("--device-id", default=DEFAULT_DEVICE_ID,
+                         help="Device id untuk CSV tanpa kolom device_id")
+    convert.add_argument("--chunk-rows", type=int, default=ARCHIVE_CHUNK_ROWS)
+
+    info = commands.add_parser("info", help="Ringkasan archive")
+    info.add_argument("archive")
+
+    for name, help_text in (("scan", "Range scan dengan skip chunk"), ("export", "Archive -> CSV")):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("archive")
+        if name == "export":
+            sub.add_argument("out", help="File CSV output ('-' = stdout)")
+        sub.add_argument("--start", help="Waktu lokal 'YYYY-mm-dd HH:MM[:SS]' atau epoch ns")
+        sub.add_argument("--end")
+        sub.add_argument("--device", nargs="+")
+        sub.add_argument("--min-temp", type=float)
+        sub.add_argument("--max-temp", type=float)
+        sub.add_argument("--anomalies", action="store_true", help="Hanya reading anomaly")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        start = time.perf_counter()
+        rows = convert_csv(args.csv, args.archive, args.device_id, chunk_rows=args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        csv_size, archive_size = os.path.getsize(args.csv), os.path.getsize(args.archive)
+        print(f"✅ {rows} readings converted in {elapsed:.2f}s")
+        print(f"📦 CSV {csv_size:,} bytes ({csv_size / max(rows, 1):.1f} B/reading) -> "
+              f"archive {archive_size:,} bytes ({archive_size / max(rows, 1):.1f} B/reading, "
+              f"{csv_size / max(archive_size, 1):.1f}x smaller)")
+        return
+
+    with ArchiveReader(args.archive) as reader:
+        if args.command == "info":
+            summary = reader.info()
+            size = os.path.getsize(args.archive)
+            print(f"📦 {args.archive}: {size:,} bytes, {summary['rows']} readings "
+                  f"({size / max(summary['rows'], 1):.1f} B/reading)")
+            print(f"   {summary['chunks']} chunks · {summary['devices']} devices · "
+                  f"{summary['anomalies']} anomalies")
+            print(f"   {_format_ns(summary['t_min'])} -> {_format_ns(summary['t_max'])}")
+            if summary['recovered']:
+                print("⚠️ Footer missing, index rebuilt by scanning chunk headers")
+            return
+
+        start = time.perf_counter()
+        if args.command == "scan":
+            rows = sum(len(part['timestamp']) for part in reader.iter_chunks(**_filters(args)))
+            print(f"🔎 {rows} matching readings in {(time.perf_counter() - start) * 1000:.1f} ms "
+                  f"({reader.chunks_read} chunks read, {reader.chunks_skipped} skipped via index)")
+            return
+
+        columns = reader.read(**_filters(args))
+        if columns is None:
+            print("No matching readings", file=sys.stderr)
+            return
+        if args.out == "-":
+            export_csv(columns, sys.stdout)
+        else:
+            with open(args.out, "w", newline="", encoding="utf-8") as out:
+                export_csv(columns, out)
+            print(f"✅ {len(columns['timestamp'])} readings exported to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,733 @@
+"""
+Async Ingest Pipeline
+=====================
+Entry point ingest berbasis asyncio. Langkah yang di ``MQTTClient``
+dikerjakan sekaligus di callback paho dipecah menjadi stage eksplisit yang
+dihubungkan queue berkapasitas tetap:
+
+    receive -> decode -> join -> infer -> detect -> [shed] -> persist -> publish
+
+- receive : message MQTT dari client async, dikumpulkan per batch
+- decode  : routing topic + parse payload (stateless)
+- join    : dedup sequence + gabung temperature/humidity scalar (stateful)
+- infer   : kalibrasi device + kategori & confidence dari model (``predict_categories``)
+- detect  : anomaly + kolom record (``build_columns``)
+- shed    : load shedding saat overload (``OVERLOAD_ENABLED``, lihat overload.py)
+- persist : snapshot SensorBuffer + write-ahead log
+- publish : broadcast frame ke client SSE
+
+Queue yang penuh membuat stage sebelumnya menunggu, terus sampai client
+MQTT berhenti membaca socket, jadi overload tidak menumpuk di memori.
+Stage stateless (decode, infer, detect) bisa dipindah ke thread / process
+pool (``ASYNC_STAGE_EXECUTORS``) dengan beberapa worker paralel; hasilnya
+tetap diteruskan sesuai urutan batch masuk. Metrik per stage (isi queue,
+utilisasi, waktu menunggu stage berikutnya) menunjukkan bottleneck.
+
+Client MQTT memakai ``aiomqtt`` jika terpasang, selain itu client paho
+yang callback-nya diteruskan ke event loop.
+
+Jalankan:
+    python async_ingest.py
+    python async_ingest.py --executor infer=process --concurrency infer=2
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing as mp
+import random
+import threading
+import time
+from functools import partial
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from classifier import build_columns, calibrated_values, predict_categories
+from config import (
+    MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_ROUTES,
+    MQTT_CLIENT_ID_PREFIX, MQTT_USERNAME, MQTT_PASSWORD, MQTT_KEEPALIVE, MQTT_CONNECT_TIMEOUT,
+    RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY, DEFAULT_DEVICE_ID,
+    STREAM_ENABLED, STREAM_HOST, STREAM_PORT, STREAM_SNAPSHOT_POINTS, WAL_ENABLED,
+    ASYNC_QUEUE_SIZE, ASYNC_RECEIVE_QUEUE, ASYNC_RECEIVE_BATCH,
+    ASYNC_STAGE_CONCURRENCY, ASYNC_STAGE_EXECUTORS, ASYNC_PROCESS_WORKERS, ASYNC_METRICS_INTERVAL,
+    OVERLOAD_ENABLED
+)
+from ingest import (
+    READING_COLUMNS, SequenceTracker, decode_batch_payload, is_batch_payload,
+    parse_device_timestamp, readings_to_columns, _payload_device
+)
+from overload import LoadShedder
+from sensor_buffer import NAT_NS, SensorBuffer
+from stream_server import Broadcaster, Frame, encode_columns, open_stream_server
+from topic_router import TopicRouter
+from wal import WriteAheadLog
+
+STAGES = ("receive", "decode", "join", "infer", "detect", "shed", "persist", "publish")
+POOL_STAGES = ("decode", "infer", "detect")   # Stateless: boleh di executor / paralel
+EXECUTORS = ("thread", "process")
+
+# =====================================================
+# STAGE FUNCTIONS (stateless, picklable untuk process pool)
+# =====================================================
+_routers = {}
+
+def _router(routes):
+    """TopicRouter per proses (di process pool dibuat sekali per worker)"""
+    router = _routers.get(routes)
+    if router is None:
+        router = _routers[routes] = TopicRouter(routes)
+    return router
+
+def decode_messages(messages, routes=tuple(MQTT_TOPIC_ROUTES)):
+    """Batch (topic, payload bytes, received_ns) -> list item ter-decode
+
+    Item: ``('scalar', device, field, value, received_ns)``,
+    ``('reading', device, seq, temp, humidity, received_ns, device_ns, payload)``
+    atau ``('batch', columns, payload, received_ns)``.
+    """
+    router = _router(routes)
+    items = []
+    for topic, payload, received_ns in messages:
+        try:
+            match = router.route(topic)
+            if match is None:
+                continue
+            payload = payload.decode()
+            if match.schema != 'combined':
+                device_id = match.resolve_device(DEFAULT_DEVICE_ID)
+                items.append(('scalar', device_id, match.schema, float(payload), received_ns))
+                continue
+
+            data = json.loads(payload)
+            if is_batch_payload(data):
+                columns = decode_batch_payload(data, received_ns)
+                if len(columns['seq']) == 0:
+                    continue
+                if match.labels:
+                    uniq, inverse = np.unique(columns['device_id'].astype(str), return_inverse=True)
+                    resolved = np.array([match.resolve_device(d) for d in uniq.tolist()], dtype=object)
+                    columns['device_id'] = resolved[inverse.reshape(-1)]
+                items.append(('batch', columns, payload, received_ns))
+                continue
+
+            seq = data.get('seq')
+            items.append((
+                'reading', match.resolve_device(_payload_device(data)), None if seq is None else int(seq),
+                float(data.get('temperature', 0)), float(data.get('humidity', 0)),
+                received_ns, parse_device_timestamp(data.get('timestamp')), payload,
+            ))
+        except Exception as e:
+            print(f"❌ Error parsing message on {topic}: {e}")
+    return items
+
+def infer_columns(readings):
+    """Stage infer: kolom reading -> (kolom reading, (kode kategori, confidence))"""
+    # Model melihat nilai terkalibrasi, sama dengan build_columns
+    _, temp, humidity = calibrated_values(readings)
+    return readings, predict_categories(temp, humidity)
+
+def detect_columns(item):
+    """Stage detect: anomaly + kolom record lengkap dari hasil infer"""
+    readings, predicted = item
+    return build_columns(readings, predicted=predicted)
+
+# =====================================================
+# JOIN (stateful, selalu di event loop)
+# =====================================================
+class MessageJoiner:
+    """Dedup sequence + join scalar, sama dengan handler MQTTClient"""
+
+    def __init__(self):
+        self.tracker = SequenceTracker()
+        self._partial = {}  # device -> field; join temperature + humidity dari topic terpisah
+
+    def join(self, items):
+        """List item ter-decode -> satu dict kolom reading (None jika semua duplikat)"""
+        chunks, singles = [], []
+        for item in items:
+            kind = item[0]
+            if kind == 'scalar':
+                _, device_id, field, value, received_ns = item
+                partial = self._partial.setdefault(device_id, {})
+                partial[field] = value
+                if len(partial) < 2:
+                    continue
+                temp, humidity = partial['temperature'], partial['humidity']
+                del self._partial[device_id]
+                if self.tracker.observe_unsequenced(device_id, (temp, humidity), received_ns):
+                    singles.append(self._reading(device_id, -1, temp, humidity, received_ns, NAT_NS))
+            elif kind == 'reading':
+                _, device_id, seq, temp, humidity, received_ns, device_ns, payload = item
+                if seq is None:
+                    is_new = self.tracker.observe_unsequenced(device_id, payload, received_ns)
+                else:
+                    is_new = self.tracker.observe(device_id, seq, device_ns)
+                if is_new:
+                    singles.append(self._reading(device_id, -1 if seq is None else seq,
+                                                 temp, humidity, received_ns, device_ns))
+            else:
+                _, columns, payload, received_ns = item
+                if (columns['seq'] < 0).all():
+                    if not self.tracker.observe_unsequenced(columns['device_id'][0], payload, received_ns):
+                        continue
+                else:
+                    keep = self.tracker.observe_batch(columns['device_id'], columns['seq'], columns['device_ns'])
+                    if not keep.all():
+                        columns = {name: values[keep] for name, values in columns.items()}
+                    if len(columns['seq']) == 0:
+                        continue
+                if singles:
+                    chunks.append(readings_to_columns(singles))
+                    singles = []
+                chunks.append(columns)
+        if singles:
+            chunks.append(readings_to_columns(singles))
+        if not chunks:
+            return None
+        if len(chunks) == 1:
+            return chunks[0]
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in READING_COLUMNS}
+
+    @staticmethod
+    def _reading(device_id, seq, temp, humidity, received_ns, device_ns):
+        return {
+            'device_id': device_id,
+            'seq': seq,
+            'temperature': temp,
+            'humidity': humidity,
+            'received_ns': received_ns,
+            'device_ns': device_ns,
+        }
+
+# =====================================================
+# STAGES
+# =====================================================
+def batch_rows(item):
+    """Jumlah baris satu batch antar stage (message, item decode atau reading)"""
+    if item is None:
+        return 0
+    if isinstance(item, tuple):
+        item = item[0]
+    if isinstance(item, dict):
+        return len(item['device_id'])
+    return len(item)
+
+class Stage:
+    """Satu stage pipeline: queue input berkapasitas tetap + worker.
+
+    Item antar stage adalah ``(seq batch, payload)``. Setiap batch yang
+    masuk selalu diteruskan (payload None jika hasilnya kosong), jadi seq
+    tetap berurutan dan stage dengan beberapa worker bisa mengirim hasil
+    sesuai urutan masuk.
+    """
+
+    def __init__(self, name, func, concurrency=1, executor=None, maxsize=ASYNC_QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.executor = executor
+        # Worker di event loop tidak bisa paralel, jadi >1 hanya untuk executor
+        self.concurrency = max(1, concurrency) if executor is not None else 1
+        self.queue = asyncio.Queue(maxsize)
+        self.next = None            # Stage berikutnya (None = stage terakhir)
+        self._turn = None           # Condition urutan output (dibuat di event loop)
+        self._next_out = 0
+
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.busy_s = 0.0           # Waktu worker mengerjakan func
+        self.blocked_s = 0.0        # Waktu menunggu queue stage berikutnya (backpressure)
+        self.peak_depth = 0
+
+    def start(self):
+        self._turn = asyncio.Condition()
+        return [asyncio.create_task(self._worker(), name=f"stage-{self.name}-{i}")
+                for i in range(self.concurrency)]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            seq, item = await self.queue.get()
+            result = None
+            if item is not None:
+                start = time.perf_counter()
+                try:
+                    if self.executor is not None:
+                        result = await loop.run_in_executor(self.executor, self.func, item)
+                    else:
+                        result = self.func(item)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"❌ Stage {self.name} failed: {e}")
+                self.busy_s += time.perf_counter() - start
+                self.batches += 1
+                self.rows += batch_rows(result)
+            await self._forward(seq, result)
+            self.queue.task_done()
+
+    async def _forward(self, seq, result):
+        if self.concurrency > 1:
+            async with self._turn:
+                await self._turn.wait_for(lambda: self._next_out == seq)
+                await self._put(seq, result)
+                self._next_out += 1
+                self._turn.notify_all()
+        else:
+            await self._put(seq, result)
+
+    async def _put(self, seq, result):
+        if self.next is None:
+            return
+        queue = self.next.queue
+        if queue.full():
+            start = time.perf_counter()
+            await queue.put((seq, result))
+            self.blocked_s += time.perf_counter() - start
+        else:
+            queue.put_nowait((seq, result))
+        self.next.peak_depth = max(self.next.peak_depth, queue.qsize())
+
+    def stats(self):
+        return {
+            'depth': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'peak_depth': self.peak_depth,
+            'concurrency': self.concurrency,
+            'executor': getattr(self.executor, 'kind', None),
+            'batches': self.batches,
+            'rows': self.rows,
+            'errors': self.errors,
+            'busy_s': self.busy_s,
+            'blocked_s': self.blocked_s,
+        }
+
+class ReceiveStage(Stage):
+    """Stage pertama: queue-nya diisi source MQTT, satu batch = message yang sudah antri"""
+
+    def __init__(self, batch_size=ASYNC_RECEIVE_BATCH, maxsize=ASYNC_RECEIVE_QUEUE):
+        super().__init__("receive", None, maxsize=maxsize)
+        self.batch_size = batch_size
+        self._seq = 0
+
+    async def _worker(self):
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            self.peak_depth = max(self.peak_depth, queue.qsize() + 1)
+            start = time.perf_counter()
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            self.busy_s += time.perf_counter() - start
+            self.batches += 1
+            self.rows += len(batch)
+            await self._put(self._seq, batch)
+            self._seq += 1
+            for _ in batch:
+                queue.task_done()
+
+# =====================================================
+# MQTT SOURCES
+# =====================================================
+def backoff_delay(attempt, base=RECONNECT_BASE_DELAY, max_delay=RECONNECT_MAX_DELAY):
+    """Delay retry ke-``attempt``: eksponensial, jitter di setengah atas"""
+    cap = min(max_delay, base * 2 ** attempt)
+    return random.uniform(cap / 2, cap)
+
+def _client_id():
+    return f"{MQTT_CLIENT_ID_PREFIX}_async_{random.randint(1000, 9999)}"
+
+class AiomqttSource:
+    """Client asyncio (aiomqtt >= 2.0): message dibaca hanya saat queue receive ada ruang"""
+
+    def __init__(self, topics, host=MQTT_BROKER, port=MQTT_PORT, client_id=None):
+        self.topics = list(topics)
+        self.host, self.port = host, port
+        self.client_id = client_id or _client_id()
+        self.connected = False
+
+    async def run(self, queue):
+        import aiomqtt
+
+        attempt = 0
+        while True:
+            try:
+                async with aiomqtt.Client(self.host, self.port, identifier=self.client_id,
+                                          username=MQTT_USERNAME, password=MQTT_PASSWORD,
+                                          keepalive=MQTT_KEEPALIVE, timeout=MQTT_CONNECT_TIMEOUT) as client:
+                    for topic in self.topics:
+                        await client.subscribe(topic)
+                    self.connected = True
+                    attempt = 0
+                    print(f"✅ Connected to MQTT Broker: {self.host} (aiomqtt)")
+                    print(f"📡 Subscribed to topics: {', '.join(self.topics)}")
+                    async for message in client.messages:
+                        await queue.put((str(message.topic), bytes(message.payload), time.time_ns()))
+            except aiomqtt.MqttError as e:
+                delay = backoff_delay(attempt)
+                attempt += 1
+                print(f"⚠️ MQTT connection lost ({e}), retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            finally:
+                self.connected = False
+
+class PahoSource:
+    """Client paho (thread network sendiri) yang meneruskan message ke event loop.
+
+    Thread paho menaruh message di buffer kecil dan membangunkan event loop
+    hanya saat buffer berubah dari kosong (bukan satu handoff per message).
+    Buffer penuh membuat thread paho menunggu, jadi saat pipeline penuh
+    socket berhenti dibaca (backpressure sampai TCP).
+    """
+
+    def __init__(self, topics, host=MQTT_BROKER, port=MQTT_PORT, client_id=None,
+                 max_pending=ASYNC_RECEIVE_BATCH):
+        self.topics = list(topics)
+        self.host, self.port = host, port
+        self.client = mqtt.Client(client_id=client_id or _client_id())
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        self.client.reconnect_delay_set(RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY)
+        if MQTT_USERNAME and MQTT_PASSWORD:
+            self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+        self.connected = False
+        self.max_pending = max_pending
+        self._pending = []
+        self._cond = threading.Condition()
+        self._ready = None
+        self._loop = None
+        self._closing = False
+
+    async def run(self, queue):
+        self._ready, self._loop = asyncio.Event(), asyncio.get_running_loop()
+        self.client.connect_async(self.host, self.port, MQTT_KEEPALIVE)
+        self.client.loop_start()
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                with self._cond:
+                    messages, self._pending = self._pending, []
+                    self._cond.notify_all()
+                for message in messages:
+                    await queue.put(message)
+        finally:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.connected = False
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            self.connected = True
+            print(f"✅ Connected to MQTT Broker: {self.host}")
+            for topic in self.topics:
+                client.subscribe(topic)
+            print(f"📡 Subscribed to topics: {', '.join(self.topics)}")
+        else:
+            print(f"❌ Failed to connect, return code {rc}")
+
+    def on_disconnect(self, client, userdata, rc):
+        if self.connected:
+            print("⚠️ Disconnected from MQTT Broker")
+        self.connected = False
+
+    def on_message(self, client, userdata, msg):
+        message = (msg.topic, msg.payload, time.time_ns())
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self._closing:
+                self._cond.wait()
+            if self._closing:
+                return
+            self._pending.append(message)
+            wake = len(self._pending) == 1
+        if wake:
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+def open_source(topics, host=MQTT_BROKER, port=MQTT_PORT):
+    """aiomqtt jika terpasang, selain itu paho yang dijembatani ke event loop"""
+    try:
+        import aiomqtt  # noqa: F401
+    except ImportError:
+        return PahoSource(topics, host, port)
+    return AiomqttSource(topics, host, port)
+
+# =====================================================
+# PIPELINE
+# =====================================================
+class AsyncIngestPipeline:
+    """receive -> decode -> join -> infer -> detect -> [shed] -> persist -> publish
+
+    Juga memenuhi interface service untuk ``StreamServer`` (broadcaster,
+    snapshot_frame, stream_stats), jadi client SSE bisa langsung connect.
+    """
+
+    def __init__(self, routes=None, concurrency=None, executors=None,
+                 queue_size=ASYNC_QUEUE_SIZE, receive_queue=ASYNC_RECEIVE_QUEUE,
+                 receive_batch=ASYNC_RECEIVE_BATCH, process_workers=ASYNC_PROCESS_WORKERS,
+                 wal=None, shedder=None, stream_enabled=False, host=STREAM_HOST, port=STREAM_PORT):
+        self.routes = tuple((pattern, schema) for pattern, schema in (routes or MQTT_TOPIC_ROUTES))
+        concurrency = {**ASYNC_STAGE_CONCURRENCY, **(concurrency or {})}
+        executors = {**ASYNC_STAGE_EXECUTORS, **(executors or {})}
+        for name, kind in executors.items():
+            if name not in POOL_STAGES:
+                raise ValueError(f"Stage '{name}' cannot use an executor (allowed: {', '.join(POOL_STAGES)})")
+            if kind not in EXECUTORS:
+                raise ValueError(f"Unknown executor '{kind}' for stage '{name}' (expected one of {EXECUTORS})")
+
+        self.joiner = MessageJoiner()
+        self.broadcaster = Broadcaster()
+        self.buffer = SensorBuffer(STREAM_SNAPSHOT_POINTS)
+        self.wal = wal
+        # Load shedding (opsional): stage shed hanya ada jika shedder diberikan
+        self.shedder = shedder
+        self.total_messages = wal.messages_total if wal is not None else 0
+        self.alert_count = wal.alerts_total if wal is not None else 0
+        self.source = None
+        self._frame_seq = 0
+        self._persisted_frames = 0      # Batch di buffer; frame ke-k = batch persist ke-k
+        self._buffer_lock = threading.Lock()  # snapshot_frame dipanggil dari thread stream server
+        self.stream_server = open_stream_server(self, host, port) if stream_enabled else None
+
+        # Executor: satu process pool bersama, thread pool per stage
+        self._executors = []
+        self._process_pool = None
+        if "process" in executors.values():
+            # spawn: worker bersih, tidak mewarisi thread paho / event loop
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                process_workers, mp_context=mp.get_context("spawn"))
+            self._process_pool.kind = "process"
+            self._executors.append(self._process_pool)
+
+        funcs = {
+            'decode': partial(decode_messages, routes=self.routes),
+            'join': self.joiner.join,
+            'infer': infer_columns,
+            'detect': detect_columns,
+            'shed': self._shed,
+            'persist': self._persist,
+            'publish': self._publish,
+        }
+        self.stages = [ReceiveStage(receive_batch, receive_queue)]
+        for name in STAGES[1:]:
+            if name == "shed" and shedder is None:
+                continue
+            executor = self._executor(executors.get(name), concurrency.get(name, 1))
+            self.stages.append(Stage(name, funcs[name], concurrency.get(name, 1), executor, queue_size))
+        for stage, following in zip(self.stages, self.stages[1:]):
+            stage.next = following
+        self._started = time.perf_counter()
+
+    def _executor(self, kind, workers):
+        if kind == "process":
+            return self._process_pool
+        if kind == "thread":
+            pool = concurrent.futures.ThreadPoolExecutor(max(1, workers), thread_name_prefix="ingest-stage")
+            pool.kind = "thread"
+            self._executors.append(pool)
+            return pool
+        return None
+
+    @property
+    def inbox(self):
+        """Queue receive: source menaruh (topic, payload bytes, received_ns) di sini"""
+        return self.stages[0].queue
+
+    @property
+    def topics(self):
+        return TopicRouter(self.routes).filters
+
+    # -------------------------------------------------
+    # STATEFUL STAGES
+    # -------------------------------------------------
+    def backlog(self):
+        """Message yang menunggu di queue receive (queue depth untuk load shedding)"""
+        return self.inbox.qsize()
+
+    def _count(self, columns):
+        """Counter Messages/Alerts untuk semua reading yang diterima"""
+        self.total_messages += len(columns['timestamp'])
+        self.alert_count += int(columns['alert_triggered'].sum())
+
+    def _shed(self, columns):
+        # Dihitung sebelum shedding: reading yang dibuang tetap reading yang diterima
+        self._count(columns)
+        kept = self.shedder.shed(columns, depth=self.backlog())
+        if self.wal is not None:
+            self.wal.count_shed(len(columns['timestamp']) - (len(kept['timestamp']) if kept is not None else 0))
+        return kept
+
+    def _persist(self, columns):
+        with self._buffer_lock:
+            self.buffer.extend(columns)
+            self._persisted_frames += 1
+        if self.shedder is None:
+            self._count(columns)
+        if self.wal is not None:
+            self.wal.append(columns)
+        return columns
+
+    def _publish(self, columns):
+        self._frame_seq += 1
+        self.broadcaster.publish(Frame(self._frame_seq, columns))
+        return columns
+
+    # -------------------------------------------------
+    # RUN
+    # -------------------------------------------------
+    async def run(self, source, metrics_interval=ASYNC_METRICS_INTERVAL):
+        """Jalankan semua stage sampai ``source.run`` selesai (lalu drain) atau task di-cancel"""
+        self.source = source
+        self._started = time.perf_counter()
+        tasks = [task for stage in self.stages for task in stage.start()]
+        if metrics_interval:
+            tasks.append(asyncio.create_task(self._report(metrics_interval), name="stage-metrics"))
+        if self.wal is not None:
+            self.wal.start()
+        if self.stream_server is not None:
+            self.stream_server.start()
+        try:
+            await source.run(self.inbox)
+            # Source selesai (replay / test): tunggu semua batch keluar dari stage terakhir
+            for stage in self.stages:
+                await stage.queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.close()
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = []
+        if self.stream_server is not None:
+            self.stream_server.stop()
+            self.stream_server = None
+        if self.wal is not None:
+            self.wal.close()
+
+    # -------------------------------------------------
+    # METRICS
+    # -------------------------------------------------
+    def stage_stats(self):
+        """Metrik kumulatif per stage + utilisasi sejak pipeline berjalan"""
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        stats = {}
+        for stage in self.stages:
+            s = stage.stats()
+            s['rows_per_s'] = s['rows'] / elapsed
+            s['utilization'] = s['busy_s'] / (elapsed * s['concurrency'])
+            s['blocked_share'] = s['blocked_s'] / elapsed
+            stats[stage.name] = s
+        return stats
+
+    async def _report(self, interval):
+        """Tabel metrik per interval; stage dengan utilisasi tertinggi = bottleneck"""
+        previous = {stage.name: stage.stats() for stage in self.stages}
+        while True:
+            await asyncio.sleep(interval)
+            current = {stage.name: stage.stats() for stage in self.stages}
+            print_stage_table(current, previous, interval)
+            previous = current
+            if self.shedder is not None:
+                shed = self.shedder.stats()
+                print(f"🛡️ Shed {shed['shed']} of {shed['received']} readings "
+                      f"({shed['rate_limited']} rate-limited, {shed['sampled_out']} sampled out) | "
+                      f"priority pass-through: {shed['anomalies']} anomalies, {shed['class_changes']} class changes")
+
+    def snapshot_frame(self):
+        """Reading terakhir untuk client yang baru connect -> (seq frame terakhir di snapshot, JSON)
+
+        Seq dihitung di stage persist, bukan publish: batch yang sudah di
+        buffer tapi belum di-publish ikut snapshot dan frame-nya dilewati.
+        """
+        with self._buffer_lock:
+            latest = self.buffer.columns()
+            seq = self._persisted_frames
+        return seq, encode_columns(latest, seq, kind="snapshot")
+
+    def stream_stats(self):
+        stats = self.broadcaster.stats()
+        stats.update({
+            'mqtt_connected': self.source is not None and self.source.connected,
+            'total_messages': self.total_messages,
+            'alert_count': self.alert_count,
+            'sequence': self.joiner.tracker.totals(),
+            'overload': self.shedder.stats() if self.shedder is not None else None,
+            'stages': self.stage_stats(),
+        })
+        return stats
+
+def print_stage_table(current, previous, interval):
+    """Cetak rate, utilisasi dan isi queue per stage untuk satu interval"""
+    util = {
+        name: (s['busy_s'] - previous[name]['busy_s']) / (interval * s['concurrency'])
+        for name, s in current.items()
+    }
+    bottleneck = max(util, key=util.get)
+    print(f"📊 {'stage':<8} {'queue':>11} {'peak':>6} {'rows/s':>9} {'util':>6} {'blocked':>8}  workers")
+    for name, s in current.items():
+        rows = (s['rows'] - previous[name]['rows']) / interval
+        blocked = (s['blocked_s'] - previous[name]['blocked_s']) / interval
+        workers = f"{s['concurrency']}" + (f" ({s['executor']})" if s['executor'] else "")
+        mark = "  ◀ bottleneck" if name == bottleneck and util[name] > 0.5 else ""
+        print(f"   {name:<8} {s['depth']:>5}/{s['capacity']:<5} {s['peak_depth']:>6} {rows:>9.0f} "
+              f"{util[name]:>6.0%} {blocked:>8.0%}  {workers}{mark}")
+
+# =====================================================
+# MAIN
+# =====================================================
+def parse_stage_options(values, cast):
+    """``["infer=2", ...]`` -> {"infer": 2}"""
+    options = {}
+    for value in values or []:
+        name, _, option = value.partition("=")
+        if name not in STAGES or not option:
+            raise SystemExit(f"Invalid stage option '{value}' (expected <stage>=<value>, stage one of {STAGES})")
+        options[name] = cast(option)
+    return options
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio ingest pipeline dengan stage berqueue terbatas")
+    parser.add_argument("--broker", default=f"{MQTT_BROKER}:{MQTT_PORT}", help="host:port broker MQTT")
+    parser.add_argument("--concurrency", action="append", metavar="STAGE=N",
+                        help="Worker paralel per stage executor, misal infer=2")
+    parser.add_argument("--executor", action="append", metavar="STAGE=KIND",
+                        help=f"Pindahkan stage {'/'.join(POOL_STAGES)} ke thread atau process pool")
+    parser.add_argument("--queue-size", type=int, default=ASYNC_QUEUE_SIZE, help="Batch antri per stage")
+    parser.add_argument("--receive-batch", type=int, default=ASYNC_RECEIVE_BATCH, help="Message per batch receive")
+    parser.add_argument("--metrics-interval", type=float, default=ASYNC_METRICS_INTERVAL,
+                        help="Detik antar tabel metrik (0 = mati)")
+    parser.add_argument("--no-stream", action="store_true", help="Tanpa SSE stream endpoint")
+    parser.add_argument("--no-wal", action="store_true", help="Tanpa write-ahead log")
+    parser.add_argument("--overload", action="store_true", help="Aktifkan load shedding (OVERLOAD_ENABLED)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📡 IoT Async Ingest Pipeline")
+    print("=" * 60)
+
+    host, _, port = args.broker.rpartition(":")
+    pipeline = AsyncIngestPipeline(
+        concurrency=parse_stage_options(args.concurrency, int),
+        executors=parse_stage_options(args.executor, str),
+        queue_size=args.queue_size,
+        receive_batch=args.receive_batch,
+        wal=WriteAheadLog() if WAL_ENABLED and not args.no_wal else None,
+        shedder=LoadShedder() if OVERLOAD_ENABLED or args.overload else None,
+        stream_enabled=STREAM_ENABLED and not args.no_stream,
+    )
+    source = open_source(pipeline.topics, host or MQTT_BROKER, int(port))
+    print(f"⚙️ Stages: {' -> '.join(stage.name for stage in pipeline.stages)} | MQTT client: {type(source).__name__}")
+    try:
+        asyncio.run(pipeline.run(source, args.metrics_interval))
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping async ingest pipeline...")
+
+if __name__ == "__main__":
+    main()
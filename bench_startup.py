@@ -0,0 +1,161 @@
+"""
+Startup Benchmark
+=================
+Ukur cold start dashboard (app.py) dengan dua angka terpisah, masing-masing
+di proses Python baru:
+
+1. import     : waktu setiap statement import top-level di app.py
+2. render     : run script pertama (session baru, dependency sudah di-import)
+                dan rerun berikutnya
+
+Render diukur di direktori sementara dengan write-ahead log berisi
+``--history`` reading, seperti restart saat deploy (warm restart).
+
+Jalankan:
+    python bench_startup.py --runs 5 --history 43200
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+# =====================================================
+# PROBES (dijalankan di subprocess)
+# =====================================================
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {app_dir!r})
+timings = []
+for statement in {statements!r}:
+    start = time.perf_counter()
+    exec(statement, {{}})
+    timings.append((statement, (time.perf_counter() - start) * 1000))
+print(json.dumps(timings))
+"""
+
+RENDER_PROBE = """
+import json, os, sys, time
+sys.path.insert(0, {app_dir!r})
+os.chdir({work_dir!r})
+for statement in {statements!r}:
+    exec(statement, {{}})
+
+import streamlit
+streamlit.rerun = lambda: None   # Matikan loop auto refresh
+# Hanya lewati sleep auto refresh; polling AppTest (sleep 1 ms) harus tetap
+# tidur, kalau tidak thread utama spin dan merebut GIL dari script thread
+_sleep = time.sleep
+time.sleep = lambda seconds: None if seconds >= 1 else _sleep(seconds)
+from streamlit.testing.v1 import AppTest
+
+at = AppTest.from_file({app_path!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+first = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+at.run()
+rerun = (time.perf_counter() - start) * 1000
+errors = [e.message for e in at.exception]
+print(json.dumps({{'first': first, 'rerun': rerun, 'errors': errors}}))
+"""
+
+SEED_PROBE = """
+import sys, time
+sys.path.insert(0, {app_dir!r})
+import numpy as np
+from classifier import build_columns
+from wal import WriteAheadLog
+n = {history}
+now = time.time_ns()
+readings = {{
+    'device_id': np.full(n, 'bench', dtype=object),
+    'seq': np.arange(n, dtype=np.int64),
+    'temperature': 25 + 8 * np.sin(np.arange(n) / 50),
+    'humidity': 60 + 20 * np.cos(np.arange(n) / 70),
+    'received_ns': now - (n - np.arange(n, dtype=np.int64)) * 2_000_000_000,
+    'device_ns': now - (n - np.arange(n, dtype=np.int64)) * 2_000_000_000 - 40_000_000,
+}}
+wal = WriteAheadLog({wal_dir!r})
+wal.append(build_columns(readings))
+wal.commit()
+wal.close()
+print("{{}}")
+"""
+
+def app_import_statements(path=APP_PATH):
+    """Statement import top-level di app.py, urut seperti di file"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def run_probe(code):
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=APP_DIR)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+# =====================================================
+# MEASUREMENTS
+# =====================================================
+def measure_imports(statements, runs):
+    totals, per_statement = [], {}
+    for _ in range(runs):
+        timings = run_probe(IMPORT_PROBE.format(app_dir=APP_DIR, statements=statements))
+        totals.append(sum(ms for _, ms in timings))
+        for statement, ms in timings:
+            per_statement.setdefault(statement, []).append(ms)
+    return totals, {s: statistics.median(v) for s, v in per_statement.items()}
+
+def measure_render(statements, runs, history):
+    firsts, reruns = [], []
+    with tempfile.TemporaryDirectory() as work_dir:
+        if history:
+            run_probe(SEED_PROBE.format(app_dir=APP_DIR, history=history,
+                                        wal_dir=os.path.join(work_dir, "wal")))
+        for _ in range(runs):
+            result = run_probe(RENDER_PROBE.format(app_dir=APP_DIR, work_dir=work_dir,
+                                                   statements=statements, app_path=APP_PATH))
+            if result['errors']:
+                raise RuntimeError(f"App raised: {result['errors']}")
+            firsts.append(result['first'])
+            reruns.append(result['rerun'])
+    return firsts, reruns
+
+def summary(values):
+    return f"median {statistics.median(values):7.0f} ms | min {min(values):7.0f} ms | max {max(values):7.0f} ms"
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark for app.py")
+    parser.add_argument("--runs", type=int, default=5, help="Jumlah proses baru per pengukuran")
+    parser.add_argument("--history", type=int, default=43200,
+                        help="Reading di write-ahead log untuk warm restart (0 = mulai kosong)")
+    args = parser.parse_args()
+
+    statements = app_import_statements()
+
+    print("=" * 60)
+    print("⏱️ Dashboard Startup Benchmark")
+    print("=" * 60)
+
+    import_totals, per_statement = measure_imports(statements, args.runs)
+    print(f"📦 Import       {summary(import_totals)}")
+    for statement, ms in sorted(per_statement.items(), key=lambda item: -item[1])[:5]:
+        print(f"   {ms:7.1f} ms  {statement}")
+
+    firsts, reruns = measure_render(statements, args.runs, args.history)
+    print(f"🖼️ First render {summary(firsts)}  ({args.history} readings in WAL)")
+    print(f"🔁 Rerun        {summary(reruns)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Device Calibration - Per-Device Threshold Table
+===============================================
+Offset kalibrasi sensor dan threshold kategori / anomaly per device dan
+per site, dimuat dari file JSON (``CALIBRATION_PATH``, contoh di
+``calibration.example.json``):
+
+    {
+      "profiles": {
+        "server_room": {"temp_normal_max": 27, "temp_max": 30, "humidity_max": 60},
+        "cold_store": {"temp_cold_max": 2, "temp_normal_max": 8, "temp_min": -25, "temp_max": 10}
+      },
+      "sites": {"dc1": {"profile": "server_room"}},
+      "devices": {"dc1/rack4/esp32_07": {"temp_offset": -0.4, "humidity_offset": 2.5}}
+    }
+
+Nilai satu device = default config <- profile site <- field site <-
+profile device <- field device. Site = segment pertama id device
+(``dc1/rack4/esp32_07`` -> ``dc1``, lihat topic_router.py).
+
+Setiap site dan device di file menjadi satu baris tabel (satu array NumPy
+per field). Array device id batch dipetakan ke index baris lewat dict
+cache (device baru di-resolve sekali), lalu offset dan threshold
+diterapkan ke seluruh batch lewat fancy indexing
+(``values['temp_offset'][rows]``), tanpa cabang Python per reading.
+
+File dicek setiap ``CALIBRATION_RELOAD_INTERVAL`` detik dan dimuat ulang
+jika berubah (hot reload). File yang gagal diparse tidak mengganti tabel
+yang sedang dipakai.
+"""
+
+import json
+import os
+import threading
+import time
+from itertools import repeat
+
+import numpy as np
+
+from config import (
+    TEMP_COLD_MAX, TEMP_NORMAL_MAX, HUMIDITY_MIN, HUMIDITY_MAX,
+    ANOMALY_TEMP_MIN, ANOMALY_TEMP_MAX, ANOMALY_HOT_TEMP, ANOMALY_HOT_HUMIDITY,
+    CALIBRATION_PATH, CALIBRATION_RELOAD_INTERVAL
+)
+
+# Field tabel -> nilai default (config global)
+FIELDS = {
+    'temp_offset': 0.0,                 # Ditambahkan ke temperature mentah (°C)
+    'humidity_offset': 0.0,             # Ditambahkan ke humidity mentah (%RH)
+    'temp_cold_max': TEMP_COLD_MAX,     # Kategori: dibawah ini = Dingin
+    'temp_normal_max': TEMP_NORMAL_MAX, # Kategori: sampai ini = Normal
+    'temp_min': ANOMALY_TEMP_MIN,       # Anomaly: temperature out of normal range
+    'temp_max': ANOMALY_TEMP_MAX,
+    'humidity_min': HUMIDITY_MIN,       # Anomaly: humidity out of normal range
+    'humidity_max': HUMIDITY_MAX,
+    'hot_temp': ANOMALY_HOT_TEMP,       # Anomaly: kombinasi temperature & humidity tinggi
+    'hot_humidity': ANOMALY_HOT_HUMIDITY,
+}
+OFFSET_FIELDS = ('temp_offset', 'humidity_offset')
+CATEGORY_FIELDS = ('temp_cold_max', 'temp_normal_max')
+LIMIT_FIELDS = ('temp_min', 'temp_max', 'humidity_min', 'humidity_max', 'hot_temp', 'hot_humidity')
+
+# =====================================================
+# TABLE
+# =====================================================
+class CalibrationTable:
+    """Baris 0 = default; satu baris per site dan per device yang ada di file"""
+
+    def __init__(self, profiles=None, sites=None, devices=None, source=None):
+        self.profiles = dict(profiles or {})
+        self.source = source
+        rows = [dict(FIELDS)]
+        custom = [False]
+
+        self.site_rows = {}
+        site_settings = {}
+        for site, entry in (sites or {}).items():
+            site_settings[site] = self._settings(entry, f"site '{site}'")
+            self.site_rows[str(site)] = len(rows)
+            rows.append({**FIELDS, **site_settings[site]})
+            custom.append(any(name in site_settings[site] for name in CATEGORY_FIELDS))
+
+        self.device_rows = {}
+        for device, entry in (devices or {}).items():
+            device = str(device)
+            settings = {**site_settings.get(self.site_of(device), {}), **self._settings(entry, f"device '{device}'")}
+            self.device_rows[device] = len(rows)
+            rows.append({**FIELDS, **settings})
+            custom.append(any(name in settings for name in CATEGORY_FIELDS))
+
+        self.values = {name: np.array([row[name] for row in rows], dtype=np.float64) for name in FIELDS}
+        self.custom = np.array(custom, dtype=bool)
+        self.has_offsets = any(self.values[name].any() for name in OFFSET_FIELDS)
+        self.has_custom = bool(self.custom.any())
+        self._lookup = {}   # Cache device id -> baris (termasuk device yang tidak ada di file)
+
+    def _settings(self, entry, where):
+        """Entry site / device -> field yang di-set (profile dulu, lalu field entry)"""
+        entry = dict(entry)
+        profile = entry.pop('profile', None)
+        settings = {}
+        if profile is not None:
+            if profile not in self.profiles:
+                raise ValueError(f"Unknown profile '{profile}' in {where}")
+            settings.update(self.profiles[profile])
+        settings.update(entry)
+        unknown = set(settings) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown calibration field(s) {sorted(unknown)} in {where}")
+        return {name: float(value) for name, value in settings.items()}
+
+    @staticmethod
+    def site_of(device_id):
+        site, sep, _ = device_id.partition('/')
+        return site if sep else None
+
+    @property
+    def is_default(self):
+        return len(self.custom) == 1
+
+    def _row(self, device_id):
+        row = self._lookup.get(device_id)
+        if row is None:
+            device = str(device_id)
+            row = self.device_rows.get(device)
+            if row is None:
+                row = self.site_rows.get(self.site_of(device), 0)
+            self._lookup[device_id] = row
+        return row
+
+    def rows(self, device_ids):
+        """Array device id -> index baris tabel per reading"""
+        n = len(device_ids)
+        if self.is_default or n == 0:
+            return np.zeros(n, dtype=np.intp)
+        ids = np.asarray(device_ids, dtype=object)
+        # Lookup dict per reading di C (map), device baru di-resolve sekali lalu di-cache
+        rows = np.fromiter(map(self._lookup.get, ids, repeat(-1)), dtype=np.intp, count=n)
+        missing = rows < 0
+        if missing.any():
+            for device in set(ids[missing].tolist()):
+                self._row(device)
+            rows[missing] = np.fromiter(map(self._lookup.get, ids[missing]), dtype=np.intp)
+        return rows
+
+    # -------------------------------------------------
+    # BATCH OPERATIONS (fancy indexing per baris)
+    # -------------------------------------------------
+    def calibrate(self, rows, temp, humidity):
+        """Temperature & humidity mentah + offset device"""
+        if not self.has_offsets:
+            return temp, humidity
+        return temp + self.values['temp_offset'][rows], humidity + self.values['humidity_offset'][rows]
+
+    def category_limits(self, rows):
+        """(temp_cold_max, temp_normal_max) per reading"""
+        return tuple(self.values[name][rows] for name in CATEGORY_FIELDS)
+
+    def custom_categories(self, rows):
+        """Mask reading dari device dengan threshold kategori sendiri (None jika tidak ada)"""
+        if not self.has_custom:
+            return None
+        return self.custom[rows]
+
+    def limits(self, rows):
+        """Dict limit anomaly per reading untuk anomaly_codes (None = default config)"""
+        if self.is_default:
+            return None
+        return {name: self.values[name][rows] for name in LIMIT_FIELDS}
+
+    def stats(self):
+        return {
+            'source': self.source,
+            'profiles': len(self.profiles),
+            'sites': len(self.site_rows),
+            'devices': len(self.device_rows),
+        }
+
+def load_calibration(path):
+    """File JSON -> CalibrationTable"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    unknown = set(data) - {'profiles', 'sites', 'devices'}
+    if unknown:
+        raise ValueError(f"Unknown section(s) {sorted(unknown)}")
+    return CalibrationTable(data.get('profiles'), data.get('sites'), data.get('devices'), source=path)
+
+# =====================================================
+# HOT RELOAD
+# =====================================================
+class CalibrationStore:
+    """Tabel aktif + cek mtime file paling sering sekali per ``interval`` detik"""
+
+    def __init__(self, path=CALIBRATION_PATH, interval=CALIBRATION_RELOAD_INTERVAL):
+        if path and not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        self.path = path
+        self.interval = interval
+        self.table = CalibrationTable()
+        self.reloads = 0
+        self.last_error = None
+        self._mtime = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Tabel aktif; file dicek ulang jika interval sudah lewat"""
+        now = time.monotonic()
+        if self.path and (self._checked is None or now - self._checked >= self.interval):
+            with self._lock:
+                if self._checked is None or now - self._checked >= self.interval:
+                    self._checked = now
+                    self._refresh()
+        return self.table
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        if mtime is None:
+            if not self.table.is_default:
+                print(f"⚠️ Calibration file removed, using global thresholds")
+            self.table = CalibrationTable()
+            return
+        try:
+            table = load_calibration(self.path)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # Tabel lama tetap dipakai sampai file diperbaiki
+            self.last_error = str(e)
+            print(f"❌ Calibration file {os.path.basename(self.path)} rejected: {e}")
+            return
+        self.table = table
+        self.last_error = None
+        self.reloads += 1
+        stats = table.stats()
+        print(f"📐 Calibration loaded: {stats['devices']} devices, {stats['sites']} sites, "
+              f"{stats['profiles']} profiles")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_calibration():
+    """Tabel kalibrasi aktif untuk proses ini (hot reload dari CALIBRATION_PATH)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CalibrationStore()
+    return _store.get()
@@ -0,0 +1,290 @@
+"""
+Sensor Classifier
+=================
+Kategori temperature, confidence, dan deteksi anomaly untuk setiap reading.
+Dipakai oleh dashboard dan ingest service sehingga satu reading cukup
+diklasifikasikan sekali.
+
+Kategori + confidence berasal dari model (``iot_temp_model.pkl``): satu
+``predict_proba`` per batch, confidence = probabilitas kelas terpilih.
+Hasil di-cache (LRU) per (temperature, humidity) terkuantisasi karena
+nilai sensor sering sama untuk waktu lama. Tanpa model, kategori memakai
+threshold config dan confidence rule-based.
+
+Batch (``build_columns``) memakai tabel kalibrasi per device
+(calibration.py): offset sensor diterapkan sebelum prediksi, threshold
+anomaly dan (jika di-set) threshold kategori diambil per reading.
+"""
+
+import os
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+from calibration import get_calibration
+from config import (
+    TEMP_COLD_MAX, TEMP_NORMAL_MAX, HUMIDITY_MIN, HUMIDITY_MAX,
+    ANOMALY_TEMP_MIN, ANOMALY_TEMP_MAX, ANOMALY_HOT_TEMP, ANOMALY_HOT_HUMIDITY,
+    PREDICTION_MODEL_PATH, PREDICTION_QUANTUM, PREDICTION_CACHE_SIZE
+)
+
+# =====================================================
+# LABELS
+# =====================================================
+# Urutan tetap: dipakai sebagai kode int8 di format biner (WAL / archive)
+CATEGORIES = ("Dingin", "Normal", "Panas")
+ANOMALY_REASONS = (
+    "",
+    "Temperature out of normal range",
+    "Humidity out of normal range",
+    "High temperature and humidity combination",
+)
+
+# =====================================================
+# CLASSIFICATION RULES
+# =====================================================
+def get_temperature_category(temp):
+    """Determine temperature category"""
+    if temp < TEMP_COLD_MAX:
+        return "Dingin", "#4facfe"
+    elif temp <= TEMP_NORMAL_MAX:
+        return "Normal", "#43e97b"
+    else:
+        return "Panas", "#fa709a"
+
+def calculate_confidence(temp, humidity):
+    """Confidence rule-based (fallback tanpa model) dari range sensor yang wajar"""
+    temp_confidence = 100 if 15 <= temp <= 35 else 80
+    humidity_confidence = 100 if 30 <= humidity <= 80 else 85
+    return round((temp_confidence + humidity_confidence) / 2, 1)
+
+def detect_anomaly(temp, humidity):
+    """Detect anomaly in sensor readings"""
+    # Anomaly conditions
+    if temp > ANOMALY_TEMP_MAX or temp < ANOMALY_TEMP_MIN:
+        return True, ANOMALY_REASONS[1]
+    if humidity > HUMIDITY_MAX or humidity < HUMIDITY_MIN:
+        return True, ANOMALY_REASONS[2]
+    if temp > ANOMALY_HOT_TEMP and humidity > ANOMALY_HOT_HUMIDITY:
+        return True, ANOMALY_REASONS[3]
+    return False, ANOMALY_REASONS[0]
+
+def threshold_codes(temp, cold_max=TEMP_COLD_MAX, normal_max=TEMP_NORMAL_MAX):
+    """Versi vectorized get_temperature_category: kode index CATEGORIES (threshold skalar atau per reading)"""
+    return np.select([temp < cold_max, temp <= normal_max], [0, 1], 2)
+
+def rule_confidence(temp, humidity):
+    """Versi vectorized calculate_confidence"""
+    temp_confidence = np.where((temp >= 15) & (temp <= 35), 100, 80)
+    humidity_confidence = np.where((humidity >= 30) & (humidity <= 80), 100, 85)
+    return np.round((temp_confidence + humidity_confidence) / 2, 1)
+
+DEFAULT_LIMITS = {
+    'temp_min': ANOMALY_TEMP_MIN, 'temp_max': ANOMALY_TEMP_MAX,
+    'humidity_min': HUMIDITY_MIN, 'humidity_max': HUMIDITY_MAX,
+    'hot_temp': ANOMALY_HOT_TEMP, 'hot_humidity': ANOMALY_HOT_HUMIDITY,
+}
+
+def anomaly_codes(temp, humidity, limits=None):
+    """Versi vectorized detect_anomaly: kode index ANOMALY_REASONS (0 = normal)
+
+    ``limits`` = dict limit per reading dari ``CalibrationTable.limits``
+    (None = threshold config global).
+    """
+    lim = DEFAULT_LIMITS if limits is None else limits
+    # Urutan kondisi sama dengan detect_anomaly (kondisi pertama yang cocok menang)
+    return np.select(
+        [(temp > lim['temp_max']) | (temp < lim['temp_min']),
+         (humidity > lim['humidity_max']) | (humidity < lim['humidity_min']),
+         (temp > lim['hot_temp']) & (humidity > lim['hot_humidity'])],
+        [1, 2, 3], 0
+    )
+
+def predict_categories(temp, humidity, load_model=True):
+    """Array temperature & humidity -> (kode kategori, confidence): model, atau threshold tanpa model
+
+    ``load_model=False``: jangan memuat model di thread ini (render Streamlit);
+    selama model belum dimuat thread lain, kategori dari threshold.
+    """
+    # Label dan confidence dari satu panggilan model per batch
+    predictor = get_predictor(load=load_model)
+    if predictor is not None:
+        return predictor.predict(temp, humidity)
+    return threshold_codes(temp), rule_confidence(temp, humidity)
+
+def calibrated_values(readings, table=None):
+    """Kolom reading -> (index baris kalibrasi, temperature & humidity + offset device)"""
+    table = get_calibration() if table is None else table
+    rows = table.rows(readings['device_id'])
+    return (rows,) + table.calibrate(rows, readings['temperature'], readings['humidity'])
+
+def build_columns(readings, alerts_enabled=True, predicted=None, load_model=True):
+    """Lengkapi batch kolom reading MQTT (dict array NumPy) dengan prediction dan anomaly status
+
+    ``predicted`` = hasil ``predict_categories`` (dari nilai terkalibrasi) yang
+    sudah dihitung di tempat lain (misal stage infer di async_ingest.py);
+    None = dihitung di sini. Kolom temperature/humidity hasil = terkalibrasi.
+    ``load_model`` diteruskan ke ``predict_categories``.
+    """
+    table = get_calibration()
+    rows, temp, humidity = calibrated_values(readings, table)
+    if predicted is None:
+        predicted = predict_categories(temp, humidity, load_model)
+    category, confidence = predicted
+
+    custom = table.custom_categories(rows)
+    if custom is not None:
+        # Device dengan threshold kategori sendiri: kategori dari threshold device, bukan model global
+        category = np.where(custom, threshold_codes(temp, *table.category_limits(rows)), category)
+        confidence = np.where(custom, rule_confidence(temp, humidity), confidence)
+
+    reason = anomaly_codes(temp, humidity, table.limits(rows))
+    is_anomaly = reason > 0
+
+    return {
+        'timestamp': readings['received_ns'],
+        'device_ts': readings['device_ns'],
+        'device_id': readings['device_id'],
+        'seq': readings['seq'],
+        'temperature': temp,
+        'humidity': humidity,
+        'prediction': decode_labels(category, CATEGORIES),
+        'confidence': confidence,
+        'anomaly_flag': is_anomaly,
+        'anomaly_reason': decode_labels(reason, ANOMALY_REASONS),
+        'alert_triggered': is_anomaly & alerts_enabled,
+    }
+
+# =====================================================
+# LABEL CODES
+# =====================================================
+def encode_labels(values, labels):
+    """Array label string -> kode int8 (label tidak dikenal = -1)"""
+    lookup = {label: code for code, label in enumerate(labels)}
+    return np.fromiter((lookup.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+
+def decode_labels(codes, labels):
+    """Kode int8 -> array object berisi label string"""
+    table = np.array(list(labels) + [""], dtype=object)
+    return table[np.asarray(codes, dtype=np.int64)]
+
+# =====================================================
+# MODEL PREDICTION
+# =====================================================
+class PredictionCache:
+    """``predict_proba`` model dengan LRU cache per (temp, humidity) terkuantisasi"""
+
+    def __init__(self, model, quantum=PREDICTION_QUANTUM, cache_size=PREDICTION_CACHE_SIZE):
+        self.model = model
+        self.quantum = quantum
+        self.cache_size = cache_size
+        self._cache = OrderedDict()     # key -> (kode kategori, confidence)
+        self._lock = threading.Lock()   # Dipakai bersama session / thread ingest
+        self.hits = 0
+        self.misses = 0
+        self.model_calls = 0
+        # Urutan kelas model -> kode CATEGORIES
+        self._class_codes = encode_labels([str(c) for c in model.classes_], CATEGORIES)
+
+    def predict(self, temp, humidity):
+        """Array temperature & humidity -> (kode kategori int8, confidence % 1 desimal)"""
+        qt = np.round(np.asarray(temp, dtype=np.float64) / self.quantum).astype(np.int64)
+        qh = np.round(np.asarray(humidity, dtype=np.float64) / self.quantum).astype(np.int64)
+        keys = qt * (1 << 32) + qh
+        # Nilai flat = banyak key sama dalam satu batch, cukup dicek sekali
+        uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        codes = np.empty(len(uniq), dtype=np.int8)
+        confidence = np.empty(len(uniq), dtype=np.float64)
+
+        with self._lock:
+            missing = []
+            for i, key in enumerate(uniq.tolist()):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    codes[i], confidence[i] = cached
+
+            if missing:
+                idx = first[missing]
+                # Model dievaluasi di titik terkuantisasi supaya isi cache konsisten dengan key
+                features = np.column_stack([qt[idx], qh[idx]]) * self.quantum
+                proba = self._predict_proba(features)
+                best = proba.argmax(axis=1)
+                codes[missing] = self._class_codes[best]
+                confidence[missing] = np.round(proba[np.arange(len(best)), best] * 100, 1)
+                for i in missing:
+                    self._cache[int(uniq[i])] = (codes[i], confidence[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self.model_calls += 1
+
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+
+        inverse = inverse.reshape(-1)
+        return codes[inverse], confidence[inverse]
+
+    def _predict_proba(self, features):
+        with warnings.catch_warnings():
+            # Model di-fit dengan DataFrame; array tanpa nama kolom tetap valid
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return self.model.predict_proba(features)
+
+    def stats(self):
+        """Metrik cache untuk UI"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+            'size': len(self._cache),
+            'model_calls': self.model_calls,
+        }
+
+def load_predictor(path=PREDICTION_MODEL_PATH):
+    """Load model (sklearn/joblib di-import di sini, ~1-2 s); None jika tidak tersedia"""
+    if not path:
+        return None
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    try:
+        import joblib
+        with warnings.catch_warnings():
+            # Model disimpan dengan versi sklearn lain
+            warnings.simplefilter("ignore")
+            model = joblib.load(path)
+    except Exception as e:
+        print(f"⚠️ Prediction model unavailable ({e}), using rule-based classification")
+        return None
+    print(f"🤖 Prediction model loaded: {os.path.basename(path)} ({type(model).__name__})")
+    return PredictionCache(model)
+
+_predictor = None
+_predictor_loaded = False
+_predictor_lock = threading.Lock()
+
+def get_predictor(load=True):
+    """Predictor default, dimuat sekali per proses (None = rule-based / belum dimuat jika load=False)"""
+    global _predictor, _predictor_loaded
+    if load and not _predictor_loaded:
+        with _predictor_lock:
+            if not _predictor_loaded:
+                _predictor = load_predictor()
+                _predictor_loaded = True
+    return _predictor
+
+_warmup_started = False
+_warmup_lock = threading.Lock()     # Bukan _predictor_lock: itu dipegang selama model dimuat
+
+def warm_up_predictor():
+    """Muat predictor di background thread, sekali per proses (juga jika model tidak ada / gagal dimuat)"""
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started or _predictor_loaded:
+            return
+        _warmup_started = True
+    threading.Thread(target=get_predictor, name="model-warmup", daemon=True).start()
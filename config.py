@@ -0,0 +1,197 @@
+"""
+Shared Configuration
+====================
+Konfigurasi yang dipakai bersama oleh dashboard, ingest service, dan script test.
+"""
+
+# =====================================================
+# KONFIGURASI MQTT
+# =====================================================
+MQTT_BROKER = "broker.hivemq.com"  # Public broker, ganti dengan broker Anda
+MQTT_PORT = 1883
+MQTT_TOPIC_TEMP = "iot/temperature"  # Topic untuk temperature
+MQTT_TOPIC_HUMIDITY = "iot/humidity"  # Topic untuk humidity
+MQTT_TOPIC_COMBINED = "iot/sensor/data"  # Topic untuk data gabungan (JSON)
+
+# Routing topic -> format payload ("temperature" | "humidity" | "combined").
+# Pola boleh memakai wildcard MQTT; segment "{nama}" = '+' yang nilainya
+# diambil sebagai label (label device_id = id device, label lain = prefix id)
+MQTT_TOPIC_ROUTES = [
+    (MQTT_TOPIC_TEMP, "temperature"),
+    (MQTT_TOPIC_HUMIDITY, "humidity"),
+    (MQTT_TOPIC_COMBINED, "combined"),
+    # Multi-site: ("iot/{site}/{building}/sensor/data", "combined"),
+]
+ROUTE_CACHE_SIZE = 65536        # Topic konkret yang hasil routing-nya di-cache
+MQTT_CLIENT_ID_PREFIX = "streamlit_dashboard"
+MQTT_USERNAME = None
+MQTT_PASSWORD = None
+MQTT_KEEPALIVE = 15             # Detik; broker mati terdeteksi dalam ~1.5x keepalive
+MQTT_CONNECT_TIMEOUT = 5        # Detik; batas satu percobaan connect (di thread supervisor)
+
+# Reconnect supervisor: backoff eksponensial dengan jitter, dibatasi max delay
+RECONNECT_BASE_DELAY = 0.5      # Detik; delay retry pertama
+RECONNECT_MAX_DELAY = 10        # Detik; batas atas delay (= batas waktu pulih setelah broker kembali)
+CONNECTION_EVENT_HISTORY = 50   # Jumlah event state koneksi yang disimpan
+
+# =====================================================
+# KONFIGURASI INGEST
+# =====================================================
+DEFAULT_DEVICE_ID = "default"   # Device id untuk payload tanpa sensor_id
+PENDING_MAX_MESSAGES = 10000    # Maksimal reading yang menunggu diproses dashboard
+SEQUENCE_WINDOW = 64            # Lebar window sequence untuk reorder/duplicate check
+DUPLICATE_WINDOW = 1.0          # Detik; payload identik tanpa seq dalam window ini = duplikat
+DEVICE_ID_BYTES = 24            # Lebar device_id di ring shared memory & WAL; id lebih panjang = prefix + hash
+
+# Mode ingest dashboard:
+#   "session" = setiap session Streamlit punya MQTT client sendiri
+#   "service" = satu ingest service per proses, session menerima broadcast
+#   "sharded" = N worker process, hasil ditulis ke shared-memory ring buffer
+INGEST_MODE = "session"
+
+# =====================================================
+# THRESHOLD KLASIFIKASI
+# =====================================================
+TEMP_COLD_MAX = 20      # Dibawah ini = Dingin
+TEMP_NORMAL_MAX = 30    # 20-30 = Normal
+# Diatas 30 = Panas
+HUMIDITY_MIN = 20       # Dibawah ini = anomaly
+HUMIDITY_MAX = 85       # Diatas ini = anomaly
+ANOMALY_TEMP_MIN = 10   # Temperature dibawah ini = anomaly
+ANOMALY_TEMP_MAX = 35   # Temperature diatas ini = anomaly
+ANOMALY_HOT_TEMP = 30   # Kombinasi: temperature diatas ini
+ANOMALY_HOT_HUMIDITY = 70  # ... dan humidity diatas ini = anomaly
+
+# Override per device / site (offset sensor + threshold di atas), lihat calibration.py
+CALIBRATION_PATH = "calibration.json"   # None = semua device memakai threshold global
+CALIBRATION_RELOAD_INTERVAL = 5         # Detik; interval cek perubahan file (hot reload)
+
+# =====================================================
+# KONFIGURASI MODEL PREDIKSI
+# =====================================================
+PREDICTION_MODEL_PATH = "iot_temp_model.pkl"  # None = kategori dari threshold di atas (rule-based)
+PREDICTION_QUANTUM = 0.1        # Resolusi key cache (°C / %RH), sensor melapor dengan presisi 0.01-0.1
+PREDICTION_CACHE_SIZE = 65536   # Entry LRU cache hasil predict_proba
+
+# =====================================================
+# KONFIGURASI STREAM ENDPOINT (SSE)
+# =====================================================
+STREAM_ENABLED = True
+STREAM_HOST = "127.0.0.1"
+STREAM_PORT = 8765
+STREAM_FLUSH_INTERVAL = 0.5     # Detik; reading digabung per interval (server-side throttle)
+STREAM_CLIENT_QUEUE = 256       # Maksimal frame antri per client sebelum frame lama dibuang
+STREAM_SNAPSHOT_POINTS = 100    # Reading terakhir yang dikirim saat client baru connect
+STREAM_HEARTBEAT = 15           # Detik; komentar keep-alive saat tidak ada data
+STREAM_MAX_INTERVAL = 60        # Detik; batas atas throttle per client (/stream?interval=)
+
+# =====================================================
+# KONFIGURASI SHARDED INGEST (multi-process)
+# =====================================================
+SHARD_WORKERS = 4
+SHARD_GROUP = "iot_dashboard"   # MQTT shared subscription $share/<group>/<topic>, broker membagi message ke worker
+SHARD_RING_CAPACITY = 65536     # Baris per ring buffer (per worker)
+SHARD_POLL_INTERVAL = 0.05      # Detik; interval worker menulis batch ke ring
+
+# =====================================================
+# KONFIGURASI ASYNC PIPELINE (async_ingest.py)
+# =====================================================
+ASYNC_QUEUE_SIZE = 32           # Batch maksimal antri di depan setiap stage (backpressure)
+ASYNC_RECEIVE_QUEUE = 10000     # Message MQTT antri sebelum client berhenti membaca socket
+ASYNC_RECEIVE_BATCH = 1000      # Message maksimal per batch dari stage receive
+ASYNC_STAGE_CONCURRENCY = {     # Worker paralel per stage (hanya berlaku untuk stage dengan executor)
+    "decode": 1,
+    "infer": 1,
+    "detect": 1,
+}
+ASYNC_STAGE_EXECUTORS = {       # Stage -> "thread" | "process"; stage lain berjalan di event loop
+    # "decode": "process",
+    # "infer": "process",
+}
+ASYNC_PROCESS_WORKERS = 2       # Ukuran process pool bersama untuk stage "process"
+ASYNC_METRICS_INTERVAL = 10     # Detik; interval cetak tabel metrik stage
+
+# =====================================================
+# KONFIGURASI OVERLOAD CONTROL (load shedding, lihat overload.py)
+# =====================================================
+OVERLOAD_ENABLED = False        # True = reading normal dibuang saat ingest tertinggal (anomaly selalu lolos)
+OVERLOAD_DEVICE_RATE = 5.0      # Reading/detik per device (refill token bucket)
+OVERLOAD_DEVICE_BURST = 50      # Kapasitas bucket; burst singkat tetap lolos utuh
+OVERLOAD_HIGH_WATERMARK = 5000  # Reading antri; di atas ini reading normal di-sampling
+OVERLOAD_MIN_KEEP = 0.05        # Porsi minimal reading normal yang disimpan saat sampling
+
+# =====================================================
+# KONFIGURASI PUBLISHER (mqtt_publisher.py)
+# =====================================================
+PUBLISH_QOS = 1                 # 0 = fire-and-forget, 1 = at-least-once (duplikat di-dedup dashboard)
+PUBLISH_BATCH_SIZE = 1          # >1: beberapa reading dikirim sebagai satu payload JSON array
+PUBLISH_SCALAR_TOPICS = False   # Kirim juga ke topic temperature/humidity (hanya jika batch size 1);
+                                # dashboard subscribe keduanya, jadi True = setiap reading masuk dua kali
+PUBLISH_QUEUE_PATH = "publisher_queue.db"  # Antrian lokal (SQLite) saat broker tidak terjangkau
+PUBLISH_QUEUE_MAX = 100000      # Maksimal message antri; yang tertua dibuang jika penuh
+PUBLISH_FLUSH_RATE = 200        # Message per detik saat mengirim backlog setelah reconnect
+PUBLISH_MAX_INFLIGHT = 100      # Maksimal message QoS>0 yang belum di-ack broker
+
+# =====================================================
+# KONFIGURASI WRITE-AHEAD LOG (warm restart)
+# =====================================================
+WAL_ENABLED = True
+WAL_DIR = "wal"                 # Direktori segment log biner
+WAL_COMMIT_INTERVAL = 0.2       # Detik; group commit (satu write + fsync per interval)
+WAL_SEGMENT_RECORDS = 1_000_000 # Record per segment (~104 MB)
+WAL_MAX_SEGMENTS = 8            # Segment lama dihapus setelah jumlah ini
+WAL_VERIFY_TAIL = 4096          # Record di ekor yang dicek CRC saat recovery
+WAL_DEDUP_WINDOW = 30           # Detik; mode "session": reading yang sudah ditulis session lain dikenali selama ini
+
+# =====================================================
+# KONFIGURASI ARCHIVE (history jangka panjang, lihat archive.py)
+# =====================================================
+ARCHIVE_CHUNK_ROWS = 8192       # Reading per chunk (satu device per chunk)
+ARCHIVE_MAX_BUFFERED_ROWS = 1_000_000  # Reading di memori writer sebelum chunk dipaksa ditulis
+ARCHIVE_COMPRESSION_LEVEL = 6   # Level zlib per blok kolom
+ARCHIVE_DECIMALS = 2            # Fixed-point temperature/humidity (resolusi 0.01)
+
+# =====================================================
+# KONFIGURASI ANALYTICS (laporan batch dari log, lihat analytics.py)
+# =====================================================
+ANALYTICS_WORKERS = None               # Jumlah process worker (None = semua core)
+ANALYTICS_CSV_BLOCK_BYTES = 16 * 1024 * 1024  # Byte CSV per task worker
+ANALYTICS_ARCHIVE_TASK_ROWS = 1_000_000       # Reading archive per task worker
+
+# =====================================================
+# KONFIGURASI RETENSI DATA (memory budget dashboard)
+# =====================================================
+RETENTION_MAX_BYTES = 256 * 1024 * 1024  # Total untuk semua session di satu proses
+RETENTION_RAW_WINDOW = 30 * 60           # Detik data resolusi penuh per device
+RETENTION_IDLE_TIMEOUT = 15 * 60         # Device tanpa reading selama ini di-evict dari data raw
+RETENTION_ROLLUP_INTERVAL = 60           # Detik per bucket agregat untuk data yang lebih tua
+RETENTION_ROLLUP_SHARE = 0.1             # Porsi budget untuk agregat
+
+# =====================================================
+# KONFIGURASI VIEW CACHE (hasil view dibagi antar session, lihat view_cache.py)
+# =====================================================
+VIEW_CACHE_ENABLED = True                # False = setiap session menghitung view sendiri
+VIEW_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Batas memori estimasi DataFrame / figure di cache (LRU)
+
+# =====================================================
+# KONFIGURASI FORECAST (Holt linear trend per device)
+# =====================================================
+FORECAST_HORIZON = 300          # Detik ke depan untuk prediksi threshold crossing
+FORECAST_ALPHA = 0.3            # Smoothing level
+FORECAST_BETA = 0.1             # Smoothing trend
+FORECAST_MIN_DT = 0.5           # Detik; batas bawah interval antar reading untuk update trend
+FORECAST_MAX_HISTORY = 256      # Reading terakhir per device per batch yang dipakai (sisanya sudah terlupakan)
+FORECAST_BAND_Z = 1.96          # Lebar band forecast (~95%)
+
+# =====================================================
+# KONFIGURASI LIVENESS DEVICE (deteksi sensor yang diam)
+# =====================================================
+# Kelas device dari pola id (fnmatch, pola pertama yang cocok); selain itu "default"
+LIVENESS_DEVICE_CLASSES = (
+    ("*battery*", "battery"),
+)
+LIVENESS_TIMEOUTS = {           # Detik tanpa reading sebelum device dianggap offline (stale)
+    "default": 30,              # ESP32 publish tiap 2 detik
+    "battery": 600,             # Node baterai tidur lama di antara reading
+}
+LIVENESS_EVENT_HISTORY = 200    # Jumlah event online/offline yang disimpan
@@ -0,0 +1,85 @@
+"""
+Fleet Overview - Latest Value Grid
+==================================
+Tampilan semua device sekaligus: nilai terakhir temperature, humidity,
+kelas prediction dan state (normal / anomaly / stale) setiap device
+disusun menjadi grid, satu sel per device, untuk satu figure heatmap.
+
+Semua langkah bekerja pada array per device dari
+``SensorBuffer.latest_by_device`` (satu baris per device), jadi filter,
+sort dan penyusunan grid adalah operasi NumPy tanpa loop per device.
+
+Site diambil dari prefix id device hasil label topic (lihat
+topic_router.py), misal ``site1/b2/esp32_01`` -> ``site1``.
+"""
+
+import math
+
+import numpy as np
+
+from classifier import CATEGORIES, encode_labels
+
+STATES = ("Normal", "Anomaly", "Stale")   # Kode state 0 / 1 / 2
+NO_SITE = "(no site)"
+
+# Nama sort -> (kolom, descending)
+SORT_KEYS = {
+    "Device": ('device_id', False),
+    "Site": ('site', False),
+    "Temperature ↓": ('temperature', True),
+    "Humidity ↓": ('humidity', True),
+    "State (worst first)": ('state', True),
+    "Last seen (oldest first)": ('timestamp', False),
+}
+
+def device_sites(device_ids):
+    """Segment pertama id device sebagai site (NO_SITE jika id tanpa prefix)"""
+    ids = np.asarray(device_ids, dtype=object).astype(str)
+    if len(ids) == 0:
+        return ids
+    parts = np.char.partition(ids, '/')
+    return np.where(parts[:, 1] == '/', parts[:, 0], NO_SITE)
+
+def fleet_snapshot(buffer, stale=()):
+    """Nilai terakhir semua device + kolom site, kode prediction dan kode state"""
+    snapshot = buffer.latest_by_device()
+    devices = snapshot['device_id'].astype(str)
+    stale_mask = np.isin(devices, np.array(list(stale), dtype=str))
+    snapshot['device_id'] = devices
+    snapshot['site'] = device_sites(devices)
+    snapshot['prediction_code'] = encode_labels(snapshot['prediction'], CATEGORIES)
+    snapshot['state'] = np.where(stale_mask, 2, snapshot['anomaly_flag'].astype(np.int8)).astype(np.int8)
+    return snapshot
+
+def select_fleet(snapshot, sites=None, states=None, sort="Device"):
+    """Filter (site, nama state) lalu sort; tie diurutkan dengan device id"""
+    keep = np.ones(len(snapshot['device_id']), dtype=bool)
+    if sites:
+        keep &= np.isin(snapshot['site'], list(sites))
+    if states:
+        keep &= np.isin(snapshot['state'], [STATES.index(state) for state in states])
+    selected = {name: values[keep] for name, values in snapshot.items()}
+
+    column, descending = SORT_KEYS[sort]
+    key = selected[column]
+    if descending:
+        # Numerik: negasi (NaN tetap di akhir karena lexsort menaruh NaN terakhir)
+        key = -key.astype(np.float64)
+    order = np.lexsort((selected['device_id'], key))
+    return {name: values[order] for name, values in selected.items()}
+
+def grid_shape(n, aspect=2.0):
+    """(rows, cols) grid untuk n sel, kira-kira ``aspect`` kali lebih lebar dari tinggi"""
+    if n == 0:
+        return 0, 0
+    cols = max(1, min(n, math.ceil(math.sqrt(n * aspect))))
+    return math.ceil(n / cols), cols
+
+def to_grid(values, shape, fill):
+    """Array 1D -> grid 2D row-major, sel sisa diisi ``fill``"""
+    rows, cols = shape
+    values = np.asarray(values)
+    dtype = np.result_type(values.dtype, np.asarray(fill).dtype) if values.dtype != object else object
+    grid = np.full(rows * cols, fill, dtype=dtype)
+    grid[:len(values)] = values
+    return grid.reshape(rows, cols)
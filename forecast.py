@@ -0,0 +1,218 @@
+"""
+Sensor Forecast - Short-Horizon Threshold Crossing
+==================================================
+Prediksi beberapa menit ke depan untuk setiap device dengan Holt linear
+trend (level + trend per detik), supaya dashboard bisa memberi peringatan
+"expected to become Panas in N s" sebelum threshold benar-benar dilewati.
+
+State per device O(1) (level, trend, variance error per field), disimpan
+sebagai array NumPy yang diindeks kode device. Satu batch diproses dalam
+beberapa "round": round ke-k meng-update semua device yang punya reading
+ke-k di batch tersebut sekaligus, jadi ribuan device per tick tetap
+satu langkah vectorized (biasanya hanya 1-2 round).
+
+Interval antar reading tidak harus teratur: trend dihitung per detik
+dari selisih timestamp. Threshold crossing memakai threshold per device
+dari tabel kalibrasi (calibration.py).
+"""
+
+import numpy as np
+
+from calibration import get_calibration
+from classifier import CATEGORIES
+from config import (
+    FORECAST_HORIZON, FORECAST_ALPHA, FORECAST_BETA, FORECAST_MIN_DT,
+    FORECAST_MAX_HISTORY, FORECAST_BAND_Z
+)
+
+FIELDS = ('temperature', 'humidity')
+
+# (field, field threshold di tabel kalibrasi, arah, label): label = kondisi yang akan tercapai
+CROSSINGS = (
+    ('temperature', 'temp_normal_max', 'above', CATEGORIES[2]),
+    ('temperature', 'temp_cold_max', 'below', CATEGORIES[0]),
+    ('humidity', 'humidity_max', 'above', "too humid"),
+    ('humidity', 'humidity_min', 'below', "too dry"),
+)
+
+VARIANCE_DECAY = 0.1   # Bobot EWMA untuk variance error one-step-ahead
+STEP_DECAY = 0.1       # Bobot EWMA untuk interval rata-rata antar reading
+
+def occurrence_rank(codes):
+    """Urutan kemunculan setiap elemen di antara elemen dengan kode sama (0, 1, 2, ...)"""
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - group_start
+    return rank
+
+# =====================================================
+# HOLT FORECASTER
+# =====================================================
+class HoltForecaster:
+    """Holt linear trend untuk semua device, di-update per batch kolom reading"""
+
+    def __init__(self, horizon=FORECAST_HORIZON, alpha=FORECAST_ALPHA, beta=FORECAST_BETA,
+                 min_dt=FORECAST_MIN_DT, max_history=FORECAST_MAX_HISTORY, band_z=FORECAST_BAND_Z):
+        self.horizon = horizon
+        self.alpha = alpha
+        self.beta = beta
+        self.min_dt = min_dt
+        self.max_history = max_history
+        self.band_z = band_z
+
+        self._codes = {}
+        self.device_ids = np.empty(0, dtype=object)
+        self.n_devices = 0
+        self._capacity = 0
+        self.level = self.trend = self.var = None   # [device, field]
+        self.step = self.last_ts = self.count = None
+        self._resize(64)
+
+    def _resize(self, capacity):
+        """Perbesar array state (slot baru terisi nol)"""
+        def grow(array, dtype, shape=()):
+            new = np.zeros((capacity,) + shape, dtype=dtype)
+            if array is not None:
+                new[:len(array)] = array
+            return new
+        f = len(FIELDS)
+        self.level = grow(self.level, np.float64, (f,))
+        self.trend = grow(self.trend, np.float64, (f,))
+        self.var = grow(self.var, np.float64, (f,))
+        self.step = grow(self.step, np.float64)     # EWMA interval antar reading (detik)
+        self.last_ts = grow(self.last_ts, np.int64)
+        self.count = grow(self.count, np.int64)
+        self._capacity = capacity
+
+    def _device_codes(self, device_ids):
+        """Array device id -> kode state, device baru mendapat slot baru"""
+        uniq, inverse = np.unique(np.asarray(device_ids, dtype=object).astype(str), return_inverse=True)
+        codes = np.empty(len(uniq), dtype=np.int64)
+        new = []
+        for i, device in enumerate(uniq.tolist()):
+            code = self._codes.get(device)
+            if code is None:
+                code = self._codes[device] = len(self._codes)
+                new.append(device)
+            codes[i] = code
+        if new:
+            self.n_devices = len(self._codes)
+            if self.n_devices > self._capacity:
+                self._resize(max(self.n_devices, 2 * self._capacity))
+            self.device_ids = np.concatenate([self.device_ids, np.array(new, dtype=object)])
+        return codes[inverse.reshape(-1)]
+
+    def update(self, columns):
+        """Update state dengan batch kolom reading (schema SensorBuffer, urut waktu)"""
+        n = len(columns['timestamp'])
+        if n == 0:
+            return
+        codes = self._device_codes(columns['device_id'])
+        ts = np.asarray(columns['timestamp'], dtype=np.int64)
+        values = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FIELDS])
+
+        rank = occurrence_rank(codes)
+        # Hanya max_history reading terakhir per device yang masih berpengaruh
+        per_device = np.bincount(codes, minlength=self.n_devices)
+        skip = np.maximum(per_device - self.max_history, 0)[codes]
+        keep = rank >= skip
+        codes, ts, values, rank = codes[keep], ts[keep], values[keep], rank[keep] - skip[keep]
+
+        for r in range(int(rank.max()) + 1):
+            sel = rank == r
+            self._step(codes[sel], ts[sel], values[sel])
+
+    def _step(self, d, ts, x):
+        """Satu langkah Holt untuk device ``d`` (unik) dengan observasi ``x``"""
+        fresh = self.count[d] == 0
+        if fresh.any():
+            f = d[fresh]
+            self.level[f] = x[fresh]
+            self.trend[f] = 0.0
+            self.var[f] = 0.0
+            self.step[f] = 0.0
+
+        old = ~fresh
+        if old.any():
+            o = d[old]
+            dt = np.maximum((ts[old] - self.last_ts[o]) / 1e9, self.min_dt)
+            pred = self.level[o] + self.trend[o] * dt[:, None]
+            err = x[old] - pred
+            self.level[o] = pred + self.alpha * err
+            self.trend[o] += self.alpha * self.beta * err / dt[:, None]
+            self.var[o] += VARIANCE_DECAY * (err ** 2 - self.var[o])
+            step = self.step[o]
+            self.step[o] = np.where(step == 0, dt, step + STEP_DECAY * (dt - step))
+
+        self.last_ts[d] = ts
+        self.count[d] += 1
+
+    # -------------------------------------------------
+    # QUERIES
+    # -------------------------------------------------
+    def crossings(self, now_ns, horizon=None, exclude=()):
+        """Threshold yang diprediksi terlewati dalam ``horizon`` detik dari ``now_ns``.
+
+        Return dict array (device_id, field, label, eta_s, value) urut dari
+        yang paling cepat. Device yang sudah melewati threshold tidak
+        dilaporkan (sudah ditangani alert biasa), begitu juga device di
+        ``exclude`` (misal device offline yang trend-nya sudah basi).
+        """
+        horizon = self.horizon if horizon is None else horizon
+        n = self.n_devices
+        active = self.count[:n] >= 2
+        for device in exclude:
+            code = self._codes.get(str(device))
+            if code is not None:
+                active[code] = False
+        # ETA dihitung dari reading terakhir, dikoreksi ke "sekarang"
+        elapsed = (now_ns - self.last_ts[:n]) / 1e9
+        # Threshold per device dari tabel kalibrasi
+        table = get_calibration()
+        rows = table.rows(self.device_ids[:n])
+
+        parts = []
+        for field, limit, direction, label in CROSSINGS:
+            threshold = table.values[limit][rows]
+            j = FIELDS.index(field)
+            level, trend = self.level[:n, j], self.trend[:n, j]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                eta = (threshold - level) / trend - elapsed
+            if direction == 'above':
+                hit = active & (level <= threshold) & (trend > 0)
+            else:
+                hit = active & (level >= threshold) & (trend < 0)
+            idx = np.flatnonzero(hit & (eta >= 0) & (eta <= horizon))
+            parts.append((idx, np.full(len(idx), field, dtype=object),
+                          np.full(len(idx), label, dtype=object), eta[idx], level[idx]))
+
+        idx, fields, labels, eta, value = (np.concatenate(column) for column in zip(*parts))
+        order = np.argsort(eta, kind='stable')
+        return {
+            'device_id': self.device_ids[idx[order]],
+            'field': fields[order],
+            'label': labels[order],
+            'eta_s': eta[order],
+            'value': value[order],
+        }
+
+    def forecast(self, device_id, horizon=None, points=30):
+        """Jalur prediksi satu device: timestamp + mean/lower/upper per field (None jika belum ada)"""
+        code = self._codes.get(str(device_id))
+        if code is None or self.count[code] < 2:
+            return None
+        horizon = self.horizon if horizon is None else horizon
+        h = np.linspace(0, horizon, points)
+        # Band melebar seiring jumlah langkah ke depan
+        steps = h / max(self.step[code], self.min_dt)
+        result = {'timestamp': self.last_ts[code] + (h * 1e9).astype(np.int64)}
+        for j, field in enumerate(FIELDS):
+            mean = self.level[code, j] + self.trend[code, j] * h
+            spread = self.band_z * np.sqrt(self.var[code, j] * (1 + steps))
+            result[field] = mean
+            result[f'{field}_lower'] = mean - spread
+            result[f'{field}_upper'] = mean + spread
+        return result
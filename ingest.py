@@ -0,0 +1,689 @@
+"""
+MQTT Ingest
+===========
+Client MQTT untuk dashboard. Setiap message yang masuk diubah menjadi satu
+reading dan dimasukkan ke antrian ``pending`` sehingga dashboard hanya
+memproses reading yang benar-benar baru (tidak membaca ulang nilai terakhir
+di setiap rerun).
+
+Duplikat ditekan per device dalam O(1):
+- payload dengan field ``seq`` dicek terhadap window bitmask sequence
+  (message terlambat tetap diterima, gap dihitung sebagai lost),
+- payload tanpa ``seq`` memakai receive stamp: payload identik dari device
+  yang sama dalam ``DUPLICATE_WINDOW`` detik dianggap duplikat.
+
+Topic di-route lewat ``TopicRouter`` (``MQTT_TOPIC_ROUTES``): pola wildcard
+seperti ``iot/{site}/{building}/sensor/data`` memberi format payload dan
+label site/device dari segment topic.
+
+Topic combined juga menerima payload batch dari gateway, didecode langsung
+menjadi array NumPy:
+- JSON array : ``[{"temperature": .., "humidity": .., "timestamp": .., "seq": ..}, ...]``
+- columnar   : ``{"sensor_id": "..", "temperature": [..], "humidity": [..],
+  "timestamp": [..], "seq": [..]}`` (``seq`` boleh berupa angka awal saja)
+"""
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from config import (
+    MQTT_BROKER, MQTT_PORT,
+    MQTT_TOPIC_ROUTES,
+    MQTT_CLIENT_ID_PREFIX, MQTT_USERNAME, MQTT_PASSWORD, MQTT_KEEPALIVE, MQTT_CONNECT_TIMEOUT,
+    RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY, CONNECTION_EVENT_HISTORY,
+    DEFAULT_DEVICE_ID, PENDING_MAX_MESSAGES, SEQUENCE_WINDOW, DUPLICATE_WINDOW
+)
+from sensor_buffer import NAT_NS
+from topic_router import TopicRouter
+
+# =====================================================
+# TIMESTAMP PARSING
+# =====================================================
+def parse_device_timestamp(value):
+    """Timestamp dari payload device -> int64 epoch ns (NAT_NS jika tidak ada)
+
+    Menerima epoch numerik (s / ms / us / ns, ditebak dari besarnya) atau
+    string ISO 8601. ISO tanpa zona waktu dianggap waktu lokal.
+    """
+    if value is None or value == "":
+        return NAT_NS
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            dt = datetime.fromisoformat(value)
+            return int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+
+    value = float(value)
+    for limit, scale in ((1e11, 1e9), (1e14, 1e6), (1e17, 1e3)):
+        if abs(value) < limit:
+            return int(round(value * scale))
+    return int(value)
+
+def parse_device_timestamps(values):
+    """Versi vectorized parse_device_timestamp untuk array timestamp batch"""
+    try:
+        raw = np.array([np.nan if v is None or v == "" else v for v in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        # Ada string ISO 8601: parse per item
+        return np.array([parse_device_timestamp(v) for v in values], dtype=np.int64)
+
+    magnitude = np.abs(raw)
+    scale = np.select([magnitude < 1e11, magnitude < 1e14, magnitude < 1e17], [1e9, 1e6, 1e3], 1.0)
+    missing = np.isnan(raw)
+    result = np.round(np.where(missing, 0, raw) * scale).astype(np.int64)
+    result[missing] = NAT_NS
+    return result
+
+# =====================================================
+# BATCH PAYLOAD
+# =====================================================
+class ReadingBatch:
+    """Beberapa reading dari satu message, disimpan sebagai kolom NumPy"""
+    __slots__ = ('columns',)
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns['temperature'])
+
+def _payload_device(data):
+    return str(data.get('sensor_id', data.get('device_id', DEFAULT_DEVICE_ID)))
+
+def decode_batch_payload(data, received_ns):
+    """Payload batch (list atau object columnar) -> dict kolom reading.
+
+    Receive time per reading direkonstruksi dari selisih timestamp device
+    terhadap reading terbaru di batch, sehingga chart tidak menumpuk semua
+    reading batch di satu titik waktu.
+    """
+    if isinstance(data, list):
+        n = len(data)
+        device_id = np.array([_payload_device(item) for item in data], dtype=object)
+        temperature = [item.get('temperature', 0) for item in data]
+        humidity = [item.get('humidity', 0) for item in data]
+        timestamps = [item.get('timestamp') for item in data]
+        seqs = [item.get('seq') for item in data]
+    else:
+        temperature = data['temperature']
+        n = len(temperature)
+        devices = data.get('sensor_id', data.get('device_id'))
+        if isinstance(devices, list):
+            device_id = np.array([str(d) for d in devices], dtype=object)
+        else:
+            device_id = np.full(n, _payload_device(data), dtype=object)
+        humidity = data.get('humidity', [0] * n)
+        timestamps = data.get('timestamp', [None] * n)
+        seqs = data.get('seq', [None] * n)
+        if isinstance(seqs, int):
+            seqs = range(seqs, seqs + n)
+
+    device_ns = parse_device_timestamps(timestamps)
+    received = np.full(n, received_ns, dtype=np.int64)
+    has_ts = device_ns != NAT_NS
+    if has_ts.any():
+        newest = device_ns[has_ts].max()
+        received[has_ts] = np.minimum(received_ns, received_ns - (newest - device_ns[has_ts]))
+
+    return {
+        'device_id': device_id,
+        'seq': np.array([-1 if s is None else s for s in seqs], dtype=np.int64),
+        'temperature': np.asarray(temperature, dtype=np.float64),
+        'humidity': np.asarray(humidity, dtype=np.float64),
+        'received_ns': received,
+        'device_ns': device_ns,
+    }
+
+def is_batch_payload(data):
+    return isinstance(data, list) or isinstance(data.get('temperature'), list)
+
+# =====================================================
+# SEQUENCE TRACKING
+# =====================================================
+class DeviceSequence:
+    """State sequence satu device"""
+    __slots__ = ('last_seq', 'first_seq', 'newest_ns', 'mask', 'last_payload', 'last_seen',
+                 'received', 'duplicates', 'lost', 'restarts')
+
+    def __init__(self):
+        self.last_seq = None
+        self.first_seq = None   # Seq terkecil sejak (re)start; gap lost hanya dihitung di atas ini
+        self.newest_ns = NAT_NS # Timestamp device terbaru sejak (re)start (NAT_NS = tidak ada)
+        self.mask = 0           # bit i = seq (last_seq - i) sudah diterima
+        self.last_payload = None
+        self.last_seen = None
+        self.received = 0
+        self.duplicates = 0
+        self.lost = 0
+        self.restarts = 0
+
+
+class SequenceTracker:
+    """Duplicate suppression dan gap detection per device"""
+
+    def __init__(self, window=SEQUENCE_WINDOW, duplicate_window=DUPLICATE_WINDOW):
+        self.window = window
+        self.duplicate_window_ns = int(duplicate_window * 1_000_000_000)
+        self._full_mask = (1 << window) - 1
+        self.devices = {}
+
+    def _state(self, device_id):
+        state = self.devices.get(device_id)
+        if state is None:
+            state = self.devices[device_id] = DeviceSequence()
+        return state
+
+    @staticmethod
+    def _restart(state, seq, device_ns):
+        """Mulai epoch sequence baru (device reboot / publisher restart)"""
+        state.last_seq = seq
+        state.first_seq = seq
+        state.newest_ns = device_ns
+        state.mask = 1
+
+    def observe(self, device_id, seq, device_ns=NAT_NS):
+        """Catat message bernomor seq. Return True jika baru, False jika duplikat
+
+        ``device_ns`` = timestamp device (epoch ns, NAT_NS jika tidak ada).
+        Seq yang mundur dengan timestamp lebih baru dari semua reading
+        sebelumnya = device restart (seq mulai lagi dari awal), bukan
+        duplikat / message terlambat.
+        """
+        state = self._state(device_id)
+
+        if state.last_seq is None:
+            self._restart(state, seq, device_ns)
+        elif seq > state.last_seq:
+            shift = seq - state.last_seq
+            if shift > 1:
+                state.lost += shift - 1
+            state.mask = ((state.mask << shift) | 1) & self._full_mask if shift < self.window else 1
+            state.last_seq = seq
+            state.newest_ns = max(state.newest_ns, device_ns)
+        else:
+            offset = state.last_seq - seq
+            restarted = device_ns != NAT_NS and state.newest_ns != NAT_NS and device_ns > state.newest_ns
+            if restarted or offset >= self.window:
+                # Sequence mundur dengan timestamp baru / mundur jauh = device restart
+                state.restarts += 1
+                self._restart(state, seq, device_ns)
+            elif state.mask >> offset & 1:
+                state.duplicates += 1
+                return False
+            elif seq > state.first_seq:
+                # Message terlambat mengisi gap yang sudah dihitung lost
+                state.mask |= 1 << offset
+                state.lost -= 1
+            else:
+                # Lebih tua dari seq pertama: gap di antaranya baru sekarang terlihat
+                state.mask |= 1 << offset
+                state.lost += state.first_seq - seq - 1
+                state.first_seq = seq
+
+        state.received += 1
+        return True
+
+    def observe_run(self, device_id, first, count, newest_ns=NAT_NS):
+        """Catat seq berurutan ``first .. first+count-1`` sekaligus.
+
+        Hanya untuk run yang seluruhnya lebih baru dari last_seq; return
+        False jika tidak memenuhi (pakai ``observe`` per seq).
+        ``newest_ns`` = timestamp device terbaru di run.
+        """
+        state = self._state(device_id)
+        if state.last_seq is not None and first <= state.last_seq:
+            return False
+
+        run_mask = (1 << min(count, self.window)) - 1
+        last = first + count - 1
+        state.newest_ns = max(state.newest_ns, newest_ns)
+        if state.last_seq is None:
+            state.mask = run_mask
+            state.first_seq = first
+        else:
+            state.lost += first - state.last_seq - 1
+            shift = last - state.last_seq
+            state.mask = ((state.mask << shift) | run_mask) & self._full_mask if shift < self.window else run_mask
+        state.last_seq = last
+        state.received += count
+        return True
+
+    def observe_batch(self, device_ids, seqs, device_ns=None):
+        """Dedup satu batch reading, return mask boolean reading yang baru"""
+        keep = np.ones(len(seqs), dtype=bool)
+        if device_ns is None:
+            device_ns = np.full(len(seqs), NAT_NS, dtype=np.int64)
+        for device_id in set(device_ids.tolist()):
+            idx = np.flatnonzero(device_ids == device_id)
+            dev_seqs = seqs[idx]
+            sequenced = dev_seqs >= 0
+            idx, dev_seqs = idx[sequenced], dev_seqs[sequenced]
+            if len(dev_seqs) == 0:
+                continue
+            dev_ns = device_ns[idx]
+            # Fast path: run berurutan tanpa duplikat / reorder
+            if (np.all(np.diff(dev_seqs) == 1)
+                    and self.observe_run(device_id, int(dev_seqs[0]), len(dev_seqs), int(dev_ns.max()))):
+                continue
+            for i, seq, ns in zip(idx, dev_seqs.tolist(), dev_ns.tolist()):
+                keep[i] = self.observe(device_id, seq, ns)
+        return keep
+
+    def observe_unsequenced(self, device_id, payload, received_ns):
+        """Dedup message tanpa seq memakai receive stamp (epoch ns)"""
+        state = self._state(device_id)
+        if (payload == state.last_payload and state.last_seen is not None
+                and received_ns - state.last_seen < self.duplicate_window_ns):
+            state.duplicates += 1
+            return False
+
+        state.last_payload = payload
+        state.last_seen = received_ns
+        state.received += 1
+        return True
+
+    def totals(self):
+        """Ringkasan counter semua device"""
+        return {
+            'devices': len(self.devices),
+            'received': sum(s.received for s in self.devices.values()),
+            'duplicates': sum(s.duplicates for s in self.devices.values()),
+            'lost': sum(s.lost for s in self.devices.values()),
+        }
+
+# =====================================================
+# CONNECTION SUPERVISOR
+# =====================================================
+LOOP_TIMEOUT = 0.5  # Detik; interval paho loop() di thread supervisor
+
+class ConnectionSupervisor:
+    """Thread background yang menjaga koneksi MQTT.
+
+    Semua operasi jaringan (DNS, TCP connect, network loop paho) berjalan
+    di thread ini, jadi render Streamlit tidak pernah menunggu broker.
+    Saat koneksi putus, retry memakai backoff eksponensial dengan jitter
+    (``RECONNECT_BASE_DELAY`` .. ``RECONNECT_MAX_DELAY``); topic
+    di-subscribe ulang oleh ``on_connect`` milik client.
+    """
+
+    def __init__(self, client, host=MQTT_BROKER, port=MQTT_PORT, keepalive=MQTT_KEEPALIVE,
+                 base_delay=RECONNECT_BASE_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        self.client = client
+        self.client.connect_timeout = MQTT_CONNECT_TIMEOUT
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.state = "disconnected"
+        self.events = deque(maxlen=CONNECTION_EVENT_HISTORY)  # (epoch ns, state, detail)
+        self.listeners = []
+        self.attempts = 0           # Percobaan gagal berturut-turut
+        self.total_attempts = 0
+        self.outages = 0
+        self.last_outage_s = None
+        self.longest_outage_s = 0.0
+        self.total_downtime_s = 0.0
+        self.last_handshake_s = None  # Durasi percobaan connect yang berhasil
+
+        self._down_since = time.monotonic()
+        self._was_connected = False
+        self._attempt_started = None
+        self._next_retry_at = 0.0
+        self._socket_open = False
+        self._refused = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ----- control (dipanggil dari thread mana saja) -----
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mqtt-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=MQTT_CONNECT_TIMEOUT + 1)
+
+    def request_reconnect(self):
+        """Retry sekarang juga (tombol Reconnect), tanpa menunggu backoff"""
+        self.attempts = 0
+        self._next_retry_at = 0.0
+        self._wake.set()
+
+    def add_listener(self, callback):
+        """callback(state, detail) dipanggil di thread supervisor setiap perubahan state"""
+        self.listeners.append(callback)
+
+    def backoff_delay(self, attempt):
+        """Delay retry ke-``attempt``: eksponensial, jitter di setengah atas"""
+        cap = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(cap / 2, cap)
+
+    # ----- dipanggil dari callback paho (thread supervisor) -----
+    def mark_connected(self):
+        now = time.monotonic()
+        if self._attempt_started is not None:
+            self.last_handshake_s = now - self._attempt_started
+        if self._was_connected and self._down_since is not None:
+            outage = now - self._down_since
+            self.last_outage_s = outage
+            self.longest_outage_s = max(self.longest_outage_s, outage)
+            self.total_downtime_s += outage
+        self._down_since = None
+        self._was_connected = True
+        self.attempts = 0
+        self._emit("connected", f"{self.host}:{self.port}")
+
+    def mark_refused(self, rc):
+        self._refused = True
+        self._emit("refused", f"return code {rc}")
+
+    def mark_disconnected(self, rc):
+        if self._down_since is None and not self._stop.is_set():
+            self._down_since = time.monotonic()
+            self.outages += 1
+        self._emit("disconnected", f"rc={rc}")
+
+    # ----- worker -----
+    def _emit(self, state, detail=""):
+        self.state = state
+        self.events.append((time.time_ns(), state, detail))
+        for callback in self.listeners:
+            try:
+                callback(state, detail)
+            except Exception as e:
+                print(f"❌ Connection listener error: {e}")
+
+    def _schedule_retry(self, reason):
+        delay = self.backoff_delay(self.attempts)
+        self.attempts += 1
+        self._next_retry_at = time.monotonic() + delay
+        self._emit("backoff", f"{reason}; retry in {delay:.1f}s")
+
+    def _attempt(self):
+        self.total_attempts += 1
+        self._attempt_started = time.monotonic()
+        self._emit("connecting", f"attempt {self.attempts + 1}")
+        try:
+            self.client.connect(self.host, self.port, self.keepalive)
+            self._socket_open = True  # CONNACK diproses oleh loop() -> on_connect
+        except Exception as e:
+            self._schedule_retry(str(e) or type(e).__name__)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._socket_open:
+                wait = self._next_retry_at - time.monotonic()
+                if wait > 0:
+                    self._wake.wait(wait)
+                    self._wake.clear()
+                    continue
+                self._attempt()
+                continue
+
+            rc = self.client.loop(timeout=LOOP_TIMEOUT)
+            if self._refused:
+                self._refused = False
+                self.client.disconnect()
+                rc = mqtt.MQTT_ERR_CONN_REFUSED
+            if rc != mqtt.MQTT_ERR_SUCCESS:
+                self._socket_open = False
+                if self._down_since is None:
+                    # Putus tanpa on_disconnect (misal socket error saat handshake)
+                    self.mark_disconnected(rc)
+                self._schedule_retry(f"connection lost (rc={rc})")
+
+        if self._socket_open:
+            self.client.disconnect()
+            self.client.loop(timeout=0.1)
+            self._socket_open = False
+        self._emit("stopped")
+
+    def stats(self):
+        """Snapshot metrik koneksi untuk UI"""
+        now = time.monotonic()
+        return {
+            'state': self.state,
+            'attempts': self.attempts,
+            'total_attempts': self.total_attempts,
+            'outages': self.outages,
+            'down_for_s': None if self._down_since is None else now - self._down_since,
+            'next_retry_s': max(0.0, self._next_retry_at - now) if self.state == "backoff" else None,
+            'last_outage_s': self.last_outage_s,
+            'longest_outage_s': self.longest_outage_s,
+            'total_downtime_s': self.total_downtime_s,
+            'last_handshake_s': self.last_handshake_s,
+            'recovery_bound_s': self.max_delay + MQTT_CONNECT_TIMEOUT,
+        }
+
+# =====================================================
+# READING COLUMNS
+# =====================================================
+READING_COLUMNS = {
+    'device_id': object,
+    'seq': np.int64,
+    'temperature': np.float64,
+    'humidity': np.float64,
+    'received_ns': np.int64,
+    'device_ns': np.int64,
+}
+
+def readings_to_columns(readings):
+    """List reading dict -> dict kolom NumPy"""
+    return {
+        name: np.array([reading[name] for reading in readings], dtype=dtype)
+        for name, dtype in READING_COLUMNS.items()
+    }
+
+# =====================================================
+# MQTT CLIENT CLASS
+# =====================================================
+class MQTTClient:
+    def __init__(self, client_id=None, topics=None, routes=None):
+        client_id = client_id or f"{MQTT_CLIENT_ID_PREFIX}_{random.randint(1000, 9999)}"
+        handlers = {
+            'temperature': self._on_temperature,
+            'humidity': self._on_humidity,
+            'combined': self._on_combined,
+        }
+        self.router = TopicRouter(
+            (pattern, schema, handlers[schema]) for pattern, schema in (routes or MQTT_TOPIC_ROUTES)
+        )
+        # Topic filter yang di-subscribe (bisa shared subscription / wildcard)
+        self.topics = topics or self.router.filters
+        self.client = mqtt.Client(client_id=client_id)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.on_disconnect = self.on_disconnect
+        if MQTT_USERNAME and MQTT_PASSWORD:
+            self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+        self.connected = False
+        self.latest_temp = None
+        self.latest_humidity = None
+
+        # Reading (dict) atau ReadingBatch baru yang belum diambil dashboard
+        self.pending = deque(maxlen=PENDING_MAX_MESSAGES)
+        self.overflow = 0
+        self.tracker = SequenceTracker()
+        self._partial = {}  # device -> field; join temperature + humidity dari topic terpisah
+        self.supervisor = ConnectionSupervisor(self.client)
+
+    def on_connect(self, client, userdata, flags, rc):
+        """Callback saat koneksi berhasil"""
+        if rc == 0:
+            self.connected = True
+            print(f"✅ Connected to MQTT Broker: {MQTT_BROKER}")
+            # Subscribe (ulang) ke topics: clean session tidak menyimpan subscription
+            for topic in self.topics:
+                self.client.subscribe(topic)
+            print(f"📡 Subscribed to topics: {', '.join(self.topics)}")
+            self.supervisor.mark_connected()
+        else:
+            self.connected = False
+            print(f"❌ Failed to connect, return code {rc}")
+            self.supervisor.mark_refused(rc)
+
+    def on_disconnect(self, client, userdata, rc):
+        """Callback saat terputus"""
+        was_connected = self.connected
+        self.connected = False
+        if was_connected:
+            print(f"⚠️ Disconnected from MQTT Broker")
+            self.supervisor.mark_disconnected(rc)
+
+    def on_message(self, client, userdata, msg):
+        """Callback saat menerima message"""
+        try:
+            received_ns = time.time_ns()
+            # Satu lookup (cache per topic): handler + label dari segment topic
+            match = self.router.route(msg.topic)
+            if match is None:
+                return
+            match.handler(match, msg.payload.decode(), received_ns)
+
+        except Exception as e:
+            print(f"❌ Error parsing message: {e}")
+
+    def _on_temperature(self, match, payload, received_ns):
+        self.latest_temp = float(payload)
+        print(f"🌡️ Temperature received: {self.latest_temp}°C")
+        self._join_scalar(match.resolve_device(DEFAULT_DEVICE_ID), 'temperature', self.latest_temp, received_ns)
+
+    def _on_humidity(self, match, payload, received_ns):
+        self.latest_humidity = float(payload)
+        print(f"💧 Humidity received: {self.latest_humidity}%")
+        self._join_scalar(match.resolve_device(DEFAULT_DEVICE_ID), 'humidity', self.latest_humidity, received_ns)
+
+    def _on_combined(self, match, payload, received_ns):
+        # Parse JSON data
+        data = json.loads(payload)
+        if is_batch_payload(data):
+            self._emit_batch(match, data, payload, received_ns)
+            return
+        device_id = match.resolve_device(_payload_device(data))
+        seq = data.get('seq')
+        device_ns = parse_device_timestamp(data.get('timestamp'))
+        if seq is None:
+            is_new = self.tracker.observe_unsequenced(device_id, payload, received_ns)
+        else:
+            is_new = self.tracker.observe(device_id, int(seq), device_ns)
+        if not is_new:
+            print(f"♻️ Duplicate message dropped: device={device_id}, seq={seq}")
+            return
+
+        self.latest_temp = float(data.get('temperature', 0))
+        self.latest_humidity = float(data.get('humidity', 0))
+        print(f"📦 Combined data received: Temp={self.latest_temp}°C, Humidity={self.latest_humidity}%")
+        self._emit(device_id, -1 if seq is None else int(seq),
+                   self.latest_temp, self.latest_humidity,
+                   received_ns, device_ns)
+
+    def _join_scalar(self, device_id, field, value, received_ns):
+        """Gabungkan temperature & humidity dari topic terpisah jadi satu reading"""
+        partial = self._partial.setdefault(device_id, {})
+        partial[field] = value
+        if len(partial) < 2:
+            return
+
+        temp, humidity = partial['temperature'], partial['humidity']
+        del self._partial[device_id]
+        if self.tracker.observe_unsequenced(device_id, (temp, humidity), received_ns):
+            self._emit(device_id, -1, temp, humidity, received_ns, NAT_NS)
+
+    def _emit(self, device_id, seq, temp, humidity, received_ns, device_ns):
+        """Masukkan reading ke antrian pending"""
+        if len(self.pending) == self.pending.maxlen:
+            self.overflow += 1
+        self.pending.append({
+            'device_id': device_id,
+            'seq': seq,
+            'temperature': temp,
+            'humidity': humidity,
+            'received_ns': received_ns,
+            'device_ns': device_ns,
+        })
+
+    def _emit_batch(self, match, data, payload, received_ns):
+        """Decode payload batch ke kolom NumPy, dedup, lalu antrikan sekali"""
+        columns = decode_batch_payload(data, received_ns)
+        if len(columns['seq']) == 0:
+            return
+        if match.labels:
+            # Id device dari label topic (per id unik, bukan per reading)
+            uniq, inverse = np.unique(columns['device_id'].astype(str), return_inverse=True)
+            resolved = np.array([match.resolve_device(d) for d in uniq.tolist()], dtype=object)
+            columns['device_id'] = resolved[inverse.reshape(-1)]
+        if (columns['seq'] < 0).all():
+            if not self.tracker.observe_unsequenced(columns['device_id'][0], payload, received_ns):
+                print(f"♻️ Duplicate batch dropped: device={columns['device_id'][0]}")
+                return
+        else:
+            keep = self.tracker.observe_batch(columns['device_id'], columns['seq'], columns['device_ns'])
+            if not keep.all():
+                print(f"♻️ {int((~keep).sum())} duplicate readings dropped from batch")
+                columns = {name: values[keep] for name, values in columns.items()}
+            if len(columns['seq']) == 0:
+                return
+
+        self.latest_temp = float(columns['temperature'][-1])
+        self.latest_humidity = float(columns['humidity'][-1])
+        print(f"📦 Batch received: {len(columns['seq'])} readings, last Temp={self.latest_temp}°C")
+        if len(self.pending) == self.pending.maxlen:
+            self.overflow += 1
+        self.pending.append(ReadingBatch(columns))
+
+    def drain_columns(self):
+        """Ambil semua reading baru sebagai satu dict kolom NumPy (None jika kosong)"""
+        chunks, singles = [], []
+        for _ in range(len(self.pending)):
+            item = self.pending.popleft()
+            if isinstance(item, ReadingBatch):
+                if singles:
+                    chunks.append(readings_to_columns(singles))
+                    singles = []
+                chunks.append(item.columns)
+            else:
+                singles.append(item)
+        if singles:
+            chunks.append(readings_to_columns(singles))
+        if not chunks:
+            return None
+        if len(chunks) == 1:
+            return chunks[0]
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in READING_COLUMNS}
+
+    def connect(self):
+        """Koneksi ke MQTT Broker (non-blocking: dikerjakan thread supervisor)"""
+        if self.supervisor.running:
+            self.supervisor.request_reconnect()
+        else:
+            self.supervisor.start()
+        return True
+
+    def disconnect(self):
+        """Disconnect dari broker"""
+        self.supervisor.stop()
+        self.connected = False
+
+    def get_latest_data(self):
+        """Ambil data terbaru"""
+        return self.latest_temp, self.latest_humidity
@@ -0,0 +1,147 @@
+"""
+Ingest Service
+==============
+Satu proses ingest yang dipakai bersama: menerima message MQTT, melakukan
+klasifikasi & deteksi anomaly sekali per reading, lalu mem-broadcast batch
+reading ke semua subscriber (session dashboard dan client SSE).
+
+Dengan mode ini ratusan viewer pasif cukup dilayani oleh satu broadcast,
+bukan ratusan rerun script Python.
+
+Jalankan standalone (tanpa Streamlit):
+    python ingest_service.py
+"""
+
+import threading
+import time
+
+from classifier import build_columns
+from config import (
+    STREAM_ENABLED, STREAM_HOST, STREAM_PORT,
+    STREAM_FLUSH_INTERVAL, STREAM_SNAPSHOT_POINTS, WAL_ENABLED, OVERLOAD_ENABLED
+)
+from ingest import MQTTClient
+from overload import LoadShedder
+from sensor_buffer import SensorBuffer
+from stream_server import Broadcaster, Frame, encode_columns, open_stream_server
+from wal import WriteAheadLog
+
+# =====================================================
+# INGEST SERVICE CLASS
+# =====================================================
+class IngestService:
+    def __init__(self, flush_interval=STREAM_FLUSH_INTERVAL, stream_enabled=STREAM_ENABLED,
+                 host=STREAM_HOST, port=STREAM_PORT, wal=None):
+        self.mqtt_client = MQTTClient()
+        self.broadcaster = Broadcaster()
+        self.buffer = SensorBuffer(STREAM_SNAPSHOT_POINTS)
+        self.flush_interval = flush_interval
+        # Write-ahead log (opsional): counter dilanjutkan dari record terakhir
+        self.wal = wal
+        self.total_messages = wal.messages_total if wal is not None else 0
+        self.alert_count = wal.alerts_total if wal is not None else 0
+        # Overload control: reading normal dibuang saat backlog, anomaly selalu lolos
+        self.shedder = LoadShedder() if OVERLOAD_ENABLED else None
+        self._frame_seq = 0
+        self._buffer_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stream_server = open_stream_server(self, host, port) if stream_enabled else None
+
+    def start(self):
+        """Connect MQTT, jalankan worker dan stream endpoint"""
+        self.mqtt_client.connect()
+        if self.wal is not None:
+            self.wal.start()
+        self._thread = threading.Thread(target=self._run, name="ingest-service", daemon=True)
+        self._thread.start()
+        if self.stream_server is not None:
+            self.stream_server.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.stream_server is not None:
+            self.stream_server.stop()
+        self.mqtt_client.disconnect()
+        if self.wal is not None:
+            self.wal.close()
+
+    def _run(self):
+        """Worker: gabungkan reading per flush interval lalu broadcast"""
+        while not self._stop.wait(self.flush_interval):
+            self.process_pending()
+
+    def process_pending(self):
+        """Proses semua reading yang antri di MQTT client, return jumlahnya"""
+        readings = self.mqtt_client.drain_columns()
+        if readings is None:
+            return 0
+
+        columns = build_columns(readings)
+        # Counter menghitung semua reading yang diterima, termasuk yang nanti di-shed
+        received = len(columns['timestamp'])
+        self.total_messages += received
+        self.alert_count += int(columns['alert_triggered'].sum())
+        if self.shedder is not None:
+            # Depth = reading yang terkumpul sejak flush sebelumnya
+            columns = self.shedder.shed(columns, depth=received)
+            kept = len(columns['timestamp']) if columns is not None else 0
+            if self.wal is not None:
+                self.wal.count_shed(received - kept)
+            if columns is None:
+                return 0
+        with self._buffer_lock:
+            # Seq frame naik bersama isi buffer, jadi snapshot_frame konsisten
+            self.buffer.extend(columns)
+            self._frame_seq += 1
+            frame = Frame(self._frame_seq, columns)
+        count = len(columns['timestamp'])
+        if self.wal is not None:
+            self.wal.append(columns)
+
+        self.broadcaster.publish(frame)
+        return count
+
+    def subscribe(self):
+        """Subscriber baru untuk session dashboard"""
+        return self.broadcaster.subscribe()
+
+    def snapshot_frame(self):
+        """Reading terakhir untuk client yang baru connect -> (seq frame terakhir di snapshot, JSON)"""
+        with self._buffer_lock:
+            latest = self.buffer.columns()
+            seq = self._frame_seq
+        return seq, encode_columns(latest, seq, kind="snapshot")
+
+    def stream_stats(self):
+        stats = self.broadcaster.stats()
+        stats.update({
+            'mqtt_connected': self.mqtt_client.connected,
+            'total_messages': self.total_messages,
+            'alert_count': self.alert_count,
+            'overload': self.shedder.stats() if self.shedder is not None else None,
+        })
+        return stats
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    print("=" * 60)
+    print("📡 IoT Ingest Service")
+    print("=" * 60)
+
+    service = IngestService(wal=WriteAheadLog() if WAL_ENABLED else None)
+    service.start()
+    try:
+        while True:
+            time.sleep(10)
+            stats = service.stream_stats()
+            print(f"📊 Messages: {stats['total_messages']} | Alerts: {stats['alert_count']} | "
+                  f"Clients: {stats['subscribers']} | Dropped frames: {stats['dropped']}")
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping ingest service...")
+        service.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Device Liveness - Last-Seen Tracking
+====================================
+``MQTTClient.connected`` hanya menunjukkan koneksi ke broker. Modul ini
+melacak kapan setiap device terakhir mengirim reading, supaya ESP32 yang
+mati tidak terus tampil dengan nilai terakhirnya seolah masih live.
+
+Deadline expiry semua device disimpan di satu min-heap, dengan paling
+banyak satu entry per device:
+
+- reading baru hanya meng-update ``last_seen`` (O(1)); heap tidak disentuh
+  selama device masih punya entry,
+- ``poll`` hanya mem-pop entry yang deadline-nya sudah lewat. Jika device
+  ternyata mengirim reading sejak entry dibuat, entry dijadwalkan ulang ke
+  deadline sebenarnya (O(log n)), jika tidak device menjadi offline.
+
+Jadi ribuan device yang diam terdeteksi tanpa scan semua device, dan
+biaya per device paling banyak satu operasi heap per periode timeout.
+
+Timeout diatur per kelas device (``LIVENESS_DEVICE_CLASSES`` /
+``LIVENESS_TIMEOUTS``). Device tidak dinyatakan offline sebelum tracker
+sendiri berjalan selama satu timeout (misal setelah warm restart dari WAL).
+"""
+
+import heapq
+import time
+from collections import deque
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+from config import LIVENESS_DEVICE_CLASSES, LIVENESS_TIMEOUTS, LIVENESS_EVENT_HISTORY
+
+ONLINE, OFFLINE = "online", "offline"
+
+class DeviceLiveness:
+    """State liveness satu device"""
+    __slots__ = ('device_class', 'timeout_ns', 'last_seen', 'scheduled', 'stale')
+
+    def __init__(self, device_class, timeout_ns):
+        self.device_class = device_class
+        self.timeout_ns = timeout_ns
+        self.last_seen = None
+        self.scheduled = False      # Punya entry di heap
+        self.stale = False
+
+class LivenessTracker:
+    """Last-seen per device + heap deadline untuk deteksi device yang diam"""
+
+    def __init__(self, classes=LIVENESS_DEVICE_CLASSES, timeouts=LIVENESS_TIMEOUTS,
+                 history=LIVENESS_EVENT_HISTORY, now_ns=None):
+        self.classes = tuple(classes)
+        self.timeouts = dict(timeouts)
+        self.devices = {}
+        self.events = deque(maxlen=history)   # (epoch ns, device, ONLINE/OFFLINE, detik diam)
+        self.started_ns = time.time_ns() if now_ns is None else now_ns
+        self.stale = {}                       # device -> last_seen, urut saat menjadi offline
+        self._heap = []                       # (deadline ns, device)
+
+    def device_class(self, device_id):
+        for pattern, name in self.classes:
+            if fnmatchcase(device_id, pattern):
+                return name
+        return "default"
+
+    def _state(self, device_id):
+        state = self.devices.get(device_id)
+        if state is None:
+            name = self.device_class(device_id)
+            timeout = self.timeouts.get(name, self.timeouts["default"])
+            state = self.devices[device_id] = DeviceLiveness(name, int(timeout * 1_000_000_000))
+        return state
+
+    def _deadline(self, state):
+        # Belum bisa mengklaim device diam lebih lama dari tracker berjalan
+        return max(state.last_seen, self.started_ns) + state.timeout_ns
+
+    # -------------------------------------------------
+    # UPDATES
+    # -------------------------------------------------
+    def observe(self, device_ids, timestamps):
+        """Catat batch reading (array device id + epoch ns). Return event ONLINE (device yang kembali)"""
+        if len(device_ids) == 0:
+            return []
+        uniq, inverse = np.unique(np.asarray(device_ids, dtype=object).astype(str), return_inverse=True)
+        latest = np.full(len(uniq), np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(latest, inverse.reshape(-1), np.asarray(timestamps, dtype=np.int64))
+
+        events = []
+        for device, seen in zip(uniq.tolist(), latest.tolist()):
+            state = self._state(device)
+            previous = state.last_seen
+            if previous is not None and seen <= previous:
+                continue
+            state.last_seen = seen
+            if state.stale:
+                state.stale = False
+                del self.stale[device]
+                events.append((seen, device, ONLINE, (seen - previous) / 1e9))
+            if not state.scheduled:
+                state.scheduled = True
+                heapq.heappush(self._heap, (self._deadline(state), device))
+        self.events.extend(events)
+        return events
+
+    def poll(self, now_ns=None):
+        """Device yang deadline-nya lewat di ``now_ns`` menjadi offline. Return event OFFLINE baru"""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        events = []
+        heap = self._heap
+        while heap and heap[0][0] <= now_ns:
+            _, device = heapq.heappop(heap)
+            state = self.devices[device]
+            deadline = self._deadline(state)
+            if deadline > now_ns:
+                # Ada reading sejak entry dibuat: jadwalkan ulang ke deadline sebenarnya
+                heapq.heappush(heap, (deadline, device))
+                continue
+            state.scheduled = False
+            state.stale = True
+            self.stale[device] = state.last_seen
+            events.append((now_ns, device, OFFLINE, (now_ns - state.last_seen) / 1e9))
+        self.events.extend(events)
+        return events
+
+    def clear(self):
+        self.devices.clear()
+        self._heap.clear()
+        self.stale.clear()
+
+    # -------------------------------------------------
+    # QUERIES
+    # -------------------------------------------------
+    def is_stale(self, device_id):
+        state = self.devices.get(device_id)
+        return state is not None and state.stale
+
+    def silent_for(self, device_id, now_ns=None):
+        """Detik sejak reading terakhir device (None jika belum pernah terlihat)"""
+        state = self.devices.get(device_id)
+        if state is None or state.last_seen is None:
+            return None
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        return max(now_ns - state.last_seen, 0) / 1e9
+
+    def stale_devices(self, limit=None):
+        """Device offline, yang paling lama diam lebih dulu: list (device, last_seen ns)"""
+        return sorted(self.stale.items(), key=lambda item: item[1])[:limit]
+
+    def stats(self):
+        return {
+            'devices': len(self.devices),
+            'online': len(self.devices) - len(self.stale),
+            'stale': len(self.stale),
+            'scheduled': len(self._heap),
+        }
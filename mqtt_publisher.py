@@ -11,16 +11,19 @@ import paho.mqtt.client as mqtt
 import time
 import random
 import json
+import sqlite3
+import threading
 from datetime import datetime
 
+from config import (
+    MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_TEMP, MQTT_TOPIC_HUMIDITY, MQTT_TOPIC_COMBINED,
+    PUBLISH_QOS, PUBLISH_BATCH_SIZE, PUBLISH_SCALAR_TOPICS, PUBLISH_QUEUE_PATH,
+    PUBLISH_QUEUE_MAX, PUBLISH_FLUSH_RATE, PUBLISH_MAX_INFLIGHT
+)
+
 # =====================================================
 # KONFIGURASI MQTT
 # =====================================================
-MQTT_BROKER = "broker.hivemq.com"  # Ganti dengan broker Anda
-MQTT_PORT = 1883
-MQTT_TOPIC_TEMP = "iot/temperature"
-MQTT_TOPIC_HUMIDITY = "iot/humidity"
-MQTT_TOPIC_COMBINED = "iot/sensors"
 MQTT_CLIENT_ID = f"iot_sensor_{random.randint(1000, 9999)}"
 
 # =====================================================
@@ -31,24 +34,209 @@ TEMP_MAX = 35.0
 HUMIDITY_MIN = 30.0
 HUMIDITY_MAX = 80.0
 PUBLISH_INTERVAL = 2  # seconds
+FLUSH_TICK = 0.05     # seconds; interval loop kirim antrian
+
+# =====================================================
+# OFFLINE QUEUE
+# =====================================================
+class OfflineQueue:
+    """Antrian message di disk (SQLite) dengan batas jumlah message.
+
+    Setiap message baru masuk antrian dulu dan baru dihapus setelah broker
+    mengonfirmasi publish, jadi message tidak hilang saat broker putus
+    maupun saat publisher di-restart.
+    """
+
+    def __init__(self, path=PUBLISH_QUEUE_PATH, max_messages=PUBLISH_QUEUE_MAX):
+        self.max_messages = max_messages
+        self.dropped = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "topic TEXT NOT NULL, payload TEXT NOT NULL)"
+        )
+        self.db.commit()
+        self.size = self.db.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def push(self, messages):
+        """Tambah list (topic, payload); buang message tertua jika melebihi batas"""
+        self.db.executemany("INSERT INTO queue (topic, payload) VALUES (?, ?)", messages)
+        self.size += len(messages)
+        overflow = self.size - self.max_messages
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM queue WHERE id IN (SELECT id FROM queue ORDER BY id LIMIT ?)", (overflow,)
+            )
+            self.size -= overflow
+            self.dropped += overflow
+        self.db.commit()
+
+    def peek(self, after_id, limit):
+        """Message tertua dengan id > after_id"""
+        return self.db.execute(
+            "SELECT id, topic, payload FROM queue WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+        ).fetchall()
+
+    def ack(self, ids):
+        """Hapus message yang sudah dikonfirmasi broker"""
+        cursor = self.db.executemany("DELETE FROM queue WHERE id = ?", [(i,) for i in ids])
+        self.size -= cursor.rowcount
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class TokenBucket:
+    """Rate limiter sederhana untuk flush backlog"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.last = time.monotonic()
+
+    def take(self, n):
+        """Ambil maksimal n token, return jumlah yang didapat"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        granted = min(n, int(self.tokens))
+        self.tokens -= granted
+        return granted
 
 # =====================================================
-# MQTT CALLBACKS
+# BUFFERED PUBLISHER
 # =====================================================
-def on_connect(client, userdata, flags, rc):
-    """Callback ketika koneksi berhasil"""
-    if rc == 0:
-        print(f"✅ Connected to MQTT Broker: {MQTT_BROKER}")
-        print(f"📡 Publishing to topics:")
-        print(f"   - {MQTT_TOPIC_TEMP}")
-        print(f"   - {MQTT_TOPIC_HUMIDITY}")
-        print(f"   - {MQTT_TOPIC_COMBINED}")
-    else:
-        print(f"❌ Failed to connect, return code {rc}")
-
-def on_publish(client, userdata, mid):
-    """Callback ketika publish berhasil"""
-    pass
+class BufferedPublisher:
+    """Publisher MQTT dengan antrian offline, batching, dan flush ber-rate limit"""
+
+    def __init__(self, client_id=MQTT_CLIENT_ID, qos=PUBLISH_QOS, batch_size=PUBLISH_BATCH_SIZE,
+                 queue=None, flush_rate=PUBLISH_FLUSH_RATE, max_inflight=PUBLISH_MAX_INFLIGHT):
+        self.qos = qos
+        self.batch_size = batch_size
+        self.queue = queue or OfflineQueue()
+        self.limiter = TokenBucket(flush_rate)
+        self.max_inflight = max_inflight
+        self.connected = False
+        self.sent = 0
+        self.batch = []
+        self._inflight = {}      # mid -> id baris antrian (QoS > 0)
+        self._acked_rows = []
+        # on_publish berjalan di thread network paho; dipegang selama publish() +
+        # pencatatan mid, jadi ack selalu menemukan barisnya. RLock: tanpa loop
+        # thread paho memanggil on_publish di dalam publish()
+        self._ack_lock = threading.RLock()
+        self._last_sent_id = 0
+
+        self.client = mqtt.Client(client_id=client_id)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_publish = self.on_publish
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+
+    def on_connect(self, client, userdata, flags, rc):
+        """Callback ketika koneksi berhasil"""
+        if rc == 0:
+            self.connected = True
+            print(f"✅ Connected to MQTT Broker: {MQTT_BROKER}")
+            print(f"📡 Publishing to topics (QoS {self.qos}):")
+            if self.batch_size == 1 and PUBLISH_SCALAR_TOPICS:
+                print(f"   - {MQTT_TOPIC_TEMP}")
+                print(f"   - {MQTT_TOPIC_HUMIDITY}")
+            print(f"   - {MQTT_TOPIC_COMBINED}")
+            if self.queue.size:
+                print(f"📤 Flushing {self.queue.size} queued messages...")
+        else:
+            print(f"❌ Failed to connect, return code {rc}")
+
+    def on_disconnect(self, client, userdata, rc):
+        """Callback ketika koneksi terputus: message selanjutnya antri di disk"""
+        self.connected = False
+        print(f"📴 Disconnected (rc={rc}), buffering to {PUBLISH_QUEUE_PATH}")
+
+    def on_publish(self, client, userdata, mid):
+        """Callback ketika publish dikonfirmasi broker (PUBACK)
+
+        Mid yang tidak tercatat diabaikan: ack message yang dikirim ulang paho
+        setelah reconnect (barisnya sudah dijadwalkan kirim ulang oleh flush).
+        """
+        with self._ack_lock:
+            row_id = self._inflight.pop(mid, None)
+            if row_id is not None:
+                self._acked_rows.append(row_id)
+
+    def start(self):
+        """Connect di background; paho reconnect otomatis saat broker putus"""
+        print("🔄 Connecting to MQTT Broker...")
+        self.client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.flush_batch()
+        self.client.loop_stop()
+        self.client.disconnect()
+        self.queue.close()
+
+    def add_reading(self, reading):
+        """Masukkan satu reading; payload dibuat saat batch penuh"""
+        if self.batch_size == 1:
+            messages = [(MQTT_TOPIC_COMBINED, json.dumps(reading))]
+            if PUBLISH_SCALAR_TOPICS:
+                messages = [
+                    (MQTT_TOPIC_TEMP, str(reading['temperature'])),
+                    (MQTT_TOPIC_HUMIDITY, str(reading['humidity'])),
+                ] + messages
+            self.queue.push(messages)
+            return
+        self.batch.append(reading)
+        if len(self.batch) >= self.batch_size:
+            self.flush_batch()
+
+    def flush_batch(self):
+        """Kirim reading yang terkumpul sebagai satu payload JSON array"""
+        if self.batch:
+            self.queue.push([(MQTT_TOPIC_COMBINED, json.dumps(self.batch))])
+            self.batch = []
+
+    def flush(self):
+        """Publish message antri (rate limited), return jumlah yang dikirim"""
+        with self._ack_lock:
+            acked, self._acked_rows = self._acked_rows, []
+        if acked:
+            self.queue.ack(acked)
+
+        if not self.connected:
+            if self._last_sent_id:
+                # Message yang belum di-ack dikirim ulang setelah reconnect
+                # (duplikat di-drop dashboard berdasarkan seq)
+                with self._ack_lock:
+                    self._inflight.clear()
+                self._last_sent_id = 0
+            return 0
+
+        room = self.max_inflight - len(self._inflight) if self.qos > 0 else self.max_inflight
+        budget = self.limiter.take(room) if room > 0 else 0
+        if budget == 0:
+            return 0
+
+        sent = 0
+        for row_id, topic, payload in self.queue.peek(self._last_sent_id, budget):
+            with self._ack_lock:
+                info = self.client.publish(topic, payload, qos=self.qos)
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    break
+                if self.qos > 0:
+                    self._inflight[info.mid] = row_id
+                else:
+                    # QoS 0 tidak punya ack broker: selesai begitu diterima paho
+                    self._acked_rows.append(row_id)
+            self._last_sent_id = row_id
+            sent += 1
+        self.sent += sent
+        return sent
 
 # =====================================================
 # SENSOR SIMULATION
@@ -95,69 +283,61 @@ def main():
     print(f"Broker: {MQTT_BROKER}:{MQTT_PORT}")
     print(f"Client ID: {MQTT_CLIENT_ID}")
     print(f"Publish Interval: {PUBLISH_INTERVAL} seconds")
+    print(f"QoS: {PUBLISH_QOS} | Batch size: {PUBLISH_BATCH_SIZE} | Offline queue: {PUBLISH_QUEUE_PATH}")
     print("=" * 60)
     print()
     
-    # Setup MQTT Client
-    client = mqtt.Client(client_id=MQTT_CLIENT_ID)
-    client.on_connect = on_connect
-    client.on_publish = on_publish
+    publisher = BufferedPublisher()
+    if publisher.queue.size:
+        print(f"📦 {publisher.queue.size} messages left in offline queue from previous run")
+    publisher.start()
+    print("📊 Starting data transmission...\n")
+    
+    message_count = 0
+    next_reading = time.monotonic()
     
-    # Connect to broker
     try:
-        print("🔄 Connecting to MQTT Broker...")
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        client.loop_start()
-        time.sleep(2)  # Wait for connection
-        
-        print("✅ Connection established!")
-        print("📊 Starting data transmission...\n")
-        
-        message_count = 0
-        
         while True:
-            message_count += 1
-            
-            # Check for anomaly
-            anomaly_temp, anomaly_humidity = simulate_anomaly()
+            if time.monotonic() >= next_reading:
+                next_reading += PUBLISH_INTERVAL
+                message_count += 1
+                
+                # Check for anomaly
+                anomaly_temp, anomaly_humidity = simulate_anomaly()
+                
+                if anomaly_temp is not None:
+                    temperature = round(anomaly_temp, 2)
+                    humidity = round(anomaly_humidity, 2)
+                    print(f"⚠️  ANOMALY GENERATED!")
+                else:
+                    temperature, humidity = generate_sensor_data()
+                
+                publisher.add_reading({
+                    "temperature": temperature,
+                    "humidity": humidity,
+                    "timestamp": datetime.now().isoformat(),
+                    "sensor_id": MQTT_CLIENT_ID,
+                    "seq": message_count
+                })
+                
+                # Log output
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                status = "" if publisher.connected else f" | 📦 queued: {publisher.queue.size}"
+                print(f"[{message_count:04d}] {timestamp} | Temp: {temperature:5.2f}°C | Humidity: {humidity:5.2f}%{status}")
             
-            if anomaly_temp is not None:
-                temperature = anomaly_temp
-                humidity = anomaly_humidity
-                print(f"⚠️  ANOMALY GENERATED!")
-            else:
-                temperature, humidity = generate_sensor_data()
-            
-            # Publish to individual topics
-            client.publish(MQTT_TOPIC_TEMP, str(temperature))
-            client.publish(MQTT_TOPIC_HUMIDITY, str(humidity))
-            
-            # Publish to combined topic (JSON)
-            combined_data = {
-                "temperature": temperature,
-                "humidity": humidity,
-                "timestamp": datetime.now().isoformat(),
-                "sensor_id": MQTT_CLIENT_ID
-            }
-            client.publish(MQTT_TOPIC_COMBINED, json.dumps(combined_data))
-            
-            # Log output
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            print(f"[{message_count:04d}] {timestamp} | Temp: {temperature:5.2f}°C | Humidity: {humidity:5.2f}%")
-            
-            time.sleep(PUBLISH_INTERVAL)
+            publisher.flush()
+            time.sleep(FLUSH_TICK)
             
     except KeyboardInterrupt:
         print("\n\n🛑 Stopping sensor simulation...")
-        client.loop_stop()
-        client.disconnect()
-        print("✅ Disconnected from broker")
-        print(f"📊 Total messages sent: {message_count}")
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
-        client.loop_stop()
-        client.disconnect()
+    
+    publisher.stop()
+    print("✅ Disconnected from broker")
+    print(f"📊 Total readings: {message_count} | Published: {publisher.sent} | "
+          f"Still queued: {publisher.queue.size} | Dropped (queue full): {publisher.queue.dropped}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,160 @@
+"""
+Overload Control - Load Shedding
+================================
+Saat fleet reconnect setelah outage (backlog publisher dikirim sekaligus)
+atau satu device membanjiri topic-nya, ingest tertinggal dan dashboard
+makin jauh di belakang. Mode ini membuang reading "biasa" supaya latency
+tetap terbatas, tanpa kehilangan alert:
+
+- token bucket per device: paling banyak ``OVERLOAD_DEVICE_RATE`` reading/s
+  per device, dengan burst ``OVERLOAD_DEVICE_BURST``,
+- adaptive sampling: jika reading antri melewati ``OVERLOAD_HIGH_WATERMARK``
+  hanya porsi ``watermark / depth`` reading normal yang disimpan
+  (minimal ``OVERLOAD_MIN_KEEP``),
+- pass-through: reading anomaly (``anomaly_flag``, sama dengan
+  ``detect_anomaly``) atau yang kelas prediksinya berubah dari reading
+  sebelumnya di device yang sama tidak pernah dibuang.
+
+Reading yang disimpan dipilih merata di sepanjang batch (reading terbaru
+ikut), jadi chart tetap mencakup seluruh periode. Shedding bekerja pada
+kolom hasil ``build_columns``; counter ``stats()`` menunjukkan apa yang
+dibuang dan kenapa.
+"""
+
+import time
+
+import numpy as np
+
+from config import OVERLOAD_DEVICE_RATE, OVERLOAD_DEVICE_BURST, OVERLOAD_HIGH_WATERMARK, OVERLOAD_MIN_KEEP
+
+class DeviceBucket:
+    """Token bucket + kelas prediksi terakhir satu device"""
+    __slots__ = ('tokens', 'updated_ns', 'last_class', 'shed')
+
+    def __init__(self, tokens, now_ns):
+        self.tokens = tokens
+        self.updated_ns = now_ns
+        self.last_class = None
+        self.shed = 0
+
+class LoadShedder:
+    """Token bucket per device + sampling berbasis queue depth, anomaly selalu lolos"""
+
+    def __init__(self, rate=OVERLOAD_DEVICE_RATE, burst=OVERLOAD_DEVICE_BURST,
+                 high_watermark=OVERLOAD_HIGH_WATERMARK, min_keep=OVERLOAD_MIN_KEEP):
+        self.rate = rate
+        self.burst = burst
+        self.high_watermark = high_watermark
+        self.min_keep = min_keep
+        self.devices = {}
+
+        self.received = 0
+        self.kept = 0
+        self.rate_limited = 0       # Dibuang token bucket
+        self.sampled_out = 0        # Dibuang adaptive sampling
+        self.anomalies = 0          # Pass-through karena anomaly
+        self.class_changes = 0      # Pass-through karena kelas prediksi berubah
+        self.last = {'received': 0, 'kept': 0, 'depth': 0, 'keep_ratio': 1.0}
+
+    def keep_ratio(self, depth):
+        """Porsi reading normal yang disimpan pada queue depth ``depth``"""
+        if depth <= self.high_watermark:
+            return 1.0
+        return max(self.min_keep, self.high_watermark / depth)
+
+    def _bucket(self, device_id, now_ns):
+        bucket = self.devices.get(device_id)
+        if bucket is None:
+            bucket = self.devices[device_id] = DeviceBucket(float(self.burst), now_ns)
+        else:
+            elapsed = max(now_ns - bucket.updated_ns, 0) / 1e9
+            bucket.tokens = min(float(self.burst), bucket.tokens + elapsed * self.rate)
+            bucket.updated_ns = now_ns
+        return bucket
+
+    def shed(self, columns, depth=0, now_ns=None):
+        """Batch kolom hasil build_columns -> reading yang disimpan (None jika semua dibuang)
+
+        ``depth`` = reading yang antri di ingest saat batch ini diambil.
+        """
+        n = len(columns['timestamp'])
+        if n == 0:
+            return columns
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        ratio = self.keep_ratio(depth)
+
+        # Urutkan per device (stable: urutan waktu dalam device tetap)
+        uniq, inverse = np.unique(np.asarray(columns['device_id'], dtype=object).astype(str), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind='stable')
+        grouped = inverse[order]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        ends = np.r_[starts[1:], n]
+
+        labels = np.asarray(columns['prediction'], dtype=object)[order]
+        anomaly = np.asarray(columns['anomaly_flag'], dtype=bool)[order]
+        previous = np.empty_like(labels)
+        previous[1:] = labels[:-1]
+        buckets = [self._bucket(device, now_ns) for device in uniq.tolist()]
+        # Reading pertama setiap device dibandingkan dengan kelas terakhir batch sebelumnya
+        previous[starts] = [labels[s] if b.last_class is None else b.last_class for b, s in zip(buckets, starts)]
+        changed = (labels != previous) & ~anomaly
+        priority = anomaly | changed
+
+        # Per device: reading normal yang boleh lewat token bucket, lalu sampling
+        normal = ~priority
+        n_normal = np.bincount(grouped, weights=normal, minlength=len(uniq)).astype(np.int64)
+        tokens = np.array([bucket.tokens for bucket in buckets])
+        allowed = np.minimum(n_normal, tokens.astype(np.int64))
+        sampled = allowed if ratio >= 1.0 else np.ceil(allowed * ratio).astype(np.int64)
+
+        # Ambil ``sampled`` dari ``n_normal`` reading normal secara merata (reading terbaru ikut):
+        # rank r disimpan jika floor((r+1)k/m) > floor(rk/m), tepat k reading per device
+        cumulative = np.cumsum(normal)
+        rank = cumulative - 1 - (cumulative[starts] - normal[starts])[grouped]
+        k, m = sampled[grouped], np.maximum(n_normal[grouped], 1)
+        keep = priority | (normal & ((rank + 1) * k // m > rank * k // m))
+
+        spent = sampled + (ends - starts) - n_normal
+        for bucket, used, dropped, last_class in zip(buckets, spent.tolist(), (n_normal - sampled).tolist(),
+                                                      labels[ends - 1].tolist()):
+            bucket.tokens = max(0.0, bucket.tokens - used)
+            bucket.shed += dropped
+            bucket.last_class = last_class
+        self.rate_limited += int((n_normal - allowed).sum())
+        self.sampled_out += int((allowed - sampled).sum())
+
+        kept = int(keep.sum())
+        self.received += n
+        self.kept += kept
+        self.anomalies += int(anomaly.sum())
+        self.class_changes += int(changed.sum())
+        self.last = {'received': n, 'kept': kept, 'depth': depth, 'keep_ratio': ratio}
+
+        if kept == n:
+            return columns
+        if kept == 0:
+            return None
+        mask = np.zeros(n, dtype=bool)
+        mask[order[keep]] = True
+        return {name: values[mask] for name, values in columns.items()}
+
+    def top_shed_devices(self, limit=5):
+        """Device dengan reading terbanyak yang dibuang: list (device, jumlah)"""
+        shed = [(device, bucket.shed) for device, bucket in self.devices.items() if bucket.shed]
+        return sorted(shed, key=lambda item: -item[1])[:limit]
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'kept': self.kept,
+            'shed': self.rate_limited + self.sampled_out,
+            'rate_limited': self.rate_limited,
+            'sampled_out': self.sampled_out,
+            'anomalies': self.anomalies,
+            'class_changes': self.class_changes,
+            'last_received': self.last['received'],
+            'last_shed': self.last['received'] - self.last['kept'],
+            'last_depth': self.last['depth'],
+            'keep_ratio': self.last['keep_ratio'],
+        }
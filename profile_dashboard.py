@@ -0,0 +1,275 @@
+"""
+Dashboard Render Profiler
+=========================
+Jalankan app.py secara headless (Streamlit AppTest) dengan buffer sintetis
+berukuran tertentu lalu ukur waktu setiap section di ``main()``: header,
+sidebar, export, cards, gauges, timeseries, describe, tabel, dll.
+
+Section dibatasi oleh checkpoint ``mark_section()`` di app.py; checkpoint
+hanya aktif jika profiler memasang ``section_timer`` di session state.
+
+Output:
+- tabel median / p95 per section untuk setiap ukuran buffer,
+- ``--flame``: stack sampling dari script thread dalam format collapsed
+  (``section;frame;frame count``) untuk flamegraph.pl / speedscope,
+- ``--save``: hasil dalam JSON, bisa dipakai sebagai ``--baseline``
+  berikutnya; exit code 1 jika ada section yang regresi melewati threshold.
+
+Jalankan:
+    python profile_dashboard.py --sizes 1000 43200 --runs 5
+    python profile_dashboard.py --save perf_baseline.json
+    python profile_dashboard.py --baseline perf_baseline.json --threshold 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+SCRIPT_THREAD = "ScriptRunner.scriptThread"
+
+# =====================================================
+# SECTION TIMER
+# =====================================================
+class SectionTimer:
+    """Dipasang di session state; app.py memanggil ``lap(name)`` di batas section"""
+
+    def __init__(self):
+        self.current = None
+        self.runs = []
+        self._run = {}
+        self._start = None
+
+    def begin(self):
+        """Mulai run baru (buang section yang terpotong oleh st.rerun)"""
+        self.current, self._run, self._start = None, {}, None
+
+    def lap(self, name):
+        now = time.perf_counter()
+        if self.current is not None:
+            self._run[self.current] = self._run.get(self.current, 0.0) + (now - self._start) * 1000
+        self.current, self._start = name, now
+        if name is None:
+            self.runs.append(self._run)
+            self._run = {}
+
+# =====================================================
+# FLAME GRAPH SAMPLER
+# =====================================================
+class StackSampler:
+    """Sampling stack script thread, dikelompokkan per section aktif"""
+
+    def __init__(self, timer, interval):
+        self.timer = timer
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            section = self.timer.current
+            if section is None:
+                continue
+            script = next((t.ident for t in threading.enumerate() if t.name == SCRIPT_THREAD), None)
+            frame = sys._current_frames().get(script)
+            if frame is None:
+                continue
+            self.stacks[";".join([section] + frame_labels(frame))] += 1
+
+def frame_labels(frame):
+    """Frame dari app.py ke bawah, urut root -> leaf"""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        if code.co_filename == APP_PATH and code.co_name == "main":
+            break
+        frame = frame.f_back
+    return labels[::-1]
+
+# =====================================================
+# SYNTHETIC DATA
+# =====================================================
+def synthetic_buffer(size, interval_s=2.0, seed=0):
+    """SensorBuffer berisi ``size`` reading sintetis yang berakhir sekarang"""
+    from classifier import build_columns
+    from sensor_buffer import SensorBuffer
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(size)
+    now = time.time_ns()
+    received = now - ((size - t) * interval_s * 1e9).astype(np.int64)
+    readings = {
+        'device_id': np.array([f"esp32_{i % 4:02d}" for i in range(size)], dtype=object),
+        'seq': t.astype(np.int64),
+        'temperature': 26 + 6 * np.sin(t / 300) + rng.normal(0, 1.5, size),
+        'humidity': 60 + 15 * np.cos(t / 500) + rng.normal(0, 3, size),
+        'received_ns': received,
+        'device_ns': received - 40_000_000,
+    }
+    buffer = SensorBuffer(size)
+    buffer.extend(build_columns(readings))
+    return buffer
+
+# =====================================================
+# PROFILING
+# =====================================================
+def profile_size(size, runs, warmup, window, sample_interval):
+    """Render app.py ``warmup + runs`` kali; return (list timing per run, sampler)"""
+    from streamlit.testing.v1 import AppTest
+    from ingest import MQTTClient
+
+    timer = SectionTimer()
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    at.session_state['section_timer'] = timer
+    at.session_state['data_buffer'] = synthetic_buffer(size)
+    at.session_state['warm_until'] = None
+    at.session_state['mqtt_client'] = MQTTClient()  # Offline, tanpa koneksi broker
+
+    timer.begin()
+    at.run()
+    window_box = next(box for box in at.selectbox if box.label == "Window")
+    window_box.set_value(window)
+
+    sampler = StackSampler(timer, sample_interval) if sample_interval else None
+    for i in range(warmup + runs):
+        if i == warmup and sampler is not None:
+            sampler.start()
+        timer.begin()
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"App raised: {[e.message for e in at.exception]}")
+    if sampler is not None:
+        sampler.stop()
+
+    # Run pertama (window default) + warmup tidak dihitung
+    return timer.runs[-runs:], sampler
+
+def summarize(timings):
+    """List timing per run -> {section: {'median', 'p95'}} urut seperti di app"""
+    sections = {}
+    for run in timings:
+        for name in run:
+            sections.setdefault(name, [])
+    for name in sections:
+        values = [run.get(name, 0.0) for run in timings]
+        sections[name] = {'median': statistics.median(values),
+                          'p95': float(np.percentile(values, 95))}
+    total = [sum(run.values()) for run in timings]
+    sections['total'] = {'median': statistics.median(total), 'p95': float(np.percentile(total, 95))}
+    return sections
+
+def print_table(size, summary, baseline=None):
+    print(f"\n📏 Buffer size: {size} readings")
+    print(f"   {'section':<18}{'median':>10}{'p95':>10}{'baseline':>11}")
+    for name, stats in summary.items():
+        base = baseline.get(name, {}).get('median') if baseline else None
+        base_text = f"{base:9.1f}ms" if base is not None else f"{'-':>11}"
+        print(f"   {name:<18}{stats['median']:8.1f}ms{stats['p95']:8.1f}ms{base_text}")
+
+def find_regressions(results, baseline, threshold, min_delta_ms):
+    """Section yang median-nya > baseline * threshold (dan lebih lambat >= min_delta_ms)"""
+    regressions = []
+    for size, summary in results.items():
+        for name, stats in summary.items():
+            base = baseline.get(size, {}).get(name, {}).get('median')
+            if base is None:
+                continue
+            if stats['median'] > base * threshold and stats['median'] - base >= min_delta_ms:
+                regressions.append((size, name, base, stats['median']))
+    return regressions
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="Per-section render profiler for app.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 43200],
+                        help="Ukuran buffer sintetis yang diprofile")
+    parser.add_argument("--runs", type=int, default=5, help="Render yang diukur per ukuran")
+    parser.add_argument("--warmup", type=int, default=1, help="Render awal yang tidak dihitung")
+    parser.add_argument("--window", default="Last 24 hours", help="Pilihan 'Window' di sidebar")
+    parser.add_argument("--flame", metavar="PATH",
+                        help="Tulis stack collapsed (flamegraph.pl / speedscope) ke PATH")
+    parser.add_argument("--sample-ms", type=float, default=2.0, help="Interval stack sampling")
+    parser.add_argument("--save", metavar="PATH", help="Simpan hasil sebagai JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON hasil --save sebelumnya")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Gagal jika median section > baseline x threshold")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="Abaikan regresi yang lebih kecil dari ini (noise)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, APP_DIR)
+    import streamlit
+    streamlit.rerun = lambda: None   # Matikan loop auto refresh
+    # Hanya lewati sleep auto refresh, polling AppTest tetap berjalan normal
+    _sleep = time.sleep
+    time.sleep = lambda seconds: None if seconds >= 1 else _sleep(seconds)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)['results']
+
+    print("=" * 60)
+    print("🔬 Dashboard Render Profiler")
+    print("=" * 60)
+    print(f"Window: {args.window} | runs: {args.runs} (+{args.warmup} warmup)")
+
+    results, flame_stacks = {}, Counter()
+    # Jalankan di direktori kosong supaya write-ahead log produksi tidak tersentuh
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            for size in args.sizes:
+                timings, sampler = profile_size(size, args.runs, args.warmup, args.window,
+                                                args.sample_ms / 1000 if args.flame else 0)
+                results[str(size)] = summarize(timings)
+                print_table(size, results[str(size)], baseline.get(str(size)) if baseline else None)
+                if sampler is not None:
+                    flame_stacks.update({f"{size};{stack}": n for stack, n in sampler.stacks.items()})
+        finally:
+            os.chdir(cwd)
+
+    if args.flame:
+        with open(args.flame, "w", encoding="utf-8") as f:
+            for stack, count in flame_stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"\n🔥 Flame graph stacks: {args.flame} ({sum(flame_stacks.values())} samples)")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'window': args.window,
+                       'runs': args.runs, 'results': results}, f, indent=2)
+        print(f"💾 Results saved: {args.save}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} section(s) regressed past {args.threshold}x baseline:")
+            for size, name, base, now in regressions:
+                print(f"   size {size} · {name}: {base:.1f} ms -> {now:.1f} ms")
+            sys.exit(1)
+        print(f"\n✅ No section regressed past {args.threshold}x baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,700 @@
+"""
+Sensor Buffer - Columnar Time-Indexed Storage
+==============================================
+Buffer in-memory untuk data sensor dashboard. Setiap field disimpan sebagai
+kolom NumPy terpisah dengan timestamp yang selalu terurut, sehingga:
+
+- query rentang waktu cukup dengan binary search (np.searchsorted) dan
+  hasilnya berupa slice yang contiguous (tanpa boolean scan),
+- baris anomaly dilayani dari index posisi yang dibangun saat append,
+- biaya zoom ke 1 menit sebanding dengan jumlah data 1 menit tersebut,
+  bukan seluruh history.
+
+Timestamp disimpan sebagai int64 epoch nanoseconds (UTC). Konversi ke
+wall-clock lokal dan format string hanya dilakukan saat ditampilkan.
+
+Kolom disimpan dengan dtype compact (``STORAGE``): device id, prediction dan
+anomaly reason sebagai kode integer, confidence sebagai float32. Query tetap
+mengembalikan schema ``COLUMNS``.
+
+Dengan ``RetentionPolicy`` buffer dibatasi byte dan waktu: data raw hanya
+untuk ``raw_window`` terakhir, device idle di-evict, dan data yang lebih tua
+diringkas menjadi agregat per device per ``rollup_interval`` (``RollupStore``).
+Budget byte dibagi rata ke semua buffer ber-policy yang hidup di proses.
+
+pandas di-import lazy (hanya saat membuat DataFrame / format string) agar
+session baru bisa render tanpa menunggu import pandas.
+"""
+
+import bisect
+import sys
+import time
+import weakref
+import zlib
+import numpy as np
+
+from classifier import CATEGORIES, ANOMALY_REASONS, encode_labels, decode_labels
+from config import (
+    RETENTION_MAX_BYTES, RETENTION_RAW_WINDOW, RETENTION_IDLE_TIMEOUT,
+    RETENTION_ROLLUP_INTERVAL, RETENTION_ROLLUP_SHARE
+)
+
+# =====================================================
+# SCHEMA
+# =====================================================
+NAT_NS = np.iinfo(np.int64).min  # Sama dengan NaT pada datetime64[ns]
+
+COLUMNS = {
+    'timestamp': 'int64',     # Waktu diterima dashboard (epoch ns)
+    'device_ts': 'int64',     # Waktu dari device (epoch ns, NAT_NS jika tidak ada)
+    'device_id': 'object',
+    'seq': 'int64',
+    'temperature': 'float64',
+    'humidity': 'float64',
+    'prediction': 'object',
+    'confidence': 'float64',
+    'anomaly_flag': 'bool',
+    'anomaly_reason': 'object',
+    'alert_triggered': 'bool',
+}
+
+# Dtype penyimpanan internal (lihat _encode / _decode)
+STORAGE = dict(COLUMNS, **{
+    'device_id': 'int32',     # Kode di tabel device milik buffer
+    'prediction': 'int8',     # Index di CATEGORIES
+    'confidence': 'float32',  # Sudah dibulatkan 1 desimal, dibulatkan ulang saat dibaca
+    'anomaly_reason': 'int8', # Index di ANOMALY_REASONS
+})
+ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in STORAGE.values())
+
+# Nilai terakhir per device yang disimpan di luar window raw (fleet overview)
+LATEST_FIELDS = ('temperature', 'humidity', 'prediction', 'confidence', 'anomaly_flag', 'anomaly_reason')
+
+INITIAL_CAPACITY = 8192       # Array backing tumbuh 2x sampai 2 * maxlen
+
+# =====================================================
+# FIXED-WIDTH DEVICE ID (shared-memory ring, write-ahead log)
+# =====================================================
+def shorten_device_id(device_id, width):
+    """Id yang lebih dari ``width`` byte UTF-8 -> prefix + ``~crc32``
+
+    Prefix dipotong di batas karakter (tetap UTF-8 valid) dan hash dari id
+    lengkap menjaga id yang hanya berbeda di akhir tetap berbeda.
+    """
+    raw = device_id.encode('utf-8')
+    if len(raw) <= width:
+        return raw
+    tag = b'~%08x' % zlib.crc32(raw)
+    prefix = raw[:width - len(tag)].decode('utf-8', 'ignore').encode('utf-8')
+    return prefix + tag
+
+def encode_device_ids(device_ids, width):
+    """Array id device -> bytes fixed-width ``S<width>`` (satu encode per id unik)"""
+    uniq, inverse = np.unique(np.asarray(device_ids, dtype=str), return_inverse=True)
+    encoded = np.array([shorten_device_id(d, width) for d in uniq.tolist()], dtype=f'S{width}')
+    return encoded[inverse.reshape(-1)]
+
+def decode_fixed_strings(values):
+    """Bytes fixed-width -> array object str (byte rusak diganti, tidak raise)"""
+    return np.char.decode(values, 'utf-8', 'replace').astype(object)
+
+# =====================================================
+# RETENTION POLICY
+# =====================================================
+_BUDGETED_BUFFERS = weakref.WeakSet()  # Buffer ber-policy yang masih hidup (berbagi budget)
+
+class RetentionPolicy:
+    """Batas memori + waktu untuk SensorBuffer (default dari config.py)"""
+
+    def __init__(self, max_bytes=RETENTION_MAX_BYTES, raw_window=RETENTION_RAW_WINDOW,
+                 idle_timeout=RETENTION_IDLE_TIMEOUT, rollup_interval=RETENTION_ROLLUP_INTERVAL,
+                 rollup_share=RETENTION_ROLLUP_SHARE):
+        self.max_bytes = max_bytes
+        self.raw_window_ns = int(raw_window * 1e9)
+        self.idle_timeout_ns = int(idle_timeout * 1e9)
+        self.rollup_interval_ns = int(rollup_interval * 1e9)
+        self.rollup_share = rollup_share
+
+    def share_bytes(self):
+        """Budget untuk satu buffer: max_bytes dibagi rata ke buffer yang hidup"""
+        return self.max_bytes // max(1, len(_BUDGETED_BUFFERS))
+
+def total_memory_usage():
+    """Total byte semua buffer ber-policy di proses ini (semua session)"""
+    return sum(buffer.memory_usage()['bytes'] for buffer in list(_BUDGETED_BUFFERS))
+
+# =====================================================
+# ROLLUP STORE (agregat data lama)
+# =====================================================
+class RollupStore:
+    """Agregat per (bucket waktu, device): count, sum, min/max.
+
+    Disimpan sebagai partial aggregate sehingga bucket yang diisi dalam
+    beberapa tahap (mis. dipotong budget di tengah bucket) cukup digabung
+    dengan penjumlahan. Terurut berdasarkan bucket.
+    """
+    FIELDS = {
+        'bucket': 'int64',        # Awal bucket (epoch ns)
+        'device': 'int32',
+        'count': 'int64',
+        'temperature_sum': 'float64',
+        'temperature_min': 'float64',
+        'temperature_max': 'float64',
+        'humidity_sum': 'float64',
+        'confidence_sum': 'float64',
+        'anomalies': 'int64',
+    }
+    ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in FIELDS.values())
+    SUMS = ('count', 'temperature_sum', 'humidity_sum', 'confidence_sum', 'anomalies')
+
+    def __init__(self, interval_ns):
+        self.interval_ns = interval_ns
+        self.max_rows = None
+        self._cols = {name: np.empty(0, dtype=dtype) for name, dtype in self.FIELDS.items()}
+
+    def __len__(self):
+        return len(self._cols['bucket'])
+
+    @property
+    def nbytes(self):
+        return sum(col.nbytes for col in self._cols.values())
+
+    def clear(self):
+        self._cols = {name: np.empty(0, dtype=dtype) for name, dtype in self.FIELDS.items()}
+
+    def add(self, timestamps, devices, temperature, humidity, confidence, anomaly_flag):
+        """Ringkas reading raw lalu gabungkan dengan bucket yang sudah ada"""
+        if len(timestamps) == 0:
+            return
+        parts = {
+            'bucket': timestamps // self.interval_ns * self.interval_ns,
+            'device': devices,
+            'count': np.ones(len(timestamps), dtype=np.int64),
+            'temperature_sum': temperature,
+            'temperature_min': temperature,
+            'temperature_max': temperature,
+            'humidity_sum': humidity,
+            'confidence_sum': confidence,
+            'anomalies': anomaly_flag,
+        }
+        # Hanya ekor store yang bisa punya key sama dengan reading baru
+        cut = int(np.searchsorted(self._cols['bucket'], parts['bucket'].min(), side='left'))
+        merged = {name: np.concatenate([self._cols[name][cut:], np.asarray(parts[name], dtype=dtype)])
+                  for name, dtype in self.FIELDS.items()}
+        keys = (merged['bucket'] // self.interval_ns << 21) | merged['device']
+        grouped = self._group(merged, keys)
+        self._cols = {name: np.concatenate([self._cols[name][:cut], grouped[name]]) for name in self.FIELDS}
+
+        if self.max_rows is not None and len(self) > self.max_rows:
+            self._cols = {name: col[-self.max_rows:] for name, col in self._cols.items()}
+
+    def _group(self, cols, keys):
+        """Gabungkan baris dengan key sama (hasil terurut berdasarkan key)"""
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        grouped = {}
+        for name, col in cols.items():
+            col = col[order]
+            if name in self.SUMS:
+                grouped[name] = np.add.reduceat(col, starts)
+            elif name == 'temperature_min':
+                grouped[name] = np.minimum.reduceat(col, starts)
+            elif name == 'temperature_max':
+                grouped[name] = np.maximum.reduceat(col, starts)
+            else:
+                grouped[name] = col[starts]
+        return grouped
+
+    def drop_devices(self, codes):
+        keep = ~np.isin(self._cols['device'], codes)
+        self._cols = {name: col[keep] for name, col in self._cols.items()}
+
+    def bounds(self):
+        """(bucket pertama, bucket terakhir) atau None"""
+        if len(self) == 0:
+            return None
+        return int(self._cols['bucket'][0]), int(self._cols['bucket'][-1])
+
+    def query(self, start=None, end=None, by_device=False):
+        """Bucket yang overlap [start, end) -> kolom mean/min/max per bucket"""
+        bucket = self._cols['bucket']
+        lo = 0 if start is None else int(np.searchsorted(bucket, start - self.interval_ns, side='right'))
+        hi = len(bucket) if end is None else int(np.searchsorted(bucket, end, side='left'))
+        cols = {name: col[lo:hi] for name, col in self._cols.items()}
+        if not by_device and hi > lo:
+            # Gabungkan semua device per bucket
+            cols = self._group(cols, cols['bucket'] // self.interval_ns)
+
+        count = np.maximum(cols['count'], 1)
+        result = {
+            'timestamp': cols['bucket'] + self.interval_ns // 2,  # Titik tengah bucket untuk chart
+            'count': cols['count'],
+            'temperature': cols['temperature_sum'] / count,
+            'temperature_min': cols['temperature_min'],
+            'temperature_max': cols['temperature_max'],
+            'humidity': cols['humidity_sum'] / count,
+            'confidence': cols['confidence_sum'] / count,
+            'anomalies': cols['anomalies'],
+        }
+        if by_device:
+            result['device'] = cols['device']
+        return result
+
+# =====================================================
+# SENSOR BUFFER CLASS
+# =====================================================
+class SensorBuffer:
+    """Ring buffer columnar dengan index timestamp terurut.
+
+    Data hidup selalu berada di slice contiguous ``[_start, _end)`` dari
+    array backing (tumbuh 2x sampai ``2 * maxlen``). Saat array penuh,
+    window hidup disalin ke depan sekali (amortized O(1) per append).
+
+    Dengan ``policy`` (RetentionPolicy), ``maxlen`` hanya batas atas
+    (None = hanya dibatasi budget): jumlah baris raw juga dibatasi porsi
+    budget byte buffer ini, dan baris yang keluar dari window diringkas
+    ke ``rollups``.
+    """
+
+    def __init__(self, maxlen=None, policy=None):
+        if maxlen is None:
+            if policy is None:
+                raise ValueError("SensorBuffer needs maxlen or a RetentionPolicy")
+            maxlen = sys.maxsize
+        self.requested_maxlen = maxlen
+        self.maxlen = maxlen
+        self.policy = policy
+        self._capacity = min(2 * maxlen, INITIAL_CAPACITY)
+        self._cols = {name: np.empty(self._capacity, dtype=dtype) for name, dtype in STORAGE.items()}
+        self._start = 0
+        self._end = 0
+        self._offset = 0        # posisi absolut dari index backing 0
+        self._anomalies = []    # posisi absolut baris anomaly (terurut)
+        self._anomaly_head = 0
+
+        # Tabel device: id string <-> kode int32
+        self._device_codes = {}
+        self._device_table = np.empty(0, dtype=object)
+        self._last_seen = np.empty(0, dtype=np.int64)   # Timestamp terakhir per kode device
+        self._active = np.empty(0, dtype=bool)          # False = sudah di-evict (idle)
+        self._latest = {name: np.empty(0, dtype=STORAGE[name]) for name in LATEST_FIELDS}
+        self._idle_checked = NAT_NS
+
+        self.rollups = None
+        self.evicted_devices = 0
+        if policy is not None:
+            self.rollups = RollupStore(policy.rollup_interval_ns)
+            _BUDGETED_BUFFERS.add(self)
+            self._fit_budget()
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        """Kosongkan buffer"""
+        self._start = 0
+        self._end = 0
+        self._offset = 0
+        self._anomalies = []
+        self._anomaly_head = 0
+        self._last_seen[:] = NAT_NS
+        self._idle_checked = NAT_NS
+        if self.rollups is not None:
+            self.rollups.clear()
+
+    # -------------------------------------------------
+    # ENCODING (schema COLUMNS <-> STORAGE)
+    # -------------------------------------------------
+    def _device_code_array(self, device_ids):
+        """Array device id -> kode int32, device baru ditambahkan ke tabel"""
+        uniq, inverse = np.unique(np.asarray(device_ids, dtype=object).astype(str), return_inverse=True)
+        codes = np.empty(len(uniq), dtype=np.int32)
+        for i, device in enumerate(uniq.tolist()):
+            code = self._device_codes.get(device)
+            if code is None:
+                code = self._device_codes[device] = len(self._device_codes)
+            codes[i] = code
+        if len(self._device_codes) > len(self._device_table):
+            n = len(self._device_codes)
+            self._device_table = np.array(list(self._device_codes), dtype=object)
+            self._last_seen = np.concatenate([self._last_seen, np.full(n - len(self._last_seen), NAT_NS)])
+            self._active = np.concatenate([self._active, np.ones(n - len(self._active), dtype=bool)])
+            for name, values in self._latest.items():
+                self._latest[name] = np.concatenate([values, np.zeros(n - len(values), dtype=values.dtype)])
+        return codes[inverse.reshape(-1)]
+
+    def _encode(self, columns):
+        encoded = {name: columns[name] for name in STORAGE}
+        encoded['device_id'] = self._device_code_array(columns['device_id'])
+        encoded['prediction'] = encode_labels(columns['prediction'], CATEGORIES)
+        encoded['anomaly_reason'] = encode_labels(columns['anomaly_reason'], ANOMALY_REASONS)
+        return encoded
+
+    def _decode(self, name, values):
+        if name == 'device_id':
+            return self._device_table[values]
+        if name == 'prediction':
+            return decode_labels(values, CATEGORIES)
+        if name == 'anomaly_reason':
+            return decode_labels(values, ANOMALY_REASONS)
+        if name == 'confidence':
+            return values.astype(np.float64).round(1)
+        return values
+
+    # -------------------------------------------------
+    # WRITE
+    # -------------------------------------------------
+    def append(self, record):
+        """Tambah satu reading (dict dengan key sesuai COLUMNS)"""
+        self.extend({name: np.array([record[name]], dtype=dtype) for name, dtype in COLUMNS.items()})
+
+    def extend(self, columns):
+        """Tambah banyak reading sekaligus (dict kolom -> array) dalam satu langkah vectorized"""
+        n = len(columns['timestamp'])
+        if n == 0:
+            return
+        columns = self._encode(columns)
+
+        # Jaga index tetap terurut walau jam sistem mundur (termasuk terhadap reading sebelumnya)
+        ts = np.asarray(columns['timestamp'], dtype=np.int64)
+        if len(self) > 0:
+            ts = np.maximum(ts, self._cols['timestamp'][self._end - 1])
+        ts = np.maximum.accumulate(ts)
+        columns['timestamp'] = ts
+
+        np.maximum.at(self._last_seen, columns['device_id'], ts)
+        self._active[columns['device_id']] = True
+        # Timestamp sudah monoton: kemunculan terakhir device di batch = reading terbarunya
+        codes, last = np.unique(columns['device_id'][::-1], return_index=True)
+        last = n - 1 - last
+        for name, values in self._latest.items():
+            values[codes] = np.asarray(columns[name])[last]
+
+        if n > self.maxlen:
+            self._roll_up({name: values[:-self.maxlen] for name, values in columns.items()})
+            columns = {name: values[-self.maxlen:] for name, values in columns.items()}
+            n = self.maxlen
+        if self._end + n > self._capacity:
+            self._compact(len(self) + n)
+
+        i = self._end
+        for name, col in self._cols.items():
+            col[i:i + n] = columns[name]
+
+        self._end += n
+        flags = np.flatnonzero(self._cols['anomaly_flag'][i:i + n])
+        if len(flags) > 0:
+            self._anomalies.extend((flags + self._offset + i).tolist())
+
+        if len(self) > self.maxlen:
+            self._drop_oldest(len(self) - self.maxlen)
+        if self.policy is not None:
+            self._apply_retention()
+
+    def _compact(self, needed=0):
+        """Pindahkan window hidup ke awal array backing (tumbuh 2x jika perlu)"""
+        n = self._end - self._start
+        if needed > self._capacity // 2 and self._capacity < 2 * self.maxlen:
+            self._reallocate(min(2 * self.maxlen, max(2 * self._capacity, needed)))
+            return
+        for col in self._cols.values():
+            col[:n] = col[self._start:self._end]
+        self._offset += self._start
+        self._start = 0
+        self._end = n
+
+    def _reallocate(self, capacity):
+        """Array backing baru berukuran ``capacity``, window hidup disalin ke depan"""
+        n = self._end - self._start
+        cols = {}
+        for name, col in self._cols.items():
+            cols[name] = np.empty(capacity, dtype=col.dtype)
+            cols[name][:n] = col[self._start:self._end]
+        self._cols = cols
+        self._capacity = capacity
+        self._offset += self._start
+        self._start = 0
+        self._end = n
+
+    def _trim_anomalies(self):
+        """Buang posisi anomaly yang sudah keluar dari window"""
+        first = self._offset + self._start
+        while self._anomaly_head < len(self._anomalies) and self._anomalies[self._anomaly_head] < first:
+            self._anomaly_head += 1
+        if self._anomaly_head > 1024 and self._anomaly_head * 2 > len(self._anomalies):
+            del self._anomalies[:self._anomaly_head]
+            self._anomaly_head = 0
+
+    def _rebuild_anomalies(self):
+        flags = np.flatnonzero(self._cols['anomaly_flag'][self._start:self._end])
+        self._anomalies = (flags + self._offset + self._start).tolist()
+        self._anomaly_head = 0
+
+    # -------------------------------------------------
+    # RETENTION
+    # -------------------------------------------------
+    def _roll_up(self, columns):
+        """Ringkas kolom (format STORAGE) ke rollup store (jika ada policy)"""
+        if self.rollups is None or len(columns['timestamp']) == 0:
+            return
+        self.rollups.add(columns['timestamp'], columns['device_id'], columns['temperature'],
+                         columns['humidity'], columns['confidence'], columns['anomaly_flag'])
+
+    def _drop_oldest(self, n):
+        """Keluarkan ``n`` baris tertua dari window raw (diringkas dulu jika ada policy)"""
+        s = self._start
+        self._roll_up({name: col[s:s + n] for name, col in self._cols.items()})
+        self._start += n
+        self._trim_anomalies()
+
+    def _fit_budget(self):
+        """Sesuaikan maxlen / kapasitas rollup dengan porsi budget buffer ini"""
+        share = self.policy.share_bytes()
+        raw_rows = int(share * (1 - self.policy.rollup_share)) // (2 * ROW_BYTES)
+        maxlen = max(1, min(self.requested_maxlen, raw_rows))
+        self.rollups.max_rows = max(1, int(share * self.policy.rollup_share) // RollupStore.ROW_BYTES)
+        if maxlen == self.maxlen:
+            return
+        self.maxlen = maxlen
+        if len(self) > maxlen:
+            self._drop_oldest(len(self) - maxlen)
+        if self._capacity > 2 * maxlen:
+            self._reallocate(2 * maxlen)  # Lepas memori saat porsi budget mengecil
+
+    def _apply_retention(self):
+        self._fit_budget()
+        if len(self) == 0:
+            return
+        policy = self.policy
+        newest = int(self._cols['timestamp'][self._end - 1])
+
+        # Data di luar raw window -> agregat (cutoff di batas bucket agar bucket utuh)
+        interval = policy.rollup_interval_ns
+        cutoff = (newest - policy.raw_window_ns) // interval * interval
+        n_old = int(np.searchsorted(self.timestamps(), cutoff, side='left'))
+        if n_old > 0:
+            self._drop_oldest(n_old)
+
+        # Cek device idle maksimal sekali per bucket
+        if newest - self._idle_checked >= interval:
+            self._idle_checked = newest
+            self._evict_idle(newest - policy.idle_timeout_ns)
+
+    def _evict_idle(self, threshold):
+        """Pindahkan data raw device yang tidak mengirim sejak ``threshold`` ke agregat"""
+        idle = np.flatnonzero(self._active & (self._last_seen < threshold))
+        if len(idle) == 0:
+            return
+        self._active[idle] = False
+        self.evicted_devices += len(idle)
+
+        s, e = self._start, self._end
+        mask = np.isin(self._cols['device_id'][s:e], idle)
+        if not mask.any():
+            return
+        self._roll_up({name: col[s:e][mask] for name, col in self._cols.items()})
+        keep = ~mask
+        n = int(keep.sum())
+        for col in self._cols.values():
+            col[s:s + n] = col[s:e][keep]
+        self._end = s + n
+        self._rebuild_anomalies()
+
+    def memory_usage(self):
+        """Byte yang dialokasikan buffer ini (raw + agregat + tabel device)"""
+        raw = sum(col.nbytes for col in self._cols.values())
+        rollup = self.rollups.nbytes if self.rollups is not None else 0
+        devices = (self._last_seen.nbytes + self._active.nbytes + 8 * len(self._device_table)
+                   + sum(values.nbytes for values in self._latest.values()))
+        return {
+            'bytes': raw + rollup + devices,
+            'raw_bytes': raw,
+            'rollup_bytes': rollup,
+            'rows': len(self),
+            'rollup_rows': len(self.rollups) if self.rollups is not None else 0,
+            'devices': int(self._active.sum()),
+            'evicted_devices': self.evicted_devices,
+            'budget_bytes': self.policy.share_bytes() if self.policy is not None else None,
+        }
+
+    # -------------------------------------------------
+    # QUERIES
+    # -------------------------------------------------
+    def timestamps(self):
+        """View kolom timestamp dari window hidup"""
+        return self._cols['timestamp'][self._start:self._end]
+
+    def time_bounds(self):
+        """Return (first, last) timestamp, atau None jika kosong"""
+        if len(self) == 0:
+            return None
+        ts = self.timestamps()
+        return ts[0], ts[-1]
+
+    def locate(self, start=None, end=None):
+        """Binary search rentang waktu [start, end] (epoch ns) -> (lo, hi) posisi relatif"""
+        ts = self.timestamps()
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side='right'))
+        return lo, max(lo, hi)
+
+    def tail_bounds(self, n):
+        """Posisi (lo, hi) untuk n reading terakhir"""
+        return max(0, len(self) - n), len(self)
+
+    def latest(self):
+        """Reading terakhir sebagai dict"""
+        if len(self) == 0:
+            return None
+        i = self._end - 1
+        return {name: self._decode(name, col[i:i + 1])[0] for name, col in self._cols.items()}
+
+    def _anomaly_span(self, lo, hi):
+        """Rentang index di _anomalies untuk posisi relatif [lo, hi)"""
+        base = self._offset + self._start
+        left = bisect.bisect_left(self._anomalies, base + lo, self._anomaly_head)
+        right = bisect.bisect_left(self._anomalies, base + hi, left)
+        return left, right
+
+    def anomaly_positions(self, lo=0, hi=None):
+        """Posisi relatif baris anomaly di dalam [lo, hi)"""
+        hi = len(self) if hi is None else hi
+        left, right = self._anomaly_span(lo, hi)
+        return np.asarray(self._anomalies[left:right], dtype=np.int64) - (self._offset + self._start)
+
+    def anomaly_count(self, lo=0, hi=None):
+        """Jumlah anomaly di [lo, hi) tanpa materialisasi baris"""
+        hi = len(self) if hi is None else hi
+        left, right = self._anomaly_span(lo, hi)
+        return right - left
+
+    def page(self, lo=0, hi=None, page=0, page_size=50, newest_first=True,
+             anomalies_only=False, columns=None):
+        """Satu halaman baris dari [lo, hi) -> (DataFrame, total baris)
+
+        Urutan memakai index timestamp (cukup slice / reverse) dan filter
+        anomaly memakai index posisi, jadi biaya sebanding dengan page_size.
+        """
+        hi = len(self) if hi is None else hi
+        columns = columns or list(COLUMNS)
+
+        if anomalies_only:
+            left, right = self._anomaly_span(lo, hi)
+            total = right - left
+        else:
+            left, right = lo, hi
+            total = hi - lo
+
+        # Offset halaman dihitung dari ujung yang sesuai urutan
+        if newest_first:
+            a, b = max(left, right - (page + 1) * page_size), max(left, right - page * page_size)
+        else:
+            a, b = min(right, left + page * page_size), min(right, left + (page + 1) * page_size)
+
+        if anomalies_only:
+            idx = np.asarray(self._anomalies[a:b], dtype=np.int64) - self._offset
+        else:
+            idx = np.arange(self._start + a, self._start + b)
+        if newest_first:
+            idx = idx[::-1]
+
+        import pandas as pd
+        frame = pd.DataFrame({name: self._decode(name, self._cols[name][idx]) for name in columns})
+        return frame, total
+
+    def ingest_lag_ns(self, lo=0, hi=None):
+        """Selisih waktu terima - waktu device untuk reading di [lo, hi)"""
+        hi = len(self) if hi is None else hi
+        s = self._start
+        received = self._cols['timestamp'][s + lo:s + hi]
+        device = self._cols['device_ts'][s + lo:s + hi]
+        has_device_ts = device != NAT_NS
+        return received[has_device_ts] - device[has_device_ts]
+
+    def columns(self, lo=0, hi=None):
+        """Copy kolom NumPy untuk slice contiguous [lo, hi)"""
+        hi = len(self) if hi is None else hi
+        s = self._start
+        return {name: self._decode(name, col[s + lo:s + hi].copy()) for name, col in self._cols.items()}
+
+    def to_dataframe(self, lo=0, hi=None):
+        """DataFrame untuk slice contiguous [lo, hi)"""
+        import pandas as pd
+        hi = len(self) if hi is None else hi
+        s = self._start
+        return pd.DataFrame({name: self._decode(name, col[s + lo:s + hi]) for name, col in self._cols.items()})
+
+    def anomaly_dataframe(self, lo=0, hi=None):
+        """DataFrame baris anomaly di [lo, hi) via index posisi"""
+        import pandas as pd
+        idx = self.anomaly_positions(lo, hi) + self._start
+        return pd.DataFrame({name: self._decode(name, col[idx]) for name, col in self._cols.items()})
+
+    def device_count(self):
+        """Jumlah device yang punya reading terakhir (termasuk yang sudah di-evict)"""
+        return int(np.count_nonzero(self._last_seen != NAT_NS))
+
+    def latest_by_device(self):
+        """Reading terakhir setiap device yang pernah mengirim (termasuk yang sudah di-evict).
+
+        Return dict kolom (device_id, timestamp, LATEST_FIELDS, active) dengan
+        satu baris per device, langsung dari array per device tanpa scan data raw.
+        """
+        seen = np.flatnonzero(self._last_seen != NAT_NS)
+        result = {'device_id': self._device_table[seen], 'timestamp': self._last_seen[seen]}
+        for name, values in self._latest.items():
+            result[name] = self._decode(name, values[seen])
+        result['active'] = self._active[seen]
+        return result
+
+    def history_start(self):
+        """Timestamp tertua yang masih tersedia (agregat atau raw), None jika kosong"""
+        starts = []
+        if self.rollups is not None and len(self.rollups) > 0:
+            starts.append(self.rollups.bounds()[0])
+        if len(self) > 0:
+            starts.append(int(self.timestamps()[0]))
+        return min(starts) if starts else None
+
+    def rollup_columns(self, start=None, end=None, by_device=False):
+        """Agregat data lama yang overlap [start, end) -> kolom mean/min/max per bucket.
+
+        Return None jika tidak ada agregat di rentang tersebut.
+        """
+        if self.rollups is None:
+            return None
+        result = self.rollups.query(start, end, by_device)
+        if len(result['timestamp']) == 0:
+            return None
+        if by_device:
+            result['device_id'] = self._device_table[result.pop('device')]
+        return result
+
+# =====================================================
+# TIME HELPERS
+# =====================================================
+def local_offset_ns():
+    """Offset zona waktu lokal saat ini dalam nanoseconds"""
+    return time.localtime().tm_gmtoff * 1_000_000_000
+
+def to_local_datetime(ns):
+    """int64 epoch ns -> datetime64[ns] wall-clock lokal (vectorized, tanpa parsing)"""
+    ns = np.asarray(ns, dtype=np.int64)
+    return np.where(ns == NAT_NS, NAT_NS, ns + local_offset_ns()).view('datetime64[ns]')
+
+def format_timestamps(ns, fmt='%Y-%m-%d %H:%M:%S.%f'):
+    """Format epoch ns jadi string (hanya untuk baris yang ditampilkan)"""
+    import pandas as pd
+    text = pd.Series(to_local_datetime(ns)).dt.strftime(fmt)
+    return text.str[:-3].to_numpy() if fmt.endswith('%f') else text.to_numpy()
+
+# =====================================================
+# BATCH HELPERS
+# =====================================================
+def records_to_columns(records):
+    """List of record dict -> dict kolom NumPy untuk SensorBuffer.extend"""
+    return {
+        name: np.array([record[name] for record in records], dtype=dtype)
+        for name, dtype in COLUMNS.items()
+    }
@@ -0,0 +1,366 @@
+"""
+Sharded Ingest - Multi-Process Shared-Memory Ring Buffers
+=========================================================
+Mode ingest dengan N worker process. Setiap worker punya MQTT client
+sendiri untuk satu shard topic/device, melakukan parsing JSON, klasifikasi
+dan deteksi anomaly di prosesnya sendiri (tidak berebut GIL dengan render
+Streamlit), lalu menulis hasilnya ke ring buffer columnar di
+``multiprocessing.shared_memory``.
+
+Dashboard memetakan ring tersebut read-only: kolom dibaca sebagai view
+NumPy langsung ke shared memory, tanpa serialisasi antar proses.
+
+Shard memakai MQTT shared subscription ``$share/<group>/<topic>``: broker
+membagi message combined ke semua worker, jadi parsing JSON ikut terbagi
+antar core (topic scalar di-join di worker 0).
+
+Device id yang lebih panjang dari ``DEVICE_ID_BYTES`` disimpan sebagai
+prefix + hash (lihat ``shorten_device_id``), bukan dipotong - sama dengan
+write-ahead log.
+"""
+
+import atexit
+import multiprocessing as mp
+import random
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from classifier import build_columns
+from config import (
+    MQTT_TOPIC_ROUTES, MQTT_CLIENT_ID_PREFIX,
+    SHARD_WORKERS, SHARD_GROUP, SHARD_RING_CAPACITY, SHARD_POLL_INTERVAL, DEVICE_ID_BYTES
+)
+from ingest import MQTTClient
+from sensor_buffer import encode_device_ids, decode_fixed_strings
+from topic_router import compile_pattern
+
+# =====================================================
+# RING LAYOUT
+# =====================================================
+RING_COLUMNS = {
+    'timestamp': 'int64',
+    'device_ts': 'int64',
+    'seq': 'int64',
+    'temperature': 'float64',
+    'humidity': 'float64',
+    'confidence': 'float64',
+    'device_id': f'S{DEVICE_ID_BYTES}',
+    'prediction': 'S8',
+    'anomaly_flag': 'bool',
+    'anomaly_reason': 'S48',
+}
+STRING_COLUMNS = ('device_id', 'prediction', 'anomaly_reason')
+
+# Slot header (int64) di awal shared memory
+HDR_WRITE_COUNT = 0   # Total baris yang pernah ditulis (monotonic)
+HDR_CONNECTED = 1
+HDR_RECEIVED = 2
+HDR_DUPLICATES = 3
+HDR_LOST = 4
+HDR_HEARTBEAT = 5     # time.time_ns() update status terakhir
+HDR_CLAIMED = 6       # Write count setelah batch yang sedang ditulis (>= HDR_WRITE_COUNT)
+HEADER_SLOTS = 8
+
+STATUS_INTERVAL = 1.0  # Detik; interval worker update counter di header
+
+def _aligned(nbytes):
+    return (nbytes + 63) // 64 * 64
+
+# =====================================================
+# SHARED RING BUFFER
+# =====================================================
+class SharedRingBuffer:
+    """Ring buffer columnar di shared memory (satu writer, banyak reader)"""
+
+    def __init__(self, shm, capacity, owner=False, readonly=False):
+        self.shm = shm
+        self.capacity = capacity
+        self.owner = owner
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+
+        offset = _aligned(HEADER_SLOTS * 8)
+        self.cols = {}
+        for name, dtype in RING_COLUMNS.items():
+            dtype = np.dtype(dtype)
+            col = np.ndarray((capacity,), dtype=dtype, buffer=shm.buf, offset=offset)
+            if readonly:
+                col.flags.writeable = False
+            self.cols[name] = col
+            offset += _aligned(capacity * dtype.itemsize)
+
+    @staticmethod
+    def nbytes(capacity):
+        size = _aligned(HEADER_SLOTS * 8)
+        for dtype in RING_COLUMNS.values():
+            size += _aligned(capacity * np.dtype(dtype).itemsize)
+        return size
+
+    @classmethod
+    def create(cls, capacity=SHARD_RING_CAPACITY):
+        shm = shared_memory.SharedMemory(create=True, size=cls.nbytes(capacity))
+        # Owner (dashboard) hanya membaca kolom; yang menulis adalah worker
+        ring = cls(shm, capacity, owner=True, readonly=True)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity, readonly=False):
+        # Worker di-spawn dari owner dan berbagi resource tracker yang sama,
+        # jadi segment tetap di-unlink sekali oleh owner
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, capacity, readonly=readonly)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_count(self):
+        return int(self.header[HDR_WRITE_COUNT])
+
+    def write(self, columns):
+        """Tulis batch (dict kolom) lalu publish write count"""
+        n = len(columns['timestamp'])
+        if n > self.capacity:
+            columns = {name: values[-self.capacity:] for name, values in columns.items()}
+            n = self.capacity
+
+        count = self.write_count
+        # Klaim dulu: reader tahu baris mana yang mungkin sedang ditimpa
+        self.header[HDR_CLAIMED] = count + n
+        pos = count % self.capacity
+        first = min(n, self.capacity - pos)
+        for name, col in self.cols.items():
+            values = columns[name]
+            col[pos:pos + first] = values[:first]
+            if first < n:
+                col[:n - first] = values[first:]
+
+        # Count dinaikkan setelah data lengkap, reader tidak melihat baris setengah jadi
+        self.header[HDR_WRITE_COUNT] = count + n
+
+    def read_since(self, cursor):
+        """View (tanpa copy) baris [cursor, write_count) -> (chunks, start, end)"""
+        end = self.write_count
+        start = max(cursor, end - self.capacity)
+        if start >= end:
+            return [], start, end
+
+        a, b = start % self.capacity, end % self.capacity
+        if a < b or b == 0:
+            spans = [(a, b or self.capacity)]
+        else:
+            spans = [(a, self.capacity), (0, b)]
+        chunks = [{name: col[lo:hi] for name, col in self.cols.items()} for lo, hi in spans]
+        return chunks, start, end
+
+    def valid_from(self):
+        """Index baris tertua yang belum (dan tidak sedang) ditimpa writer"""
+        return int(self.header[HDR_CLAIMED]) - self.capacity
+
+    def update_status(self, client, received, duplicates, lost):
+        self.header[HDR_CONNECTED] = int(client.connected)
+        self.header[HDR_RECEIVED] = received
+        self.header[HDR_DUPLICATES] = duplicates
+        self.header[HDR_LOST] = lost
+        self.header[HDR_HEARTBEAT] = time.time_ns()
+
+    def close(self):
+        # Lepas view NumPy dulu supaya buffer shared memory bisa ditutup
+        self.header = None
+        self.cols = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def encode_ring_columns(columns):
+    """Dict kolom record -> dtype ring (string jadi bytes fixed-width)"""
+    encoded = {}
+    for name, dtype in RING_COLUMNS.items():
+        if name == 'device_id':
+            encoded[name] = encode_device_ids(columns[name], np.dtype(dtype).itemsize)
+        elif name in STRING_COLUMNS:
+            encoded[name] = np.char.encode(np.asarray(columns[name], dtype=str), 'utf-8').astype(dtype)
+        else:
+            encoded[name] = np.asarray(columns[name], dtype=dtype)
+    return encoded
+
+# =====================================================
+# SHARD WORKER (child process)
+# =====================================================
+def shard_topics(shard):
+    """Topic filter yang di-subscribe oleh satu worker"""
+    routes = [(compile_pattern(pattern)[0], schema) for pattern, schema in MQTT_TOPIC_ROUTES]
+    topics = [f"$share/{SHARD_GROUP}/{topic}" for topic, schema in routes if schema == 'combined']
+    # Topic scalar harus di-join di satu worker, jadi tidak di-share
+    if shard == 0:
+        topics += [topic for topic, schema in routes if schema != 'combined']
+    return list(dict.fromkeys(topics))
+
+def run_shard_worker(shard, ring_name, capacity, stop_event):
+    """Entry point worker process: MQTT -> klasifikasi -> shared-memory ring"""
+    ring = SharedRingBuffer.attach(ring_name, capacity)
+    client = MQTTClient(
+        client_id=f"{MQTT_CLIENT_ID_PREFIX}_shard{shard}_{random.randint(1000, 9999)}",
+        topics=shard_topics(shard)
+    )
+    client.connect()
+
+    last_status = 0
+    try:
+        while not stop_event.wait(SHARD_POLL_INTERVAL):
+            readings = client.drain_columns()
+            if readings is not None:
+                ring.write(encode_ring_columns(build_columns(readings)))
+
+            now = time.monotonic()
+            if now - last_status >= STATUS_INTERVAL:
+                last_status = now
+                devices = client.tracker.devices
+                ring.update_status(
+                    client,
+                    sum(s.received for s in devices.values()),
+                    sum(s.duplicates for s in devices.values()),
+                    sum(s.lost for s in devices.values()),
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.disconnect()
+        ring.close()
+
+# =====================================================
+# SHARDED INGEST (parent / dashboard process)
+# =====================================================
+class ShardTotals:
+    """Ringkasan counter dari header semua ring (interface sama dengan SequenceTracker)"""
+
+    def __init__(self, rings):
+        self.rings = rings
+
+    def totals(self):
+        headers = np.array([ring.header for ring in self.rings])
+        return {
+            'devices': None,
+            'received': int(headers[:, HDR_RECEIVED].sum()),
+            'duplicates': int(headers[:, HDR_DUPLICATES].sum()),
+            'lost': int(headers[:, HDR_LOST].sum()),
+        }
+
+
+class ShardedIngest:
+    def __init__(self, n_workers=SHARD_WORKERS, capacity=SHARD_RING_CAPACITY, wal=None):
+        # spawn: jangan fork proses Streamlit yang sudah punya banyak thread
+        self._ctx = mp.get_context("spawn")
+        self.n_workers = n_workers
+        self.capacity = capacity
+        self.rings = [SharedRingBuffer.create(capacity) for _ in range(n_workers)]
+        self.stop_event = self._ctx.Event()
+        self.workers = [None] * n_workers
+        self.tracker = ShardTotals(self.rings)
+        self.overruns = 0           # Read yang tersusul writer
+        self.overrun_rows = 0       # Baris yang dibuang karena sudah ditimpa saat dibaca
+        self.wal = wal
+        self._wal_thread = None
+        self._wal_stop = threading.Event()
+        atexit.register(self.stop)
+
+    def _spawn(self, shard):
+        process = self._ctx.Process(
+            target=run_shard_worker,
+            args=(shard, self.rings[shard].name, self.capacity, self.stop_event),
+            name=f"ingest-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        self.workers[shard] = process
+
+    def start(self):
+        for shard in range(self.n_workers):
+            self._spawn(shard)
+        print(f"🧵 Started {self.n_workers} ingest workers (shared subscription)")
+        if self.wal is not None:
+            self.wal.start()
+            self._wal_thread = threading.Thread(target=self._record_wal, name="shard-wal", daemon=True)
+            self._wal_thread.start()
+
+    def _record_wal(self):
+        """Reader ring khusus write-ahead log (satu per proses, bukan per session)"""
+        cursors = [ring.write_count for ring in self.rings]
+        while True:
+            stopping = self._wal_stop.wait(self.wal.commit_interval)
+            batch = self.read_new(cursors)
+            if batch is not None:
+                self.wal.append(batch)
+            if stopping:
+                break
+
+    def connect(self):
+        """Restart worker yang mati (dipakai tombol Reconnect)"""
+        for shard, process in enumerate(self.workers):
+            if process is None or not process.is_alive():
+                self._spawn(shard)
+        return True
+
+    @property
+    def connected(self):
+        return all(
+            process is not None and process.is_alive() and ring.header[HDR_CONNECTED]
+            for process, ring in zip(self.workers, self.rings)
+        )
+
+    def new_cursors(self):
+        """Cursor awal untuk session baru (mulai dari data tertua yang masih ada)"""
+        return [max(0, ring.write_count - ring.capacity) for ring in self.rings]
+
+    def read_new(self, cursors):
+        """Gabungkan baris baru dari semua ring, terurut timestamp.
+
+        ``cursors`` di-update in-place. Return dict kolom (siap untuk
+        SensorBuffer.extend) atau None jika tidak ada data baru.
+        """
+        parts = []
+        for shard, ring in enumerate(self.rings):
+            chunks, start, end = ring.read_since(cursors[shard])
+            cursors[shard] = end
+            if not chunks:
+                continue
+            part = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in RING_COLUMNS}
+            # Baris yang disusul writer selama copy di atas bisa setengah ditimpa: buang
+            stale = ring.valid_from() - start
+            if stale > 0:
+                self.overruns += 1
+                self.overrun_rows += min(stale, end - start)
+                if stale >= end - start:
+                    continue
+                part = {name: values[stale:] for name, values in part.items()}
+            parts.append(part)
+        if not parts:
+            return None
+
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in RING_COLUMNS}
+        order = np.argsort(merged['timestamp'], kind='stable')
+        columns = {name: values[order] for name, values in merged.items()}
+        for name in STRING_COLUMNS:
+            columns[name] = decode_fixed_strings(columns[name])
+        columns['alert_triggered'] = columns['anomaly_flag'].copy()
+        return columns
+
+    def stop(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        for process in self.workers:
+            if process is not None:
+                process.join(timeout=2)
+        if self._wal_thread is not None:
+            # Worker sudah berhenti: baca sisa ring terakhir kali lalu commit
+            self._wal_stop.set()
+            self._wal_thread.join(timeout=2)
+            self.wal.close()
+        for ring in self.rings:
+            ring.close()
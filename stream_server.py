@@ -0,0 +1,271 @@
+"""
+Stream Server - Live Push Endpoint (SSE)
+=========================================
+Endpoint HTTP ringan untuk client live-chart (wall display, mobile viewer)
+yang tidak butuh aplikasi Streamlit penuh.
+
+- ``GET /``        : halaman live chart minimal (EventSource + Plotly.js)
+- ``GET /stream``  : Server-Sent Events, snapshot lalu frame incremental
+- ``GET /stats``   : counter broadcaster dalam JSON
+
+Setiap batch reading di-encode sekali menjadi frame columnar yang compact,
+lalu bytes yang sama dikirim ke semua client (broadcast). Setiap client
+punya antrian frame terbatas: client yang lambat kehilangan frame lama
+(dihitung sebagai ``dropped``) tanpa menahan client lain maupun ingest.
+"""
+
+import json
+import threading
+import weakref
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from config import STREAM_HOST, STREAM_PORT, STREAM_CLIENT_QUEUE, STREAM_HEARTBEAT, STREAM_MAX_INTERVAL
+
+# =====================================================
+# FRAME ENCODING
+# =====================================================
+def encode_columns(columns, seq, kind="update"):
+    """Batch kolom record (schema SensorBuffer) -> frame JSON columnar (bytes)"""
+    anomalies = np.flatnonzero(columns['anomaly_flag'])
+    frame = {
+        'type': kind,
+        'seq': seq,
+        't': columns['timestamp'].tolist(),
+        'dev': columns['device_id'].tolist(),
+        'temp': columns['temperature'].tolist(),
+        'hum': columns['humidity'].tolist(),
+        'pred': columns['prediction'].tolist(),
+        'conf': columns['confidence'].tolist(),
+        'anom': columns['anomaly_flag'].astype(int).tolist(),
+        'alerts': [
+            {'t': t, 'dev': dev, 'reason': reason}
+            for t, dev, reason in zip(columns['timestamp'][anomalies].tolist(),
+                                      columns['device_id'][anomalies].tolist(),
+                                      columns['anomaly_reason'][anomalies].tolist())
+        ],
+    }
+    return json.dumps(frame, separators=(',', ':')).encode()
+
+
+class Frame:
+    """Satu batch reading (dict kolom) yang di-broadcast ke semua subscriber"""
+    __slots__ = ('seq', 'columns', '_encoded')
+
+    def __init__(self, seq, columns):
+        self.seq = seq
+        self.columns = columns
+        self._encoded = None
+
+    def encoded(self):
+        """Encode JSON sekali saja, dipakai bersama oleh semua client SSE"""
+        if self._encoded is None:
+            self._encoded = encode_columns(self.columns, self.seq)
+        return self._encoded
+
+# =====================================================
+# BROADCASTER
+# =====================================================
+class Subscriber:
+    """Antrian frame terbatas milik satu client"""
+
+    def __init__(self, maxlen=STREAM_CLIENT_QUEUE):
+        self.frames = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.event = threading.Event()
+        self._lock = threading.Lock()
+
+    def push(self, frame):
+        with self._lock:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+        self.event.set()
+
+    def drain(self):
+        """Ambil semua frame yang antri"""
+        with self._lock:
+            frames = list(self.frames)
+            self.frames.clear()
+            self.event.clear()
+        return frames
+
+
+class Broadcaster:
+    """Fan-out frame ke semua subscriber (SSE client maupun session dashboard)"""
+
+    def __init__(self):
+        # WeakSet: subscriber milik session yang sudah selesai otomatis hilang
+        self._subscribers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.frames_published = 0
+
+    def subscribe(self, maxlen=STREAM_CLIENT_QUEUE):
+        sub = Subscriber(maxlen)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, frame):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.push(frame)
+        self.frames_published += 1
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'frames_published': self.frames_published,
+            'dropped': sum(sub.dropped for sub in subscribers),
+        }
+
+# =====================================================
+# HTTP / SSE SERVER
+# =====================================================
+LIVE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>IoT Live Stream</title>
+<script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
+<style>body{background:#0e1117;color:#fff;font-family:sans-serif;margin:0}
+#status{padding:8px 16px}#alert{color:#ff4444;padding:0 16px}</style></head>
+<body><div id="status">Connecting...</div><div id="alert"></div><div id="chart" style="height:90vh"></div>
+<script>
+const MAX = 600;
+Plotly.newPlot('chart', [
+  {x: [], y: [], name: 'Temperature', line: {color: '#FF6B6B'}},
+  {x: [], y: [], name: 'Humidity', yaxis: 'y2', line: {color: '#4ECDC4'}}
+], {paper_bgcolor: '#0e1117', plot_bgcolor: '#0e1117', font: {color: '#fff'},
+    yaxis: {title: 'Temperature (°C)'}, yaxis2: {title: 'Humidity (%)', overlaying: 'y', side: 'right'}});
+const es = new EventSource('/stream' + location.search);
+function apply(f) {
+  if (!f.t.length) return;
+  const x = f.t.map(t => new Date(t / 1e6));
+  Plotly.extendTraces('chart', {x: [x, x], y: [f.temp, f.hum]}, [0, 1], MAX);
+  document.getElementById('status').textContent =
+    'Last: ' + x[x.length - 1].toLocaleTimeString() + ' | ' + f.temp[f.temp.length - 1] + '°C, ' +
+    f.hum[f.hum.length - 1] + '% (' + f.pred[f.pred.length - 1] + ')';
+  if (f.alerts.length) document.getElementById('alert').textContent =
+    '🚨 ' + new Date(f.alerts[f.alerts.length - 1].t / 1e6).toLocaleTimeString() + ' ' + f.alerts[f.alerts.length - 1].reason;
+}
+es.onmessage = e => apply(JSON.parse(e.data));
+es.addEventListener('snapshot', e => apply(JSON.parse(e.data)));
+es.onerror = () => { document.getElementById('status').textContent = 'Reconnecting...'; };
+</script></body></html>
+"""
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """Handler HTTP untuk halaman live, SSE stream, dan stats"""
+    server_version = "IoTStream/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Jangan spam stdout untuk setiap request
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/':
+            self._send_body(LIVE_PAGE.encode(), 'text/html; charset=utf-8')
+        elif url.path == '/stream':
+            self._stream(parse_qs(url.query))
+        elif url.path == '/stats':
+            self._send_body(json.dumps(self.server.service.stream_stats()).encode(), 'application/json')
+        else:
+            self.send_error(404)
+
+    def _send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, query):
+        """Kirim snapshot, lalu frame incremental sampai client putus"""
+        # Client boleh minta update lebih jarang, misal /stream?interval=5
+        try:
+            interval = float(query.get('interval', ['0'])[0])
+        except ValueError:
+            self.send_error(400, "interval must be a number of seconds")
+            return
+        if not 0 <= interval <= STREAM_MAX_INTERVAL:
+            # Termasuk nan / inf (Event.wait(inf) = OverflowError)
+            self.send_error(400, f"interval must be between 0 and {STREAM_MAX_INTERVAL} seconds")
+            return
+        service = self.server.service
+        # Subscribe sebelum snapshot (tidak ada frame yang terlewat); frame yang
+        # sudah ikut snapshot (seq <= snapshot_seq) dilewati, tidak dikirim dua kali
+        sub = service.broadcaster.subscribe()
+        snapshot_seq, snapshot = service.snapshot_frame()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        dropped_sent = 0
+        try:
+            self.wfile.write(b"event: snapshot\ndata: " + snapshot + b"\n\n")
+            self.wfile.flush()
+            while not self.server.stopping.is_set():
+                if not sub.event.wait(STREAM_HEARTBEAT):
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    continue
+                if interval > 0:
+                    # Throttle per client: biarkan frame terkumpul dulu
+                    self.server.stopping.wait(interval)
+
+                chunks = [b"data: " + frame.encoded() + b"\n\n" for frame in sub.drain()
+                          if frame.seq > snapshot_seq]
+                if sub.dropped != dropped_sent:
+                    dropped_sent = sub.dropped
+                    chunks.append(b"event: dropped\ndata: %d\n\n" % dropped_sent)
+                self.wfile.write(b"".join(chunks))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            service.broadcaster.unsubscribe(sub)
+
+
+class StreamServer(ThreadingHTTPServer):
+    """HTTP server SSE yang berjalan di background thread"""
+    daemon_threads = True
+
+    def __init__(self, service, host=STREAM_HOST, port=STREAM_PORT):
+        super().__init__((host, port), StreamHandler)
+        self.service = service
+        self.stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="stream-server", daemon=True)
+        self._thread.start()
+        print(f"📺 Live stream endpoint: http://{self.server_address[0]}:{self.server_address[1]}/")
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
+
+def open_stream_server(service, host=STREAM_HOST, port=STREAM_PORT):
+    """StreamServer untuk ``service``, atau None jika port tidak bisa di-bind
+
+    Port dipakai proses lain (dashboard kedua, async_ingest.py): ingest tetap
+    jalan tanpa endpoint SSE.
+    """
+    try:
+        return StreamServer(service, host, port)
+    except OSError as e:
+        print(f"⚠️ Live stream endpoint disabled: cannot bind {host}:{port} ({e})")
+        return None
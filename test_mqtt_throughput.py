@@ -0,0 +1,511 @@
+"""
+MQTT Throughput Test
+====================
+Test + benchmark offline untuk jalur ingest dashboard: ``MQTTClient.on_message``
+-> ``drain_columns()`` -> ``build_columns()`` (sama dengan ``get_mqtt_data``
+di app.py mode "session"). Tidak butuh internet.
+
+Transport:
+- loopback : message paho dibuat di memori lalu dikirim langsung ke
+             ``MQTTClient.on_message`` (CPU murni kode ingest)
+- broker   : broker MQTT 3.1.1 minimal di 127.0.0.1 (dalam proses ini), atau
+             broker lokal lain lewat ``--broker host:port`` (misal mosquitto).
+             MQTTClient asli connect lewat ConnectionSupervisor, publisher
+             memakai client paho terpisah.
+
+Format topic yang dites:
+- scalar   : ``MQTT_TOPIC_TEMP`` + ``MQTT_TOPIC_HUMIDITY`` bergantian
+             (di-join jadi satu reading)
+- combined : JSON satu reading dengan ``seq`` di ``MQTT_TOPIC_COMBINED``
+- batch    : payload columnar gateway di ``MQTT_TOPIC_COMBINED``
+
+Untuk setiap format:
+1. volume : ``--messages`` message secepatnya, assert zero loss (jumlah,
+            urutan seq / nilai, tidak ada lost / duplicate / overflow)
+2. rate   : offered rate (message/s) naik 2x per langkah selama ``--duration`` detik;
+            rate tertinggi yang masih zero loss dan tidak tertinggal
+            (semua reading sudah di-drain <= ``--slack`` detik setelah
+            jadwal publish selesai) = max sustainable rate
+3. CPU per message (``time.process_time``; mode broker in-process ikut
+   menghitung broker + publisher, jadi batas atas)
+
+Exit code 1 jika ada assertion yang gagal.
+
+Jalankan:
+    python test_mqtt_throughput.py
+    python test_mqtt_throughput.py --transport broker --messages 20000
+    python test_mqtt_throughput.py --transport broker --broker localhost:1883
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from classifier import build_columns, get_predictor
+from config import MQTT_TOPIC_TEMP, MQTT_TOPIC_HUMIDITY, MQTT_TOPIC_COMBINED
+from ingest import MQTTClient
+
+BATCH_SIZE = 50          # Reading per payload columnar
+DEVICES = 8              # Device untuk format combined
+PROBE_DEVICE = "throughput_probe"
+
+# =====================================================
+# LOOPBACK BROKER (MQTT 3.1.1, QoS 0)
+# =====================================================
+CONNECT, CONNACK, PUBLISH, PUBACK, SUBSCRIBE, SUBACK = 1, 2, 3, 4, 8, 9
+UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 10, 11, 12, 13, 14
+
+def topic_matches(pattern, topic):
+    """Topic filter MQTT (``+`` satu level, ``#`` sisa level)"""
+    parts, levels = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(parts):
+        if part == "#":
+            return True
+        if i >= len(levels) or (part != "+" and part != levels[i]):
+            return False
+    return len(parts) == len(levels)
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        n, byte = divmod(n, 128)
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+def encode_string(text):
+    data = text.encode()
+    return struct.pack("!H", len(data)) + data
+
+def packet(kind, body, flags=0):
+    return bytes([kind << 4 | flags]) + encode_length(len(body)) + body
+
+class LoopbackBroker:
+    """Broker MQTT minimal untuk test: satu thread per koneksi, semua publish diteruskan QoS 0"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._subscriptions = []     # (filter, session)
+        self._lock = threading.Lock()
+        self._running = True
+        self.forwarded = 0
+        threading.Thread(target=self._accept, name="loopback-broker", daemon=True).start()
+
+    def close(self):
+        self._running = False
+        self._server.close()
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        session = {'conn': conn, 'lock': threading.Lock()}
+        stream = conn.makefile("rb")
+        try:
+            while True:
+                header = stream.read(1)
+                if not header:
+                    break
+                length, shift = 0, 0
+                while True:
+                    byte = stream.read(1)[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = stream.read(length)
+                kind, flags = header[0] >> 4, header[0] & 0x0F
+                if kind == CONNECT:
+                    self._send(session, packet(CONNACK, b"\x00\x00"))
+                elif kind == PUBLISH:
+                    self._publish(session, flags, body)
+                elif kind == SUBSCRIBE:
+                    self._subscribe(session, body)
+                elif kind == UNSUBSCRIBE:
+                    self._send(session, packet(UNSUBACK, body[:2]))
+                elif kind == PINGREQ:
+                    self._send(session, packet(PINGRESP, b""))
+                elif kind == DISCONNECT:
+                    break
+        except (OSError, IndexError):
+            pass
+        finally:
+            with self._lock:
+                self._subscriptions = [(f, s) for f, s in self._subscriptions if s is not session]
+            conn.close()
+
+    def _send(self, session, data):
+        with session['lock']:
+            session['conn'].sendall(data)
+
+    def _subscribe(self, session, body):
+        packet_id, offset, granted = body[:2], 2, bytearray()
+        while offset < len(body):
+            (size,) = struct.unpack_from("!H", body, offset)
+            pattern = body[offset + 2:offset + 2 + size].decode()
+            offset += 2 + size + 1
+            with self._lock:
+                self._subscriptions.append((pattern, session))
+            granted.append(0)
+        self._send(session, packet(SUBACK, packet_id + bytes(granted), flags=0))
+
+    def _publish(self, session, flags, body):
+        (size,) = struct.unpack_from("!H", body)
+        topic = body[2:2 + size].decode()
+        offset = 2 + size
+        qos = (flags >> 1) & 0x03
+        if qos:
+            self._send(session, packet(PUBACK, body[offset:offset + 2]))
+            offset += 2
+        forward = packet(PUBLISH, encode_string(topic) + body[offset:])
+        with self._lock:
+            targets = {id(s): s for pattern, s in self._subscriptions if topic_matches(pattern, topic)}
+        for target in targets.values():
+            try:
+                self._send(target, forward)
+                self.forwarded += 1
+            except OSError:
+                pass
+
+# =====================================================
+# MESSAGE GENERATORS
+# =====================================================
+def scalar_messages(count):
+    """Temperature & humidity bergantian; nilai unik supaya tidak dianggap duplikat"""
+    pairs = count // 2
+    temps = 20 + (np.arange(pairs) % 10000) / 1000
+    hums = 50 + (np.arange(pairs) % 7000) / 1000
+    messages = []
+    for temp, hum in zip(temps.tolist(), hums.tolist()):
+        messages.append((MQTT_TOPIC_TEMP, f"{temp:.3f}".encode()))
+        messages.append((MQTT_TOPIC_HUMIDITY, f"{hum:.3f}".encode()))
+    expected = {'readings': pairs, 'temperature': np.round(temps, 3), 'humidity': np.round(hums, 3)}
+    return messages, expected
+
+def combined_messages(count):
+    """JSON satu reading per message, ``DEVICES`` device dengan seq masing-masing"""
+    now = time.time()
+    messages = [(MQTT_TOPIC_COMBINED, json.dumps({
+        'sensor_id': f"esp32_{i % DEVICES:02d}",
+        'seq': i // DEVICES,
+        'temperature': round(24 + (i % 100) / 10, 1),
+        'humidity': round(55 + (i % 50) / 5, 1),
+        'timestamp': now + i / 1000,
+    }).encode()) for i in range(count)]
+    return messages, {'readings': count}
+
+def batch_messages(count):
+    """Payload columnar gateway, ``BATCH_SIZE`` reading per message"""
+    now = time.time()
+    messages = []
+    for i in range(count):
+        t = np.arange(BATCH_SIZE)
+        messages.append((MQTT_TOPIC_COMBINED, json.dumps({
+            'sensor_id': "gateway_01",
+            'seq': i * BATCH_SIZE,
+            'temperature': np.round(24 + np.sin(t / 7), 2).tolist(),
+            'humidity': np.round(60 + np.cos(t / 9), 2).tolist(),
+            'timestamp': (now + i + t / BATCH_SIZE).tolist(),
+        }).encode()))
+    return messages, {'readings': count * BATCH_SIZE}
+
+FORMATS = {
+    'scalar': scalar_messages,
+    'combined': combined_messages,
+    'batch': batch_messages,
+}
+
+# =====================================================
+# TRANSPORTS
+# =====================================================
+class LoopbackTransport:
+    """Panggil on_message langsung, tanpa socket"""
+    name = "loopback"
+
+    def __init__(self):
+        self.client = MQTTClient(client_id="throughput_loopback")
+
+    def prepare(self, messages):
+        prepared = []
+        for topic, payload in messages:
+            msg = mqtt.MQTTMessage(topic=topic.encode())
+            msg.payload = payload
+            prepared.append(msg)
+        return prepared
+
+    def send(self, msg):
+        self.client.on_message(None, None, msg)
+
+    def close(self):
+        pass
+
+class BrokerTransport:
+    """MQTTClient asli (ConnectionSupervisor) + publisher paho lewat broker TCP"""
+    name = "broker"
+
+    def __init__(self, host, port, timeout=10):
+        self.client = MQTTClient(client_id=f"throughput_sub_{os.getpid()}")
+        self.client.supervisor.host, self.client.supervisor.port = host, port
+        self.client.connect()
+        self.publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"throughput_pub_{os.getpid()}")
+        self.publisher.max_queued_messages_set(0)
+        self.publisher.connect(host, port, 60)
+        self.publisher.loop_start()
+
+        # Tunggu subscription aktif: kirim probe sampai diterima
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.publisher.publish(MQTT_TOPIC_COMBINED, json.dumps(
+                {'sensor_id': PROBE_DEVICE, 'temperature': 25.0, 'humidity': 60.0, 'seq': 0}))
+            time.sleep(0.1)
+            if self.client.drain_columns() is not None:
+                return
+        raise RuntimeError(f"No message came back through broker {host}:{port}")
+
+    def prepare(self, messages):
+        return messages
+
+    def send(self, message):
+        self.publisher.publish(*message)
+
+    def close(self):
+        self.publisher.loop_stop()
+        self.publisher.disconnect()
+        self.client.disconnect()
+
+# =====================================================
+# RUNNER
+# =====================================================
+class Consumer(threading.Thread):
+    """Drain + build_columns berkala, seperti rerun dashboard"""
+
+    def __init__(self, client, interval):
+        super().__init__(name="throughput-consumer", daemon=True)
+        self.client = client
+        self.interval = interval
+        self.batches = []
+        self.received = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.drain()
+        self.drain()
+
+    def drain(self):
+        readings = self.client.drain_columns()
+        if readings is None:
+            return
+        keep = readings['device_id'] != PROBE_DEVICE
+        batch = build_columns({name: values[keep] for name, values in readings.items()})
+        self.batches.append(batch)
+        self.received += len(batch['timestamp'])
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def columns(self):
+        if not self.batches:
+            return None
+        return {name: np.concatenate([b[name] for b in self.batches]) for name in self.batches[0]}
+
+def reset_client(client, quiet_period=0.3, timeout=60):
+    """Tunggu sisa message run sebelumnya habis, lalu state ingest bersih"""
+    deadline = time.monotonic() + timeout
+    idle_since = time.monotonic()
+    while time.monotonic() - idle_since < quiet_period and time.monotonic() < deadline:
+        time.sleep(0.05)
+        if client.drain_columns() is not None:
+            idle_since = time.monotonic()
+    client.tracker.devices.clear()
+    client._partial = {}
+    client.overflow = 0
+
+def check_loss(fmt, client, consumer, expected):
+    """List pesan error (kosong = zero loss)"""
+    errors = []
+    columns = consumer.columns()
+    received = 0 if columns is None else len(columns['timestamp'])
+    if received != expected['readings']:
+        errors.append(f"received {received} of {expected['readings']} readings")
+    if client.overflow:
+        errors.append(f"pending queue overflowed {client.overflow} times")
+    totals = client.tracker.totals()
+    if totals['lost'] or totals['duplicates']:
+        errors.append(f"tracker reported lost={totals['lost']} duplicates={totals['duplicates']}")
+    if columns is None or errors:
+        return errors
+
+    if fmt == 'scalar':
+        for field in ('temperature', 'humidity'):
+            if not np.allclose(columns[field], expected[field]):
+                errors.append(f"{field} values differ from what was published")
+    else:
+        for device in set(columns['device_id'].tolist()):
+            seqs = columns['seq'][columns['device_id'] == device]
+            if not np.array_equal(seqs, np.arange(seqs[0], seqs[0] + len(seqs))):
+                errors.append(f"{device}: sequence has gaps or is out of order")
+    return errors
+
+def run_load(transport, fmt, messages, expected, rate, drain_interval, slack, stall=2.0):
+    """Kirim messages (rate None = secepatnya); return dict hasil.
+
+    Volume (rate None) gagal jika tidak ada reading baru selama ``stall``
+    detik; rate test gagal jika belum selesai ``slack`` detik setelah jadwal.
+    """
+    client = transport.client
+    prepared = transport.prepare(messages)
+
+    # print per message di on_message ikut dihitung, tapi tidak ditampilkan
+    with contextlib.redirect_stdout(io.StringIO()):
+        reset_client(client)
+        consumer = Consumer(client, drain_interval)
+        consumer.start()
+        cpu_start, start = time.process_time(), time.perf_counter()
+        if rate is None:
+            for message in prepared:
+                transport.send(message)
+        else:
+            # Kirim yang sudah jatuh tempo setiap 5 ms
+            sent = 0
+            while sent < len(prepared):
+                due = min(len(prepared), int((time.perf_counter() - start) * rate) + 1)
+                for message in prepared[sent:due]:
+                    transport.send(message)
+                sent = due
+                time.sleep(0.005)
+        publish_end = time.perf_counter()
+        schedule_end = start + (len(prepared) / rate if rate else 0.0)
+
+        deadline = max(publish_end, schedule_end) + slack
+        progress, progress_at = consumer.received, time.perf_counter()
+        while consumer.received < expected['readings']:
+            now = time.perf_counter()
+            if consumer.received != progress:
+                progress, progress_at = consumer.received, now
+            if (rate is None and now - progress_at > stall) or (rate is not None and now > deadline):
+                break
+            time.sleep(0.001)
+        done = time.perf_counter()
+        consumer.stop()
+        cpu = time.process_time() - cpu_start
+        reset_client(client)
+
+    errors = check_loss(fmt, client, consumer, expected)
+    if rate is not None and done - max(schedule_end, start) > slack:
+        errors.append(f"fell behind: drained {done - schedule_end:.2f}s after schedule end")
+    return {
+        'errors': errors,
+        'elapsed': done - start,
+        'cpu_per_message_us': cpu / len(prepared) * 1e6,
+        'messages_per_s': len(prepared) / (done - start),
+    }
+
+def find_max_rate(transport, fmt, duration, start_rate, max_rate, drain_interval, slack):
+    """Naikkan rate 2x sampai gagal; return (rate tertinggi yang lolos, hasil per langkah)"""
+    best, steps, rate = None, [], start_rate
+    while rate <= max_rate:
+        messages, expected = FORMATS[fmt](int(rate * duration))
+        result = run_load(transport, fmt, messages, expected, rate, drain_interval, slack)
+        steps.append((rate, result))
+        if result['errors']:
+            break
+        best = rate
+        rate *= 2
+    return best, steps
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput test for MQTTClient ingest")
+    parser.add_argument("--transport", choices=["loopback", "broker", "both"], default="both")
+    parser.add_argument("--broker", metavar="HOST:PORT",
+                        help="Broker lokal yang sudah jalan (default: broker loopback in-process)")
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS))
+    parser.add_argument("--messages", type=int, default=20000, help="Message per volume test")
+    parser.add_argument("--duration", type=float, default=2.0, help="Detik per langkah rate test")
+    parser.add_argument("--start-rate", type=int, default=500, help="Message/s langkah pertama")
+    parser.add_argument("--max-rate", type=int, default=256000, help="Berhenti menaikkan rate di sini")
+    parser.add_argument("--drain-interval", type=float, default=0.1, help="Interval drain (rerun dashboard)")
+    parser.add_argument("--slack", type=float, default=0.5, help="Toleransi tertinggal (detik)")
+    args = parser.parse_args()
+
+    transports = ["loopback", "broker"] if args.transport == "both" else [args.transport]
+
+    print("=" * 60)
+    print("🧪 MQTT THROUGHPUT TEST (offline)")
+    print("=" * 60)
+    # Load model sekali di luar pengukuran (import sklearn tidak dihitung per message)
+    get_predictor()
+
+    failures = []
+    for name in transports:
+        broker = None
+        if name == "loopback":
+            transport = LoopbackTransport()
+        else:
+            if args.broker:
+                host, _, port = args.broker.partition(":")
+                port = int(port or 1883)
+            else:
+                broker = LoopbackBroker()
+                host, port = broker.host, broker.port
+            print(f"\n🔌 Broker: {host}:{port}{' (in-process)' if broker else ''}")
+            transport = BrokerTransport(host, port)
+
+        try:
+            for fmt in args.formats:
+                messages, expected = FORMATS[fmt](args.messages)
+                volume = run_load(transport, fmt, messages, expected, None, args.drain_interval, args.slack)
+                best, steps = find_max_rate(transport, fmt, args.duration, args.start_rate, args.max_rate,
+                                            args.drain_interval, args.slack)
+
+                status = "✅ PASS" if not volume['errors'] else "❌ FAIL"
+                print(f"\n📨 {name} · {fmt}: {status}")
+                print(f"   Volume      : {len(messages)} messages -> {expected['readings']} readings "
+                      f"in {volume['elapsed']:.2f}s ({volume['messages_per_s']:,.0f} msg/s)")
+                print(f"   CPU/message : {volume['cpu_per_message_us']:.1f} µs")
+                for rate, result in steps:
+                    mark = "✅" if not result['errors'] else "❌"
+                    detail = "; ".join(result['errors'])
+                    print(f"   {mark} {rate:>8,} msg/s {detail}")
+                print(f"   Max sustainable: {f'{best:,} msg/s' if best else 'below start rate'}"
+                      f"{' (capped by --max-rate)' if best and best * 2 > args.max_rate else ''}")
+
+                for error in volume['errors']:
+                    failures.append(f"{name} · {fmt}: {error}")
+        finally:
+            transport.close()
+            if broker is not None:
+                broker.close()
+
+    print()
+    print("=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} zero-loss assertion(s) failed:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("✅ Zero loss for every transport and topic format")
+
+if __name__ == "__main__":
+    main()
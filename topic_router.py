@@ -0,0 +1,181 @@
+"""
+Topic Router
+============
+Pola subscription MQTT di-compile menjadi trie per level topic, sehingga
+satu lookup menghasilkan handler, schema (format payload) dan label yang
+diambil dari segment topic.
+
+Sintaks pola:
+- ``+`` / ``#``  : wildcard MQTT biasa
+- ``{nama}``     : seperti ``+``, nilainya disimpan sebagai label
+  (misal ``iot/{site}/{building}/sensor/data``)
+
+Label ``device_id`` menggantikan id device dari payload; label lain
+(site, building, ...) menjadi prefix id device, misal ``site1/b2/esp32_01``.
+
+Hasil routing di-cache per topic konkret, jadi biaya per message tetap
+satu lookup dict walaupun jumlah pola dan device bertambah.
+"""
+
+from config import ROUTE_CACHE_SIZE
+
+SCHEMAS = ('temperature', 'humidity', 'combined')
+
+# Ranking specificity per level: literal > + > #
+_LITERAL, _SINGLE, _MULTI = 2, 1, 0
+
+def compile_pattern(pattern):
+    """Pola -> (topic filter untuk subscribe, list (level, nama label), rank specificity)"""
+    levels = pattern.split("/")
+    filters, labels, rank = [], [], []
+    for i, level in enumerate(levels):
+        if level.startswith("{") and level.endswith("}"):
+            labels.append((i, level[1:-1]))
+            filters.append("+")
+            rank.append(_SINGLE)
+        elif level == "#":
+            if i != len(levels) - 1:
+                raise ValueError(f"'#' must be the last level: {pattern}")
+            filters.append("#")
+            rank.append(_MULTI)
+        elif level == "+":
+            filters.append("+")
+            rank.append(_SINGLE)
+        elif "+" in level or "#" in level or "{" in level:
+            raise ValueError(f"Wildcard must occupy a whole level: {pattern}")
+        else:
+            filters.append(level)
+            rank.append(_LITERAL)
+    return "/".join(filters), labels, tuple(rank)
+
+# =====================================================
+# ROUTES & MATCHES
+# =====================================================
+class Route:
+    """Satu pola subscription yang sudah di-compile"""
+    __slots__ = ('pattern', 'filter', 'schema', 'handler', 'labels', 'rank', 'order')
+
+    def __init__(self, pattern, schema, handler, order):
+        if schema not in SCHEMAS:
+            raise ValueError(f"Unknown schema '{schema}' for {pattern} (expected one of {SCHEMAS})")
+        self.pattern = pattern
+        self.schema = schema
+        self.handler = handler
+        self.order = order
+        self.filter, self.labels, self.rank = compile_pattern(pattern)
+
+class RouteMatch:
+    """Hasil routing satu topic konkret (di-cache)"""
+    __slots__ = ('route', 'labels', 'device_id', 'prefix')
+
+    def __init__(self, route, levels):
+        self.route = route
+        self.labels = {name: levels[i] for i, name in route.labels}
+        self.device_id = self.labels.get('device_id')
+        others = [value for name, value in self.labels.items() if name != 'device_id']
+        self.prefix = "".join(f"{value}/" for value in others)
+
+    @property
+    def handler(self):
+        return self.route.handler
+
+    @property
+    def schema(self):
+        return self.route.schema
+
+    def resolve_device(self, payload_device):
+        """Id device final: label topic didahulukan, id payload sebagai fallback"""
+        return self.prefix + (self.device_id or payload_device)
+
+class _Node:
+    __slots__ = ('children', 'single', 'multi', 'routes')
+
+    def __init__(self):
+        self.children = {}
+        self.single = None      # Child untuk '+'
+        self.multi = []         # Route yang berakhir dengan '#' di level ini
+        self.routes = []        # Route yang berakhir tepat di node ini
+
+# =====================================================
+# ROUTER
+# =====================================================
+class TopicRouter:
+    """Trie pola topic + cache hasil routing per topic konkret"""
+
+    def __init__(self, routes=(), cache_size=ROUTE_CACHE_SIZE):
+        self._root = _Node()
+        self.routes = []
+        self.cache_size = cache_size
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+        for route in routes:
+            self.add(*route)
+
+    def add(self, pattern, schema, handler=None):
+        """Tambah pola; cache dikosongkan karena hasil routing bisa berubah"""
+        route = Route(pattern, schema, handler, len(self.routes))
+        node = self._root
+        levels = route.filter.split("/")
+        for level in levels:
+            if level == "#":
+                node.multi.append(route)
+                break
+            if level == "+":
+                if node.single is None:
+                    node.single = _Node()
+                node = node.single
+            else:
+                node = node.children.setdefault(level, _Node())
+        else:
+            node.routes.append(route)
+        self.routes.append(route)
+        self._cache.clear()
+        return route
+
+    @property
+    def filters(self):
+        """Topic filter unik untuk subscribe, urut seperti saat ditambahkan"""
+        return list(dict.fromkeys(route.filter for route in self.routes))
+
+    def route(self, topic):
+        """Topic konkret -> RouteMatch (None jika tidak ada pola yang cocok)"""
+        match = self._cache.get(topic, self)
+        if match is not self:
+            self.hits += 1
+            return match
+
+        self.misses += 1
+        levels = topic.split("/")
+        candidates = self._match(levels)
+        # Pola paling spesifik menang; seri -> yang ditambahkan lebih dulu
+        best = max(candidates, key=lambda r: (r.rank, -r.order)) if candidates else None
+        match = RouteMatch(best, levels) if best is not None else None
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[topic] = match
+        return match
+
+    def _match(self, levels):
+        """Semua route yang cocok dengan topic (walk trie, cabang literal + '+' + '#')"""
+        matches = []
+        # Topic '$...' (misal $SYS) tidak boleh cocok dengan wildcard di level pertama
+        system = levels[0].startswith("$")
+        stack = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if node.multi and not (system and depth == 0):
+                matches.extend(node.multi)
+            if depth == len(levels):
+                matches.extend(node.routes)
+                continue
+            child = node.children.get(levels[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            if node.single is not None and not (system and depth == 0):
+                stack.append((node.single, depth + 1))
+        return matches
+
+    def cache_info(self):
+        return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses}
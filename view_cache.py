@@ -0,0 +1,170 @@
+"""
+View Cache - Shared Computed Views
+==================================
+Hasil turunan view dashboard (DataFrame window, ``describe()``, distribusi
+prediction, figure Plotly) disimpan sekali per proses dan dipakai bersama
+semua session. Sepuluh viewer pada window yang sama = satu komputasi.
+
+Key dibangun dari isi data, bukan posisi di buffer session: versi data
+(``data_version``: timestamp terakhir, jumlah reading, checksum timestamp)
+ditambah identitas view (window, device, forecast, ...). Session yang
+menerima stream yang sama (mode service / sharded) menghasilkan key yang
+sama; data baru = versi baru, jadi cache otomatis ter-invalidate.
+
+- single-flight: session yang meminta key yang sedang dihitung session lain
+  menunggu hasilnya, tidak menghitung ulang,
+- invalidasi saat data baru masuk: per view hanya versi terbaru dan satu
+  versi sebelumnya (session yang tertinggal satu rerun) yang disimpan,
+- LRU dengan batas memori ``VIEW_CACHE_MAX_BYTES`` (ukuran estimasi).
+
+Nilai di cache dipakai bersama antar thread: jangan dimodifikasi.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import VIEW_CACHE_MAX_BYTES
+
+def data_version(timestamps, *values):
+    """Versi isi data: (timestamp terakhir, jumlah, checksum) - urut dari data terbaru
+
+    ``values`` = array tambahan yang bisa berubah tanpa timestamp berubah
+    (misal bucket agregat yang masih terisi).
+    """
+    ts = np.asarray(timestamps)
+    if len(ts) == 0:
+        return (0, 0, 0)
+    digest = hash(b"".join(np.ascontiguousarray(a).tobytes() for a in (ts, *values)))
+    return (int(ts[-1]), len(ts), digest)
+
+def estimate_bytes(value):
+    """Estimasi memori nilai cache (array, DataFrame, figure Plotly, dict/tuple)"""
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'memory_usage'):
+        # DataFrame / Series
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if hasattr(value, 'data') and hasattr(value, 'layout'):
+        # Figure Plotly: array data per trace
+        return sum(estimate_bytes(np.asarray(trace[name]))
+                   for trace in value.data for name in ('x', 'y', 'z', 'text', 'customdata')
+                   if name in trace and trace[name] is not None)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(v) for v in value)
+    return 64
+
+class _Pending:
+    """Komputasi yang sedang berjalan untuk satu key (single-flight)"""
+    __slots__ = ('event', 'value', 'failed')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.failed = False
+
+class ViewCache:
+    """LRU per (view, versi data) dengan batas memori, dipakai bersama semua session"""
+
+    def __init__(self, max_bytes=VIEW_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (view, versi) -> (nilai, byte)
+        self._versions = {}             # view -> (versi sebelumnya, versi terbaru)
+        self._pending = {}              # (view, versi) -> _Pending
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0                 # Menunggu hasil komputasi session lain
+        self.evictions = 0
+
+    def get(self, view, version, compute):
+        """Nilai untuk ``view`` pada ``version``; ``compute()`` dipanggil hanya jika belum ada
+
+        ``view`` = tuple hashable identitas view (nama artifact, window, ...),
+        ``version`` = tuple yang bisa dibandingkan, lebih besar = data lebih baru.
+        """
+        key = (view, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            pending.event.wait()
+            if not pending.failed:
+                return pending.value
+            # Komputasi session lain gagal / dibatalkan: hitung sendiri
+            return compute()
+
+        try:
+            value = compute()
+        except BaseException:
+            pending.failed = True
+            with self._lock:
+                del self._pending[key]
+            pending.event.set()
+            raise
+        pending.value = value
+        size = estimate_bytes(value)
+        with self._lock:
+            del self._pending[key]
+            self._store(view, version, key, value, size)
+        pending.event.set()
+        return value
+
+    def _store(self, view, version, key, value, size):
+        if size > self.max_bytes:
+            return
+        previous, latest = self._versions.get(view, (None, None))
+        if latest is None or version > latest:
+            # Data baru: versi dua langkah di belakang tidak akan diminta lagi
+            self._drop((view, previous))
+            self._versions[view] = (latest, version)
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old_view, old_version = old = next(iter(self._entries))
+            self._drop(old)
+            self.evictions += 1
+            if self._versions[old_view][1] == old_version:
+                del self._versions[old_view]
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Metrik cache untuk UI"""
+        total = self.hits + self.misses + self.shared
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'hit_rate': (self.hits + self.shared) / total if total else None,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,430 @@
+"""
+Write-Ahead Log - Crash-Safe Reading Log
+========================================
+Log biner append-only untuk reading yang sudah diklasifikasi, supaya
+restart server Streamlit (deploy, crash, OOM) tidak menghapus history
+dashboard maupun counter Messages/Alerts.
+
+Format:
+- record fixed-size (``WAL_DTYPE``, 104 byte; device id ``DEVICE_ID_BYTES``
+  byte seperti ring shared memory) sehingga ekor log bisa
+  di-``mmap`` dan dibaca langsung sebagai structured array NumPy,
+- prediction dan anomaly reason disimpan sebagai kode int8,
+- setiap record membawa ``lsn`` (nomor urut global), ``messages_total``
+  (reading yang diterima, termasuk yang dibuang load shedding),
+  ``alerts_total`` (counter alert kumulatif) dan CRC32, jadi counter bisa
+  dipulihkan dari record terakhir dan write yang terpotong di ekor bisa
+  dideteksi,
+- log dipecah per segment ``segment-v<WAL_FORMAT>-<first_lsn>.wal``; segment
+  lama dihapus setelah ``WAL_MAX_SEGMENTS``. Segment format lain diabaikan.
+
+Group commit: batch yang di-append hanya masuk antrian memori; writer
+thread menggabungkan semua batch per ``WAL_COMMIT_INTERVAL`` menjadi satu
+``write`` + satu ``fsync``. Crash kehilangan paling banyak satu interval.
+"""
+
+import atexit
+import glob
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows: tanpa lock direktori
+    fcntl = None
+
+from classifier import CATEGORIES, ANOMALY_REASONS, encode_labels, decode_labels
+from config import (
+    WAL_DIR, WAL_COMMIT_INTERVAL, WAL_SEGMENT_RECORDS, WAL_MAX_SEGMENTS, WAL_VERIFY_TAIL,
+    WAL_DEDUP_WINDOW, DEVICE_ID_BYTES, DUPLICATE_WINDOW
+)
+from sensor_buffer import COLUMNS, NAT_NS, encode_device_ids, decode_fixed_strings
+
+# =====================================================
+# RECORD LAYOUT
+# =====================================================
+WAL_FORMAT = 2                  # Naik setiap layout record berubah
+WAL_DTYPE = np.dtype([
+    ('lsn', '<i8'),
+    ('messages_total', '<i8'),
+    ('alerts_total', '<i8'),
+    ('timestamp', '<i8'),
+    ('device_ts', '<i8'),
+    ('seq', '<i8'),
+    ('temperature', '<f8'),
+    ('humidity', '<f8'),
+    ('confidence', '<f8'),
+    ('prediction', 'i1'),
+    ('anomaly_reason', 'i1'),
+    ('anomaly_flag', '?'),
+    ('alert_triggered', '?'),
+    ('device_id', f'S{DEVICE_ID_BYTES}'),
+    ('crc', '<u4'),
+])
+RECORD_SIZE = WAL_DTYPE.itemsize
+CRC_OFFSET = WAL_DTYPE.fields['crc'][1]
+VALUE_COLUMNS = ('timestamp', 'device_ts', 'seq', 'temperature', 'humidity',
+                 'confidence', 'anomaly_flag', 'alert_triggered')
+
+SEGMENT_PATTERN = f"segment-v{WAL_FORMAT}-*.wal"
+LOCK_FILE = "wal.lock"
+
+def segment_path(directory, first_lsn):
+    return os.path.join(directory, f"segment-v{WAL_FORMAT}-{first_lsn:020d}.wal")
+
+def list_segments(directory=WAL_DIR):
+    """Path segment terurut dari yang tertua"""
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)))
+
+# =====================================================
+# ENCODING
+# =====================================================
+def record_crcs(recs):
+    """CRC32 per record (semua byte sebelum field crc)"""
+    raw = recs.view(np.uint8).reshape(len(recs), RECORD_SIZE)[:, :CRC_OFFSET]
+    return np.fromiter((zlib.crc32(row) for row in raw), dtype=np.uint32, count=len(recs))
+
+def encode_wal_records(columns, first_lsn, alerts_before, shed_total=0):
+    """Dict kolom (schema SensorBuffer) -> structured array WAL_DTYPE
+
+    ``shed_total`` = reading yang diterima tapi tidak di-log (load shedding)
+    sampai batch ini.
+    """
+    n = len(columns['timestamp'])
+    recs = np.zeros(n, dtype=WAL_DTYPE)
+    recs['lsn'] = first_lsn + np.arange(n)
+    recs['messages_total'] = recs['lsn'] + 1 + shed_total
+    for name in VALUE_COLUMNS:
+        recs[name] = columns[name]
+    recs['alerts_total'] = alerts_before + np.cumsum(recs['alert_triggered'])
+    recs['prediction'] = encode_labels(columns['prediction'], CATEGORIES)
+    recs['anomaly_reason'] = encode_labels(columns['anomaly_reason'], ANOMALY_REASONS)
+    # Device id lebih dari DEVICE_ID_BYTES = prefix + hash (sama dengan ring shared memory)
+    recs['device_id'] = encode_device_ids(columns['device_id'], DEVICE_ID_BYTES)
+    recs['crc'] = record_crcs(recs)
+    return recs
+
+def decode_wal_records(recs):
+    """Structured array WAL_DTYPE -> dict kolom untuk SensorBuffer.extend"""
+    columns = {name: recs[name].astype(COLUMNS[name]) for name in VALUE_COLUMNS}
+    columns['device_id'] = decode_fixed_strings(recs['device_id'])
+    columns['prediction'] = decode_labels(recs['prediction'], CATEGORIES)
+    columns['anomaly_reason'] = decode_labels(recs['anomaly_reason'], ANOMALY_REASONS)
+    return columns
+
+def valid_count(recs, verify_tail=WAL_VERIFY_TAIL):
+    """Jumlah record valid di awal ``recs`` (buang ekor yang torn/korup).
+
+    LSN harus berurutan; CRC hanya dicek untuk ``verify_tail`` record
+    terakhir karena record sebelumnya sudah di-fsync oleh commit terdahulu.
+    """
+    n = len(recs)
+    if n == 0:
+        return 0
+    lsn = recs['lsn']
+    breaks = np.flatnonzero(lsn != lsn[0] + np.arange(n))
+    if len(breaks):
+        n = int(breaks[0])
+
+    lo = max(0, n - verify_tail)
+    bad = np.flatnonzero(record_crcs(recs[lo:n]) != recs['crc'][lo:n])
+    if len(bad):
+        n = lo + int(bad[0])
+    return n
+
+def _map_tail(path, n):
+    """Memory-map maksimal ``n`` record terakhir dari satu segment"""
+    count = os.path.getsize(path) // RECORD_SIZE
+    start = max(0, count - n)
+    if count == start:
+        return np.empty(0, dtype=WAL_DTYPE), count
+    recs = np.memmap(path, dtype=WAL_DTYPE, mode='r', offset=start * RECORD_SIZE, shape=(count - start,))
+    return recs, count
+
+# =====================================================
+# RECOVERY (warm restart)
+# =====================================================
+def load_recent(n, directory=WAL_DIR, verify_tail=WAL_VERIFY_TAIL):
+    """Ambil ``n`` reading terakhir dari log tanpa membaca seluruh file.
+
+    Return ``(columns, totals)``: ``columns`` dict kolom siap untuk
+    SensorBuffer.extend (None jika log kosong), ``totals`` berisi counter
+    ``messages`` dan ``alerts`` dari record terakhir.
+    """
+    parts, need, newest = [], n, True
+    for path in reversed(list_segments(directory)):
+        if need <= 0:
+            break
+        recs, _ = _map_tail(path, need + (verify_tail if newest else 0))
+        if newest:
+            # Writer mungkin sedang menulis / crash di tengah group commit
+            recs = recs[:valid_count(recs, verify_tail)]
+            newest = False
+        if len(recs) == 0:
+            continue
+        part = np.array(recs[-need:])  # copy, lepas mapping file
+        parts.append(part)
+        need -= len(part)
+
+    if not parts:
+        return None, {'messages': 0, 'alerts': 0}
+
+    recs = np.concatenate(parts[::-1])
+    last = recs[-1]
+    totals = {'messages': int(last['messages_total']), 'alerts': int(last['alerts_total'])}
+    return decode_wal_records(recs), totals
+
+# =====================================================
+# WRITE-AHEAD LOG (writer)
+# =====================================================
+class WriteAheadLog:
+    def __init__(self, directory=WAL_DIR, commit_interval=WAL_COMMIT_INTERVAL,
+                 segment_records=WAL_SEGMENT_RECORDS, max_segments=WAL_MAX_SEGMENTS,
+                 verify_tail=WAL_VERIFY_TAIL):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.verify_tail = verify_tail
+
+        self.next_lsn = 0
+        self.shed_total = 0             # Reading diterima tapi tidak di-log
+        self.alerts_total = 0
+        self.commits = 0
+        self.bytes_written = 0
+        self.last_commit_ms = 0.0
+
+        self._pending = []
+        self._pending_shed = 0
+        self._pending_lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._segment_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = self._lock_directory()
+        self._open_tail()
+
+    def _lock_directory(self):
+        """Lock eksklusif direktori: dua writer = dua urutan LSN yang memotong log saat recovery"""
+        if fcntl is None:
+            return None
+        fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError(f"WAL directory '{self.directory}' is already used by another writer "
+                               f"(dashboard / ingest service / async_ingest.py); "
+                               f"set WAL_DIR or run with WAL disabled") from None
+        return fd
+
+    def _open_tail(self):
+        """Lanjutkan segment terakhir, potong record torn/korup di ekornya"""
+        for path in reversed(list_segments(self.directory)):
+            recs, count = _map_tail(path, self.verify_tail)
+            first = count - len(recs)
+            valid = first + valid_count(recs, self.verify_tail)
+            last = recs[valid - first - 1].copy() if valid > first else None
+            del recs  # Lepas mapping sebelum file dipotong
+
+            if valid * RECORD_SIZE != os.path.getsize(path):
+                print(f"⚠️ WAL: dropping torn tail of {os.path.basename(path)} "
+                      f"({count - valid} records)")
+                os.truncate(path, valid * RECORD_SIZE)
+            if valid == 0:
+                os.remove(path)
+                continue
+            if last is None:
+                # Seluruh window verify_tail torn: record sebelumnya sudah di-fsync commit terdahulu
+                last = np.fromfile(path, dtype=WAL_DTYPE, count=1, offset=(valid - 1) * RECORD_SIZE)[0]
+
+            self.next_lsn = int(last['lsn']) + 1
+            self.shed_total = int(last['messages_total']) - self.next_lsn
+            self.alerts_total = int(last['alerts_total'])
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            self._segment_count = valid
+            return
+        self._open_segment(self.next_lsn)
+
+    def _open_segment(self, first_lsn):
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+        path = segment_path(self.directory, first_lsn)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment_count = 0
+
+        # Retensi: simpan maksimal max_segments segment
+        for old in list_segments(self.directory)[:-self.max_segments]:
+            os.remove(old)
+
+    def start(self):
+        """Jalankan writer thread group commit (idempotent)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, columns):
+        """Antrikan batch kolom; ditulis ke disk pada group commit berikutnya"""
+        with self._pending_lock:
+            self._pending.append(columns)
+
+    def count_shed(self, n):
+        """Catat ``n`` reading yang diterima tapi dibuang load shedding (tidak di-log)
+
+        Ikut tersimpan di ``messages_total`` record berikutnya, jadi counter
+        Messages setelah restart tetap menghitung semua reading yang diterima.
+        """
+        if n:
+            with self._pending_lock:
+                self._pending_shed += n
+
+    @property
+    def messages_total(self):
+        """Reading yang diterima (di-log + dibuang), termasuk yang masih antri"""
+        with self._pending_lock:
+            pending = sum(len(batch['timestamp']) for batch in self._pending) + self._pending_shed
+        return self.next_lsn + self.shed_total + pending
+
+    def _run(self):
+        while not self._stop.wait(self.commit_interval):
+            self.commit()
+
+    def commit(self):
+        """Group commit: semua batch yang antri -> satu write + satu fsync"""
+        with self._commit_lock:
+            with self._pending_lock:
+                batches, self._pending = self._pending, []
+                shed, self._pending_shed = self._pending_shed, 0
+            self.shed_total += shed
+            if not batches or self._fd is None:
+                return 0
+
+            start = time.perf_counter()
+            merged = {name: np.concatenate([batch[name] for batch in batches]) for name in COLUMNS}
+            recs = encode_wal_records(merged, self.next_lsn, self.alerts_total, self.shed_total)
+
+            pos = 0
+            while pos < len(recs):
+                if self._segment_count >= self.segment_records:
+                    self._open_segment(self.next_lsn + pos)
+                chunk = recs[pos:pos + self.segment_records - self._segment_count]
+                self._write_all(chunk.tobytes())
+                self._segment_count += len(chunk)
+                pos += len(chunk)
+            os.fsync(self._fd)
+
+            self.next_lsn += len(recs)
+            self.alerts_total = int(recs['alerts_total'][-1])
+            self.commits += 1
+            self.bytes_written += recs.nbytes
+            self.last_commit_ms = (time.perf_counter() - start) * 1000
+            return len(recs)
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+
+    def stats(self):
+        with self._pending_lock:
+            pending = sum(len(batch['timestamp']) for batch in self._pending)
+        return {
+            'records': self.next_lsn,
+            'pending': pending,
+            'commits': self.commits,
+            'bytes_written': self.bytes_written,
+            'last_commit_ms': self.last_commit_ms,
+        }
+
+    def close(self):
+        """Commit sisa antrian lalu tutup segment"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.commit()
+        with self._commit_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)     # Melepas flock
+                self._lock_fd = None
+
+# =====================================================
+# SESSION RECORDER (mode ingest "session")
+# =====================================================
+class SessionRecorder:
+    """Batch semua session (masing-masing menerima stream yang sama) -> satu WAL tanpa duplikat
+
+    Setiap session punya MQTT client sendiri, jadi reading yang sama tiba di
+    semua session. Semua session menulis, reading yang sudah ditulis session
+    lain dibuang: key ``(device_id, seq, device_ts)``, atau untuk reading
+    tanpa seq dan timestamp device isi reading yang identik dalam
+    ``DUPLICATE_WINDOW`` detik (sama dengan ingest.py). Log tetap lengkap
+    selama minimal satu session masih menerima data.
+
+    Key disimpan ``window`` detik (waktu terima); reading yang lebih tua dari
+    reading terbaru yang sudah ditulis dikurangi ``window`` (backlog session
+    yang baru lepas dari pause) sudah ditulis session lain, jadi dibuang.
+    """
+
+    def __init__(self, wal, window=WAL_DEDUP_WINDOW, duplicate_window=DUPLICATE_WINDOW):
+        self.wal = wal
+        self.window_ns = int(window * 1e9)
+        self.duplicate_window_ns = int(duplicate_window * 1e9)
+        self.written = 0
+        self.duplicates = 0
+        self._seen = {}                 # key -> waktu terima (ns)
+        self._newest_ns = NAT_NS
+        self._swept_ns = NAT_NS
+        self._lock = threading.Lock()
+
+    def _keys(self, columns):
+        seqs = columns['seq'].tolist()
+        device_ns = columns['device_ts'].tolist()
+        temps = columns['temperature'].tolist()
+        hums = columns['humidity'].tolist()
+        return [(device, seq, dts, None, None) if seq >= 0 or dts != NAT_NS else (device, None, None, temp, hum)
+                for device, seq, dts, temp, hum in zip(columns['device_id'].tolist(), seqs, device_ns, temps, hums)]
+
+    def append(self, columns):
+        """Tulis reading yang belum ditulis session lain, return jumlahnya"""
+        ts = columns['timestamp']
+        if len(ts) == 0:
+            return 0
+        keys = self._keys(columns)
+        keep = np.zeros(len(ts), dtype=bool)
+        with self._lock:
+            # Horizon dari reading yang sudah ditulis sebelum batch ini
+            horizon = self._newest_ns - self.window_ns
+            if horizon - self._swept_ns > self.window_ns:
+                self._seen = {key: ns for key, ns in self._seen.items() if ns >= horizon}
+                self._swept_ns = horizon
+            for i, (key, ns) in enumerate(zip(keys, ts.tolist())):
+                if ns < horizon:
+                    continue
+                seen = self._seen.get(key)
+                if seen is not None and (key[1] is not None or abs(ns - seen) <= self.duplicate_window_ns):
+                    continue
+                self._seen[key] = ns
+                keep[i] = True
+
+            self._newest_ns = max(self._newest_ns, int(ts.max()))
+            kept = int(keep.sum())
+            self.written += kept
+            self.duplicates += len(ts) - kept
+            if kept:
+                # Di dalam lock: urutan antrian WAL = urutan pengecekan duplikat
+                self.wal.append({name: np.asarray(values)[keep] for name, values in columns.items()})
+        return kept